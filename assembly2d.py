@@ -2,105 +2,725 @@
 # -*- coding: utf-8 -*-
 from numpy import zeros
 from numpy import array
-from scipy.sparse import lil_matrix
-from print_progress import print_progress
+from numpy import add
+from scipy.sparse import csr_matrix
+from profiling import timed, progress, ASSEMBLY, PATTERN, RECOVERY
+from cache import cached
 
 
-def assembly_quads_stress_strain(nodes, elements, thickness, elasticity_matrix, gauss_order=2):
-    # type: (array, array, array, int) -> lil_matrix
+@timed(PATTERN)
+def sparsity_pattern(elements, nodes_count, freedom, upper=False):
+    # type: (array, int, int, bool) -> (array, array, array)
+    """
+    Sparsity pattern of a global matrix: the CSR structure and positions of entries of local matrices in the array of
+    values of the global matrix. A pattern depends on a mesh only, so it can be built once and shared by assemblies of
+    different matrices (stiffness and geometric), materials, thicknesses, etc.
+    :param elements: A two-dimensional array of elements (a mesh)
+    :param nodes_count: A count of nodes
+    :param freedom: A count of freedoms in each node
+    :param upper: The pattern of the upper triangle of a symmetric matrix: an entry of a local matrix below
+    the diagonal is positioned at its mirror entry, so off-diagonal values are accumulated twice (see _global_matrix)
+    :return: Tuple: indptr, indices (CSR structure of a global matrix), positions - a two-dimensional array
+    [elements_count; element_dimension^2]: position of each entry of a local matrix (row by row) in the CSR data array.
+    Arrays are int32 when they fit and the dtype policy allows (see dtypes)
+    """
+    from numpy import arange, repeat, tile, bincount, cumsum, concatenate, empty, int64, minimum, maximum
+    from dtypes import index_dtype
+    elements_count = len(elements)
+    element_dimension = freedom * elements.shape[1]
+    dimension = freedom * nodes_count
+    dofs = (elements[:, :, None].astype(int64) * freedom + arange(freedom)).reshape(elements_count, element_dimension)
+    (rows, columns) = (repeat(dofs, element_dimension, axis=1), tile(dofs, (1, element_dimension)))
+    del dofs
+    if upper:
+        (rows, columns) = (minimum(rows, columns), maximum(rows, columns))
+    keys = (rows * dimension + columns).ravel()
+    del rows, columns
+    order = keys.argsort()
+    keys = keys[order]
+    first = empty(len(keys), dtype=bool)
+    first[:1] = True
+    first[1:] = keys[1:] != keys[:-1]
+    keys = keys[first]
+    index = index_dtype(max(len(keys), dimension))
+    positions = empty(len(order), dtype=index)
+    positions[order] = cumsum(first, dtype=index) - 1
+    del order, first
+    indices = (keys % dimension).astype(index)
+    indptr = concatenate(([0], cumsum(bincount(keys // dimension, minlength=dimension)))).astype(index)
+    return indptr, indices, positions.reshape(elements_count, element_dimension * element_dimension)
+
+
+def block_pattern(elements, nodes_count, freedom):
+    # type: (array, int, int) -> (array, array, array)
+    """
+    Sparsity pattern of a global matrix in the BSR format with [freedom; freedom]-blocks: the structure of blocks is
+    the pattern of the adjacency of nodes, so indices of the matrix take freedom^2 times less memory than CSR indices
+    and products are evaluated by dense blocks. Assembly routines given the pattern return BSR matrices
+    :param elements: A two-dimensional array of elements (a mesh)
+    :param nodes_count: A count of nodes
+    :param freedom: A count of freedoms in each node
+    :return: Tuple: indptr, indices (BSR structure of blocks), positions - a two-dimensional array
+    [elements_count; element_dimension^2]: position of each entry of a local matrix (row by row) in the flattened array
+    of values of blocks
+    """
+    from numpy import arange
+    from dtypes import index_dtype
+    (indptr, indices, blocks) = sparsity_pattern(elements, nodes_count, 1)
+    element_nodes = elements.shape[1]
+    index = index_dtype(len(indices) * freedom * freedom)
+    offsets = (arange(freedom)[:, None, None] * freedom + arange(freedom)).astype(index)
+    positions = blocks.astype(index).reshape(-1, element_nodes, 1, element_nodes, 1) * index(freedom * freedom) + \
+        offsets[None, None, :, :, :]
+    return indptr, indices, positions.reshape(len(elements), -1)
+
+
+def _pattern(elements, nodes_count, freedom, blocks, upper):
+    """
+    :return: A block pattern (see block_pattern) if blocks, a scalar pattern (see sparsity_pattern) otherwise
+    """
+    if blocks and upper:
+        raise ValueError("The upper triangle storage of block matrices is not supported")
+    if blocks:
+        return block_pattern(elements, nodes_count, freedom)
+    return sparsity_pattern(elements, nodes_count, freedom, upper)
+
+
+def _upper_storage(pattern, upper):
+    """
+    Function checks the storage of a given pattern: a pattern of the upper triangle (see sparsity_pattern) defines
+    the storage, since its mirror entries share positions
+    :return: Whether values are accumulated on the upper triangle
+    """
+    from cache import pattern_kind
+    if pattern is None:
+        return upper
+    kind = pattern_kind(pattern)
+    if upper and kind != "upper":
+        raise ValueError("The upper triangle storage requires a pattern built with upper=True")
+    return kind == "upper"
+
+
+def _global_values(indptr, indices, dimension):
+    """
+    :return: A zero array of values of a global matrix of a scalar or a block pattern
+    """
+    rows = len(indptr) - 1
+    size = dimension // rows if rows else 1
+    return zeros(len(indices) * size * size)
+
+
+def _global_matrix(data, indices, indptr, dimension, upper=False):
+    """
+    Function makes a global matrix of values on a pattern
+    :param upper: Values are accumulated on the upper triangle pattern (see sparsity_pattern): off-diagonal values are
+    halved in place (the diagonal is the first entry of each row)
+    :return: A CSR matrix of a scalar pattern (see sparsity_pattern) or a BSR matrix of a block pattern (see
+    block_pattern). Values of the matrix share memory with data
+    """
+    rows = len(indptr) - 1
+    if upper:
+        first = indptr[:-1][indptr[:-1] < indptr[1:]]  # rows of nodes without elements are empty
+        diagonal = data[first]
+        data *= 0.5
+        data[first] = diagonal
+    if rows == dimension:
+        return csr_matrix((data, indices, indptr), shape=(dimension, dimension))
+    from scipy.sparse import bsr_matrix
+    size = dimension // rows
+    return bsr_matrix((data.reshape(-1, size, size), indices, indptr), shape=(dimension, dimension))
+
+
+def scatter_colored(data, positions, values, order, offsets, threads=None):
+    """
+    Subroutine adds local matrices of many elements to values of a global matrix group by group of elements that don't
+    share nodes (see partition.color_elements), so entries of a group are distinct and they are added by vectorized
+    operations (numpy.add.at isn't required) split between threads without races. Elements must not repeat nodes, and
+    upper triangle patterns aren't supported (mirror entries of a local matrix share a position)
+    :param data: An array of values of a global matrix (see sparsity_pattern)
+    :param positions: Positions of entries of local matrices (see sparsity_pattern)
+    :param values: Local matrices of elements [elements_count; element_dimension^2]
+    :param order: A permutation of elements grouped by colors (see partition.groups)
+    :param offsets: Offsets of groups in the permutation
+    :param threads: A count of threads (one thread if None)
+    :return: None
+    """
+    from numpy import array_split
+
+    def add_chunk(chunk):
+        data[positions[chunk]] += values[chunk]
+
+    pool = None
+    if threads is not None and threads > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(threads)
+    try:
+        for color in range(len(offsets) - 1):
+            group = order[offsets[color]:offsets[color + 1]]
+            if pool is None:
+                add_chunk(group)
+            else:
+                pool.map(add_chunk, [chunk for chunk in array_split(group, threads) if len(chunk)])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _element_value(value, element_index, dimensions):
+    """
+    Function selects a value of an element from a per-element array or returns a value shared by all elements
+    :param value: A value (e.g. a thickness or an elasticity matrix) or an array of values of elements
+    :param element_index: An index of an element
+    :param dimensions: A count of dimensions of a value of an element (0 - a scalar, 2 - a matrix)
+    :return: The value of the element
+    """
+    from numpy import ndim
+    return value[element_index] if ndim(value) > dimensions else value
+
+
+def element_signatures(nodes, elements, tolerance=1.0E-6, rotations=False, materials=None):
+    """
+    Function classifies congruent elements: elements are congruent if coordinates of their vertices relative to the
+    first vertex (rotated so that the first edge is parallel to the x-axis if rotations are allowed) coincide up to
+    the tolerance. Local matrices of congruent elements of the same material are equal (up to a rotation of freedoms),
+    so structured meshes need few local matrices: one for a uniform grid, one per ring of an annulus (with rotations)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of elements
+    :param tolerance: A tolerance relative to the size of the mesh
+    :param rotations: Whether elements that differ by a rotation are congruent
+    :param materials: An array of parameters of materials of elements [elements_count; ...] (compared exactly) or None
+    :return: Tuple: labels - indices of signatures of elements [elements_count], representatives - indices of an
+    element of each signature, angles - angles of rotation of the first edges of elements [elements_count] (zeros
+    without rotations)
+    """
+    from numpy import arctan2, cos, sin, rint, unique, hstack, int64, ascontiguousarray
+    elements_count = len(elements)
+    vertices = nodes[elements, :2].astype(float)
+    relative = vertices - vertices[:, :1, :]
+    angles = zeros(elements_count)
+    if rotations:
+        angles = arctan2(relative[:, 1, 1], relative[:, 1, 0])
+        (c, s) = (cos(angles)[:, None], sin(angles)[:, None])
+        relative = array([c * relative[:, :, 0] + s * relative[:, :, 1],
+                          c * relative[:, :, 1] - s * relative[:, :, 0]]).transpose((1, 2, 0))
+    size = (vertices.reshape(-1, 2).max(axis=0) - vertices.reshape(-1, 2).min(axis=0)).max()
+    keys = rint(relative.reshape(elements_count, -1) / (tolerance * (1.0 if size == 0.0 else size))).astype(int64)
+    if materials is not None:
+        materials = ascontiguousarray(materials, dtype=float).reshape(elements_count, -1)
+        keys = hstack((keys, materials.view(int64)))
+    (unique_keys, representatives, labels) = unique(keys, axis=0, return_index=True, return_inverse=True)
+    return labels.ravel(), representatives, angles
+
+
+def _isotropic(elasticity_matrix):
+    """
+    :param elasticity_matrix: A matrix of stress-strain relations or an array of matrices
+    :return: Whether the relations are invariant under rotations
+    """
+    from numpy import allclose
+    d = array(elasticity_matrix, dtype=float).reshape(-1, 3, 3)
+    scale = abs(d).max() if d.size else 1.0
+    return allclose(d[:, 0, 0], d[:, 1, 1], atol=1.0E-12 * scale) and \
+        allclose(d[:, [0, 1], 2], 0.0, atol=1.0E-12 * scale) and \
+        allclose(d[:, 2, 2], 0.5 * (d[:, 0, 0] - d[:, 0, 1]), atol=1.0E-12 * scale)
+
+
+def _congruent_materials(congruent, elasticity_matrix, thickness, elements_count):
+    """
+    Function checks arguments of congruent assembly and collects parameters of materials of elements
+    :return: An array [elements_count; ...] for per-element materials or None if materials are shared
+    """
+    from numpy import ndim, broadcast_to, hstack
+    if congruent not in ("translations", "rotations"):
+        raise ValueError("Unknown congruence: " + str(congruent))
+    if congruent == "rotations" and not _isotropic(elasticity_matrix):
+        raise ValueError("Congruence of rotated elements requires isotropic materials")
+    if ndim(elasticity_matrix) <= 2 and ndim(thickness) == 0:
+        return None
+    return hstack((broadcast_to(elasticity_matrix, (elements_count, 3, 3)).reshape(elements_count, 9),
+                   broadcast_to(thickness, (elements_count,))[:, None]))
+
+
+def _scatter_congruent(data, positions, locals, labels, angles, freedom, components, chunk=65536):
+    """
+    Subroutine adds local matrices of signatures to values of a global matrix. Vector freedoms of elements are rotated
+    by differences of angles of elements and their representatives: K = T K_r T^T, T is block-diagonal
+    :param data: An array of values of a global matrix (see sparsity_pattern)
+    :param positions: Positions of entries of local matrices (see sparsity_pattern)
+    :param locals: Local matrices of representatives of signatures [signatures_count; k; k]
+    :param labels: Indices of signatures of elements
+    :param angles: Angles of rotation of elements relative to their representatives
+    :param freedom: A count of freedoms in each node
+    :param components: Indices of components (x, y) of the vector freedom of a node
+    :param chunk: A count of elements scattered at once
+    :return: None
+    """
+    from numpy import cos, sin, any
+    rotate = any(angles != 0.0)
+    (p, q) = components
+    for start in range(0, len(labels), chunk):
+        values = locals[labels[start:start + chunk]]
+        if rotate:
+            values = values.reshape(len(values), values.shape[1] // freedom, freedom, -1)
+            c = cos(angles[start:start + chunk])[:, None, None]
+            s = sin(angles[start:start + chunk])[:, None, None]
+            (x, y) = (values[:, :, p, :].copy(), values[:, :, q, :].copy())
+            values[:, :, p, :] = c * x - s * y
+            values[:, :, q, :] = s * x + c * y
+            values = values.reshape(len(values), -1, values.shape[3] // freedom, freedom)
+            (x, y) = (values[:, :, :, p].copy(), values[:, :, :, q].copy())
+            values[:, :, :, p] = c * x - s * y
+            values[:, :, :, q] = s * x + c * y
+        add.at(data, positions[start:start + chunk].ravel(), values.ravel())
+
+
+def _assembly_congruent(data, positions, nodes, elements, local_matrix, congruent, materials, freedom, components):
+    """
+    Subroutine evaluates local matrices of representatives of congruent elements and scatters them to all elements
+    :param local_matrix: A function of an index of an element that returns its local matrix
+    :param congruent: "translations" or "rotations"
+    :param materials: Parameters of materials of elements or None (see element_signatures)
+    :return: None
+    """
+    from numpy import empty
+    (labels, representatives, angles) = element_signatures(nodes, elements, rotations=congruent == "rotations",
+                                                           materials=materials)
+    element_dimension = freedom * elements.shape[1]
+    locals = empty((len(representatives), element_dimension, element_dimension))
+    for (step, element_index) in enumerate(representatives):
+        locals[step] = local_matrix(element_index)
+        progress(step, len(representatives) - 1)
+    _scatter_congruent(data, positions, locals, labels, angles - angles[representatives][labels], freedom, components)
+
+
+def _assembly_batches(data, positions, elements_count, order, local_matrices, chunk=4096):
+    """
+    Subroutine evaluates local matrices of batches of elements at once (see kernels) and scatters them
+    :param data: An array of values of a global matrix (see sparsity_pattern)
+    :param positions: Positions of entries of local matrices (see sparsity_pattern)
+    :param elements_count: A count of elements
+    :param order: A permutation of elements: an order of processing, natural if None
+    :param local_matrices: A function of an array of indices of elements that returns their local matrices
+    :param chunk: A count of elements of a batch
+    :return: None
+    """
+    from numpy import arange, asarray
+    sequence = arange(elements_count) if order is None else asarray(order)
+    for start in range(0, len(sequence), chunk):
+        batch = sequence[start:start + chunk]
+        add.at(data, positions[batch].ravel(), local_matrices(batch).ravel())
+        progress(start + len(batch) - 1, len(sequence) - 1)
+
+
+def _stress_strain_local(element, thickness, elasticity_matrix, xi, eta, w, shape_function):
+    """
+    Function evaluates the stiffness matrix of a plane stress-strain element
+    :param element: Element's vertices: [element_nodes; 2]-matrix
+    :param thickness: A thickness of the element
+    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
+    :param xi: Quadrature points in the first parametric direction
+    :param eta: Quadrature points in the second parametric direction
+    :param w: Quadrature weights
+    :param shape_function: iso_quad or iso_triangle
+    :return: [2 * element_nodes; 2 * element_nodes]-matrix
+    """
+    element_dimension = 2 * len(element)
+    local = zeros((element_dimension, element_dimension))
+    for i in range(len(w)):
+        (jacobian, shape, shape_dx, shape_dy) = shape_function(element, xi[i], eta[i])
+        b = zeros((3, element_dimension))
+        b[0, 0::2] = shape_dx
+        b[1, 1::2] = shape_dy
+        b[2, 0::2] = shape_dy
+        b[2, 1::2] = shape_dx
+        local = local + thickness * b.transpose().dot(elasticity_matrix).dot(b) * jacobian * w[i]
+    return local
+
+
+@timed(ASSEMBLY)
+@cached
+def assembly_quads_stress_strain(nodes, elements, thickness, elasticity_matrix, gauss_order=2, pattern=None,
+                                 order=None, congruent=None, blocks=False, upper=False):
+    # type: (array, array, array, int) -> csr_matrix
     """
     Assembly Routine for the Plane Stress-Strain State Analysis using a Mesh of Quadrilaterals
     :param nodes: A two-dimensional array of coordinates (nodes)
     :param elements: A two-dimensional array of quads (a mesh)
-    :param thickness: A thickness of an object
-    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
+    :param thickness: A thickness of an object or an array of thicknesses of elements
+    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations or an array
+    [elements_count; 3; 3] of matrices of elements
     :param gauss_order: An order of gaussian quadratures (a count of points used to approximate in each direction)
+    :param pattern: A sparsity pattern (see sparsity_pattern) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param congruent: None - a local matrix of each element is evaluated, "translations" or "rotations" - a local
+    matrix is evaluated once for congruent elements of the same material (see element_signatures); "rotations" requires
+    isotropic materials
+    :param blocks: Return a BSR matrix of [freedom; freedom]-blocks if a pattern isn't given (see block_pattern)
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
     :return: A global stiffness matrix stored in the CSR sparse format
     Order: u_0, v0, u_1, v_1, ..., u_(n-1), v_(n-1); n is nodes count
     """
     from quadrature import legendre_quad
     from shape_functions import iso_quad
-    print "The assembly routine is started."
+    from kernels import PLANE_STRAINS, coupling, channel_products, stiffness_kernel
+    from numpy import reshape
     freedom = 2
-    element_nodes = 4
     nodes_count = len(nodes)
     dimension = freedom * nodes_count
-    element_dimension = freedom * element_nodes
-    global_matrix = lil_matrix((dimension, dimension))
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, dimension)
     elements_count = len(elements)
     (xi, eta, w) = legendre_quad(gauss_order)
-    for element_index in range(elements_count):
-        local = zeros((element_dimension, element_dimension))
-        element = nodes[elements[element_index, :], :]
-        for i in range(len(w)):
-            (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi[i], eta[i])
-            b = array([
-                [shape_dx[0],   0.0,            shape_dx[1],    0.0,            shape_dx[2],    0.0,            shape_dx[3],    0.0],
-                [0.0,           shape_dy[0],    0.0,            shape_dy[1],    0.0,            shape_dy[2],    0.0,            shape_dy[3]],
-                [shape_dy[0],   shape_dx[0],    shape_dy[1],    shape_dx[1],    shape_dy[2],    shape_dx[2],    shape_dy[3],    shape_dx[3]]
-            ])
-            bt = b.conj().transpose()
-            local = local + thickness * bt.dot(elasticity_matrix).dot(b) * jacobian * w[i]
-        for i in range(element_dimension):
-            ii = elements[element_index, i / freedom] * freedom + i % freedom
-            for j in range(i, element_dimension):
-                jj = elements[element_index, j / freedom] * freedom + j % freedom
-                global_matrix[ii, jj] += local[i, j]
-                if i != j:
-                    global_matrix[jj, ii] = global_matrix[ii, jj]
-        print_progress(element_index, elements_count - 1)
-    print "\nThe assembly routine is completed."
-    return global_matrix.tocsr()
-
-
-def assembly_triangles_stress_strain(nodes, elements, elasticity_matrix, gauss_order=2):
-    # type: (array, array, array, int) -> lil_matrix
+
+    def local_matrix(element_index):
+        return _stress_strain_local(nodes[elements[element_index, :], :], _element_value(thickness, element_index, 0),
+                                    _element_value(elasticity_matrix, element_index, 2), xi, eta, w, iso_quad)
+
+    def local_matrices(batch):
+        couplings = coupling(PLANE_STRAINS, freedom, _element_value(elasticity_matrix, batch, 2))
+        return stiffness_kernel(channel_products(nodes, elements[batch], xi, eta, w), couplings) * \
+            reshape(_element_value(thickness, batch, 0), (-1, 1, 1))
+
+    if congruent is not None:
+        materials = _congruent_materials(congruent, elasticity_matrix, thickness, elements_count)
+        _assembly_congruent(data, positions, nodes, elements, local_matrix, congruent, materials, freedom, (0, 1))
+        return _global_matrix(data, indices, indptr, dimension, upper)
+    _assembly_batches(data, positions, elements_count, order, local_matrices)
+    return _global_matrix(data, indices, indptr, dimension, upper)
+
+
+@timed(ASSEMBLY)
+@cached
+def assembly_triangles_stress_strain(nodes, elements, elasticity_matrix, gauss_order=1, pattern=None, order=None,
+                                     congruent=None, blocks=False, upper=False):
+    # type: (array, array, array, int) -> csr_matrix
     """
     Assembly Routine for the Plane Stress-Strain State Analysis using a Mesh of Triangles
     :param nodes: A two-dimensional array of coordinates (nodes)
     :param elements: A two-dimensional array of quads (a mesh)
-    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
-    :param gauss_order: An order of gaussian quadratures (a count of points used to approximate in each direction)
+    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations or an array
+    [elements_count; 3; 3] of matrices of elements
+    :param gauss_order: A degree of the triangle quadrature rule (strains of linear triangles are constant, so the
+    one-point rule is exact)
+    :param pattern: A sparsity pattern (see sparsity_pattern) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param congruent: None - a local matrix of each element is evaluated, "translations" or "rotations" - a local
+    matrix is evaluated once for congruent elements of the same material (see element_signatures); "rotations" requires
+    isotropic materials
+    :param blocks: Return a BSR matrix of [freedom; freedom]-blocks if a pattern isn't given (see block_pattern)
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
     :return: A global stiffness matrix stored in the CSR sparse format
     Order: u_0, v0, u_1, v_1, ..., u_(n-1), v_(n-1); n is nodes count
     """
     from quadrature import legendre_triangle
     from shape_functions import iso_triangle
-    print "The assembly routine is started."
     freedom = 2
-    element_nodes = 3
     nodes_count = len(nodes)
     dimension = freedom * nodes_count
-    element_dimension = freedom * element_nodes
-    global_matrix = lil_matrix((dimension, dimension))
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, dimension)
     elements_count = len(elements)
     (xi, eta, w) = legendre_triangle(gauss_order)
-    for element_index in range(elements_count):
-        local = zeros((element_dimension, element_dimension))
-        element = nodes[elements[element_index, :], :]
-        for i in range(len(w)):
-            (jacobian, shape, shape_dx, shape_dy) = iso_triangle(element, xi[i], eta[i])
-            b = array([
-                [shape_dx[0],   0.0,            shape_dx[1],    0.0,            shape_dx[2],    0.0        ],
-                [0.0,           shape_dy[0],    0.0,            shape_dy[1],    0.0,            shape_dy[2]],
-                [shape_dy[0],   shape_dx[0],    shape_dy[1],    shape_dx[1],    shape_dy[2],    shape_dx[2]]
-            ])
-            bt = b.conj().transpose()
-            local = local + bt.dot(elasticity_matrix).dot(b) * jacobian * w[i]
-        for i in range(element_dimension):
-            ii = elements[element_index, i / freedom] * freedom + i % freedom
-            for j in range(i, element_dimension):
-                jj = elements[element_index, j / freedom] * freedom + j % freedom
-                global_matrix[ii, jj] += local[i, j]
-                if i != j:
-                    global_matrix[jj, ii] = global_matrix[ii, jj]
-        print_progress(element_index, elements_count - 1)
-    print "\nThe assembly routine is completed"
-    return global_matrix.tocsr()
-
-
-def assembly_quads_mindlin_plate(nodes, elements, thickness, elasticity_matrix, gauss_order=3, kappa=5.0/6.0):
-    # type: (array, array, float, float, float, int, float) -> lil_matrix
+
+    def local_matrix(element_index):
+        return _stress_strain_local(nodes[elements[element_index, :], :], 1.0,
+                                    _element_value(elasticity_matrix, element_index, 2), xi, eta, w, iso_triangle)
+
+    if congruent is not None:
+        materials = _congruent_materials(congruent, elasticity_matrix, 1.0, elements_count)
+        _assembly_congruent(data, positions, nodes, elements, local_matrix, congruent, materials, freedom, (0, 1))
+        return _global_matrix(data, indices, indptr, dimension, upper)
+    for (step, element_index) in enumerate(range(elements_count) if order is None else order):
+        add.at(data, positions[element_index], local_matrix(element_index).ravel())
+        progress(step, elements_count - 1)
+    return _global_matrix(data, indices, indptr, dimension, upper)
+
+
+def _scalar_quadrature(elements, gauss_order):
+    """
+    :return: Quadrature points and weights of quadrilaterals or triangles
+    """
+    from quadrature import legendre_quad, legendre_triangle
+    if elements.shape[1] == 4:
+        return legendre_quad(gauss_order)
+    if elements.shape[1] == 3:
+        return legendre_triangle(gauss_order)
+    raise ValueError("Only quadrilaterals and triangles are supported")
+
+
+@timed(ASSEMBLY)
+@cached
+def assembly_conduction(nodes, elements, conductivity, thickness=1.0, gauss_order=2, pattern=None, order=None,
+                        upper=False):
+    # type: (array, array, array, float, int) -> csr_matrix
+    """
+    Assembly Routine for the conductivity matrix of the heat conduction: K = integral of t * grad N^T * k * grad N
+    :param nodes: A two-dimensional array of coordinates (nodes)
+    :param elements: A two-dimensional array of quadrilaterals or triangles (a mesh)
+    :param conductivity: A thermal conductivity: a scalar, a [2; 2]-matrix (anisotropic materials), an array of
+    scalars [elements_count] or an array of matrices [elements_count; 2; 2] of elements
+    :param thickness: A thickness of an object or an array of thicknesses of elements
+    :param gauss_order: An order of gaussian quadratures of quadrilaterals or a degree of the triangle quadrature rule
+    :param pattern: A sparsity pattern (see sparsity_pattern with freedom=1) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
+    :return: A global matrix stored in the CSR sparse format
+    Order: T_0, T_1, ..., T_(n-1); n is nodes count
+    """
+    from kernels import DX, DY, coupling, channel_products, stiffness_kernel
+    from numpy import ndim, eye, asarray, reshape
+    nodes_count = len(nodes)
+    (indptr, indices, positions) = sparsity_pattern(elements, nodes_count, 1, upper) if pattern is None else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, nodes_count)
+    (xi, eta, w) = _scalar_quadrature(elements, gauss_order)
+    conductivity = asarray(conductivity, dtype=float)
+    if ndim(conductivity) <= 1:
+        conductivity = conductivity[..., None, None] * eye(2)
+
+    def local_matrices(batch):
+        couplings = coupling((((DX, 0),), ((DY, 0),)), 1, _element_value(conductivity, batch, 2))
+        return stiffness_kernel(channel_products(nodes, elements[batch], xi, eta, w), couplings) * \
+            reshape(_element_value(thickness, batch, 0), (-1, 1, 1))
+
+    _assembly_batches(data, positions, len(elements), order, local_matrices)
+    return _global_matrix(data, indices, indptr, nodes_count, upper)
+
+
+@timed(ASSEMBLY)
+@cached
+def assembly_capacity(nodes, elements, capacity, thickness=1.0, gauss_order=2, pattern=None, order=None, upper=False):
+    # type: (array, array, array, float, int) -> csr_matrix
+    """
+    Assembly Routine for the (consistent) heat capacity matrix: C = integral of t * rho * c * N^T * N
+    :param nodes: A two-dimensional array of coordinates (nodes)
+    :param elements: A two-dimensional array of quadrilaterals or triangles (a mesh)
+    :param capacity: A volumetric heat capacity rho * c or an array of capacities of elements
+    :param thickness: A thickness of an object or an array of thicknesses of elements
+    :param gauss_order: An order of gaussian quadratures of quadrilaterals or a degree of the triangle quadrature rule
+    (2 is exact for both)
+    :param pattern: A sparsity pattern (see sparsity_pattern with freedom=1) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
+    :return: A global matrix stored in the CSR sparse format
+    """
+    from kernels import SHAPE, coupling, channel_products, stiffness_kernel
+    from numpy import reshape
+    nodes_count = len(nodes)
+    (indptr, indices, positions) = sparsity_pattern(elements, nodes_count, 1, upper) if pattern is None else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, nodes_count)
+    (xi, eta, w) = _scalar_quadrature(elements, gauss_order)
+    couplings = coupling((((SHAPE, 0),),), 1, [[1.0]])
+
+    def local_matrices(batch):
+        return stiffness_kernel(channel_products(nodes, elements[batch], xi, eta, w), couplings) * \
+            reshape(_element_value(capacity, batch, 0) * _element_value(thickness, batch, 0), (-1, 1, 1))
+
+    _assembly_batches(data, positions, len(elements), order, local_matrices)
+    return _global_matrix(data, indices, indptr, nodes_count, upper)
+
+
+class IncrementalStiffness(object):
+    """
+    Stiffness matrix of the plane stress-strain state that is updated in place when materials of some elements change
+    (damage, topology optimization): local matrices of elements are cached, contributions of changed elements are
+    subtracted and added to values of the CSR matrix, so a cost of an update is proportional to a count of changed
+    elements. A local matrix of an element is factors[e] * K_e(thickness[e], elasticity_matrices[e]).
+    Boundary conditions must be applied to a copy of the matrix (e.g. by load_cases.apply_dirichlet)
+        stiffness = IncrementalStiffness(nodes, elements, d)
+        stiffness.update(damaged, factors=0.1 * ones(len(damaged)))
+        x = solve(stiffness.matrix, force, fixed)
+    """
+    def __init__(self, nodes, elements, elasticity_matrix, thickness=1.0, gauss_order=None, pattern=None):
+        """
+        :param nodes: A two-dimensional array of coordinates (nodes)
+        :param elements: A two-dimensional array of quadrilaterals or triangles
+        :param elasticity_matrix: A matrix of stress-strain relations or an array [elements_count; 3; 3]
+        :param thickness: A thickness or an array of thicknesses of elements (quadrilaterals only)
+        :param gauss_order: An order of quadratures (2 for quadrilaterals, 1 for triangles by default)
+        :param pattern: A sparsity pattern (see sparsity_pattern) or None, the matrix is BSR of a block pattern (see
+        block_pattern)
+        """
+        from numpy import ones, empty, broadcast_to
+        from quadrature import legendre_quad, legendre_triangle
+        from shape_functions import iso_quad, iso_triangle
+        freedom = 2
+        elements_count = len(elements)
+        self.nodes = nodes
+        self.elements = elements
+        if elements.shape[1] == 4:
+            (self.xi, self.eta, self.w) = legendre_quad(2 if gauss_order is None else gauss_order)
+            self.shape_function = iso_quad
+        else:
+            (self.xi, self.eta, self.w) = legendre_triangle(1 if gauss_order is None else gauss_order)
+            self.shape_function = iso_triangle
+            thickness = 1.0
+        self.elasticity_matrices = broadcast_to(elasticity_matrix, (elements_count, 3, 3)).astype(float)
+        self.thicknesses = broadcast_to(thickness, (elements_count,)).astype(float)
+        self.factors = ones(elements_count)
+        (indptr, indices, self.positions) = sparsity_pattern(elements, len(nodes), freedom) if pattern is None \
+            else pattern
+        if _upper_storage(pattern, False):
+            raise ValueError("The upper triangle storage isn't supported")
+        element_dimension = freedom * elements.shape[1]
+        self.locals = empty((elements_count, element_dimension * element_dimension))
+        self._evaluate(range(elements_count))
+        dimension = freedom * len(nodes)
+        self.matrix = _global_matrix(_global_values(indptr, indices, dimension), indices, indptr, dimension)
+        self.refresh()
+
+    def _evaluate(self, element_indices):
+        for (step, element_index) in enumerate(element_indices):
+            self.locals[element_index] = _stress_strain_local(
+                self.nodes[self.elements[element_index, :], :], self.thicknesses[element_index],
+                self.elasticity_matrices[element_index], self.xi, self.eta, self.w, self.shape_function).ravel()
+            progress(step, len(element_indices) - 1)
+
+    @timed(ASSEMBLY)
+    def refresh(self):
+        """
+        Function reassembles values of the matrix from cached local matrices (it removes round-off errors accumulated
+        by many updates)
+        :return: The matrix
+        """
+        self.matrix.data[:] = 0.0
+        add.at(self.matrix.data.reshape(-1), self.positions.ravel(), (self.factors[:, None] * self.locals).ravel())
+        return self.matrix
+
+    @timed(ASSEMBLY)
+    def update(self, elements, elasticity_matrix=None, thickness=None, factors=None):
+        """
+        Function changes elements and updates values of the matrix in place
+        :param elements: An index or distinct indices of changed elements
+        :param elasticity_matrix: New matrices of stress-strain relations: a matrix for all changed elements or an array
+        [len(elements); 3; 3]
+        :param thickness: New thicknesses: a scalar or an array [len(elements)]
+        :param factors: New factors of local matrices (relative to matrices of current materials): a scalar or an array
+        [len(elements)]
+        :return: The matrix
+        """
+        from numpy import asarray, unique
+        elements = asarray(elements, dtype=int).ravel()
+        if len(unique(elements)) != len(elements):
+            # a contribution of a repeated element would be subtracted and added once per occurrence
+            raise ValueError("Indices of changed elements must be distinct")
+        old = self.factors[elements, None] * self.locals[elements]
+        if elasticity_matrix is not None or thickness is not None:
+            if elasticity_matrix is not None:
+                self.elasticity_matrices[elements] = elasticity_matrix
+            if thickness is not None:
+                self.thicknesses[elements] = thickness
+            self._evaluate(elements)
+        if factors is not None:
+            self.factors[elements] = factors
+        new = self.factors[elements, None] * self.locals[elements]
+        add.at(self.matrix.data.reshape(-1), self.positions[elements].ravel(), (new - old).ravel())
+        return self.matrix
+
+
+def _mindlin_shear_matrix(shape, shape_dx, shape_dy):
+    """
+    Transverse shear strains matrix of the Mindlin plate element: gamma_xz = dw/dx + theta_x, gamma_yz = dw/dy + theta_y
+    :param shape: Array of the shape functions
+    :param shape_dx: Array of the shape functions derivatives in the first direction
+    :param shape_dy: Array of the shape functions derivatives in the second direction
+    :return: [2; 3 * element_nodes]-matrix
+    Order: w_0, theta_x_0, theta_y_0, ..., w_(n-1), theta_x_(n-1), theta_y_(n-1); n - element nodes count
+    """
+    bc = zeros((2, 3 * len(shape)))
+    bc[0, 0::3] = shape_dx
+    bc[0, 1::3] = shape
+    bc[1, 0::3] = shape_dy
+    bc[1, 2::3] = shape
+    return bc
+
+
+def _mitc4_shear_matrix(element, xi, eta):
+    """
+    Assumed (MITC4) transverse shear strains matrix of the bilinear Mindlin plate element. Covariant shear strains are
+    sampled at the midpoints of element's edges and interpolated over the element (K.J. Bathe, E.N. Dvorkin, 1985)
+    :param element: Element's vertices: [4; 2]-matrix
+    :param xi: Coordinate in the first parametric direction
+    :param eta: Coordinate in the second parametric direction
+    :return: [2; 12]-matrix, rows correspond to Cartesian shear strains gamma_xz, gamma_yz
+    """
+    from shape_functions import iso_quad, quad_jacobi
+    from numpy.linalg import inv
+    covariant = []
+    for (p, q, row) in [(0.0, 1.0, 0), (0.0, -1.0, 0), (1.0, 0.0, 1), (-1.0, 0.0, 1)]:
+        (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, p, q)
+        covariant.append(quad_jacobi(element, p, q)[row, :].dot(_mindlin_shear_matrix(shape, shape_dx, shape_dy)))
+    assumed = array([
+        0.5 * (1.0 + eta) * covariant[0] + 0.5 * (1.0 - eta) * covariant[1],
+        0.5 * (1.0 + xi) * covariant[2] + 0.5 * (1.0 - xi) * covariant[3]
+    ])
+    return inv(quad_jacobi(element, xi, eta)).dot(assumed)
+
+
+def _mindlin_local(element, thickness, df, dc, quadrature, reduced_quadrature, kappa, integration, stabilization):
+    """
+    Function evaluates the stiffness matrix of the bilinear Mindlin plate element
+    :param element: Element's vertices: [4; 2]-matrix
+    :param thickness: A thickness of the element
+    :param df: A matrix of bending stress-strain relations
+    :param dc: A matrix of transverse shear stress-strain relations
+    :param quadrature: Tuple: points and weights of the full quadrature
+    :param reduced_quadrature: Tuple: points and weights of the one-point quadrature
+    :param kappa: The shear correction factor
+    :param integration: Integration scheme of the transverse shear energy (see assembly_quads_mindlin_plate)
+    :param stabilization: A hourglass control parameter of the "stabilized" scheme
+    :return: [12; 12]-matrix
+    """
+    from shape_functions import iso_quad
+    (xi, eta, w) = quadrature
+    (xi_r, eta_r, w_r) = reduced_quadrature
+    element_dimension = 12
+    bending = zeros((element_dimension, element_dimension))
+    shear = zeros((element_dimension, element_dimension))
+    area = 0.0
+    for i in range(len(w)):
+        (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi[i], eta[i])
+        bf = array([
+            [0.0, shape_dx[0], 0.0,         0.0, shape_dx[1], 0.0,         0.0, shape_dx[2], 0.0,         0.0, shape_dx[3], 0.0],
+            [0.0, 0.0,         shape_dy[0], 0.0, 0.0,         shape_dy[1], 0.0, 0.0,         shape_dy[2], 0.0, 0.0,         shape_dy[3]],
+            [0.0, shape_dy[0], shape_dx[0], 0.0, shape_dy[1], shape_dx[1], 0.0, shape_dy[2], shape_dx[2], 0.0, shape_dy[3], shape_dx[3]]
+        ])
+        bending = bending + bf.transpose().dot(df).dot(bf) * jacobian * w[i]
+        area += jacobian * w[i]
+        if integration == "mitc4":
+            bc = _mitc4_shear_matrix(element, xi[i], eta[i])
+            shear = shear + bc.transpose().dot(dc).dot(bc) * jacobian * w[i]
+        elif integration != "selective":
+            bc = _mindlin_shear_matrix(shape, shape_dx, shape_dy)
+            shear = shear + bc.transpose().dot(dc).dot(bc) * jacobian * w[i]
+    if integration in ("selective", "stabilized"):
+        (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi_r[0], eta_r[0])
+        bc = _mindlin_shear_matrix(shape, shape_dx, shape_dy)
+        reduced = bc.transpose().dot(dc).dot(bc) * jacobian * w_r[0]
+        if integration == "stabilized":
+            epsilon = stabilization * thickness**2.0 / (thickness**2.0 + area)
+            shear = reduced + epsilon * (shear - reduced)
+        else:
+            shear = reduced
+    return thickness**3.0 / 12.0 * bending + kappa * thickness * shear
+
+
+@timed(ASSEMBLY)
+@cached
+def assembly_quads_mindlin_plate(nodes, elements, thickness, elasticity_matrix, gauss_order=3, kappa=5.0/6.0,
+                                 integration="full", stabilization=0.1, pattern=None, order=None, congruent=None,
+                                 blocks=False, upper=False):
+    # type: (array, array, float, float, float, int, float, str, float) -> csr_matrix
     """
     Assembly Routine for the Mindlin Plates Analysis
     :param nodes: A two-dimensional array of plate's nodes coordinates
@@ -109,55 +729,80 @@ def assembly_quads_mindlin_plate(nodes, elements, thickness, elasticity_matrix,
     :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
     :param gauss_order: An order of gaussian quadratures
     :param kappa: The shear correction factor
+    :param integration: Integration scheme of the transverse shear energy:
+    "full" - the same quadratures as bending (locks for thin plates unless a mesh is very fine),
+    "selective" - full integration of bending and one-point (reduced) integration of shear,
+    "stabilized" - selective integration plus hourglass control: the difference between fully and reduced integrated
+    shear matrices is added with the factor stabilization * t^2 / (t^2 + A), A is an area of an element,
+    "mitc4" - assumed transverse shear strains interpolated from the midpoints of element's edges (MITC4)
+    In all cases but "full" gauss_order=2 integrates bending exactly.
+    :param stabilization: A hourglass control parameter of the "stabilized" scheme
+    :param pattern: A sparsity pattern (see sparsity_pattern) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param congruent: None - a local matrix of each element is evaluated, "translations" or "rotations" - a local
+    matrix is evaluated once for congruent elements (see element_signatures); "rotations" requires an isotropic material
+    :param blocks: Return a BSR matrix of [freedom; freedom]-blocks if a pattern isn't given (see block_pattern)
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
     :return: Global stiffness matrix in the CSR sparse format
-    Order: u_0, v0, u_1, v_1, ..., u_(n-1), v_(n-1); n - nodes count
+    Order: w_0, theta_x_0, theta_y_0, ..., w_(n-1), theta_x_(n-1), theta_y_(n-1); n - nodes count
     """
     from quadrature import legendre_quad
-    from shape_functions import iso_quad
+    from kernels import bending_strains, shear_strains, coupling, channel_products, element_area, stiffness_kernel
 
-    print "The assembly routine is started"
+    if integration not in ("full", "selective", "stabilized", "mitc4"):
+        raise ValueError("Unknown integration scheme: " + str(integration))
     freedom = 3
-    element_nodes = 4
     nodes_count = len(nodes)
     dimension = freedom * nodes_count
-    element_dimension = freedom * element_nodes
-    global_matrix = lil_matrix((dimension, dimension))
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, dimension)
     elements_count = len(elements)
     (xi, eta, w) = legendre_quad(gauss_order)
+    (xi_r, eta_r, w_r) = legendre_quad(1)
     df = elasticity_matrix
     dc = array([
         [df[2, 2], 0.0],
         [0.0, df[2, 2]]
     ])
-    for element_index in range(elements_count):
-        local = zeros((element_dimension, element_dimension))
-        element = nodes[elements[element_index, :], :]
-        for i in range(len(w)):
-            (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi[i], eta[i])
-            bf = array([
-                [0.0, shape_dx[0], 0.0,         0.0, shape_dx[1], 0.0,         0.0, shape_dx[2], 0.0,         0.0, shape_dx[3], 0.0],
-                [0.0, 0.0,         shape_dy[0], 0.0, 0.0,         shape_dy[1], 0.0, 0.0,         shape_dy[2], 0.0, 0.0,         shape_dy[3]],
-                [0.0, shape_dy[0], shape_dx[0], 0.0, shape_dy[1], shape_dx[1], 0.0, shape_dy[2], shape_dx[2], 0.0, shape_dy[3], shape_dx[3]]
-            ])
-            bc = array([
-                [shape_dx[0], shape[0], 0.0, shape_dx[1], shape[1], 0.0, shape_dx[2], shape[2], 0.0, shape_dx[3], shape[3], 0.0],
-                [shape_dy[0], 0.0, shape[0], shape_dy[1], 0.0, shape[1], shape_dy[2], 0.0, shape[2], shape_dy[3], 0.0, shape[3]]
-            ])
-            local = local + (thickness**3.0 / 12.0 * (bf.transpose().dot(df).dot(bf)) + kappa * thickness * (bc.transpose().dot(dc).dot(bc))) * jacobian * w[i]
-        for i in range(element_dimension):
-            ii = elements[element_index, i / freedom] * freedom + i % freedom
-            for j in range(i, element_dimension):
-                jj = elements[element_index, j / freedom] * freedom + j % freedom
-                global_matrix[ii, jj] += local[i, j]
-                if i != j:
-                    global_matrix[jj, ii] = global_matrix[ii, jj]
-        print_progress(element_index, elements_count - 1)
-    print "\nThe assembly routine is completed"
-    return global_matrix.tocsr()
-
-
-def assembly_quads_mindlin_plate_laminated(nodes, elements, thicknesses, elasticity_matrices, gauss_order=3, kappa=5.0 / 6.0):
-    # type: (array, array, float, float, float, int, float) -> lil_matrix
+
+    def local_matrix(element_index):
+        return _mindlin_local(nodes[elements[element_index, :], :], thickness, df, dc, (xi, eta, w), (xi_r, eta_r, w_r),
+                              kappa, integration, stabilization)
+
+    bending = coupling(bending_strains(1, 2), freedom, thickness**3.0 / 12.0 * df)
+    shear = coupling(shear_strains(0, 1, 2), freedom, kappa * thickness * dc)
+
+    def local_matrices(batch):
+        full = channel_products(nodes, elements[batch], xi, eta, w)
+        if integration == "full":
+            return stiffness_kernel(full, bending + shear)
+        reduced = channel_products(nodes, elements[batch], xi_r, eta_r, w_r)
+        if integration == "stabilized":
+            epsilon = stabilization * thickness**2.0 / (thickness**2.0 + element_area(full))
+            reduced = reduced + epsilon[:, None, None, None, None] * (full - reduced)
+        return stiffness_kernel(full, bending) + stiffness_kernel(reduced, shear)
+
+    if congruent is not None:
+        materials = _congruent_materials(congruent, elasticity_matrix, thickness, elements_count)
+        _assembly_congruent(data, positions, nodes, elements, local_matrix, congruent, materials, freedom, (1, 2))
+        return _global_matrix(data, indices, indptr, dimension, upper)
+    if integration != "mitc4":
+        _assembly_batches(data, positions, elements_count, order, local_matrices)
+        return _global_matrix(data, indices, indptr, dimension, upper)
+    for (step, element_index) in enumerate(range(elements_count) if order is None else order):
+        add.at(data, positions[element_index], local_matrix(element_index).ravel())
+        progress(step, elements_count - 1)
+    return _global_matrix(data, indices, indptr, dimension, upper)
+
+
+@timed(ASSEMBLY)
+@cached
+def assembly_quads_mindlin_plate_laminated(nodes, elements, thicknesses, elasticity_matrices, gauss_order=3, kappa=5.0 / 6.0,
+                                           pattern=None, order=None, blocks=False, upper=False):
+    # type: (array, array, float, float, float, int, float) -> csr_matrix
     """
     Assembly Routine for the Mindlin Plates Analysis
     :param nodes: A two-dimensional array of plate's nodes coordinates
@@ -166,126 +811,349 @@ def assembly_quads_mindlin_plate_laminated(nodes, elements, thicknesses, elastic
     :param elasticity_matrices: A list or a sequence of two-dimensional arrays. Each array represents stress-strain relations of corresponded layer
     :param gauss_order: An order of gaussian quadratures
     :param kappa: The shear correction factor
+    :param pattern: A sparsity pattern (see sparsity_pattern) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param blocks: Return a BSR matrix of [freedom; freedom]-blocks if a pattern isn't given (see block_pattern)
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
     :return: Global stiffness matrix in the CSR sparse format
     Order: u_0, v0, u_1, v_1, ..., u_(n-1), v_(n-1); n - nodes count
     """
     from quadrature import legendre_quad
-    from shape_functions import iso_quad
-    from numpy import sum
+    from kernels import PLANE_STRAINS, bending_strains, shear_strains, coupling, channel_products, stiffness_kernel
+    from numpy import sum, eye
 
-    print "The assembly routine is started"
     freedom = 5
-    element_nodes = 4
     nodes_count = len(nodes)
     dimension = freedom * nodes_count
-    element_dimension = freedom * element_nodes
-    global_matrix = lil_matrix((dimension, dimension))
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, dimension)
     elements_count = len(elements)
     (xi, eta, w) = legendre_quad(gauss_order)
 
+    # generalized stress-strain relations of membrane strains, curvatures and transverse shear strains
     h = sum(thicknesses)
+    matrix = zeros((8, 8))
+    z0 = -h / 2.0
+    for j in range(len(thicknesses)):
+        z1 = z0 + thicknesses[j]
+        df = elasticity_matrices[j]
+        matrix[:3, :3] += (z1 - z0) * df
+        matrix[:3, 3:6] += (z1**2.0 - z0**2.0) / 2.0 * df
+        matrix[3:6, :3] += (z1**2.0 - z0**2.0) / 2.0 * df
+        matrix[3:6, 3:6] += (z1**3.0 - z0**3.0) / 3.0 * df
+        matrix[6:, 6:] += (z1 - z0) * kappa * df[2, 2] * eye(2)
+        z0 = z1
+    couplings = coupling(PLANE_STRAINS + bending_strains(3, 4) + shear_strains(2, 3, 4), freedom, matrix)
+
+    def local_matrices(batch):
+        return stiffness_kernel(channel_products(nodes, elements[batch], xi, eta, w), couplings)
+
+    _assembly_batches(data, positions, elements_count, order, local_matrices)
+    return _global_matrix(data, indices, indptr, dimension, upper)
+
 
-    for element_index in range(elements_count):
-        local = zeros((element_dimension, element_dimension))
+@timed(ASSEMBLY)
+@cached
+def assembly_quads_mindlin_plate_geometric(nodes, elements, thickness, sigma_x, sigma_y, tau_xy, gauss_order=3,
+                                           pattern=None, order=None, blocks=False, upper=False):
+    from quadrature import legendre_quad
+    from kernels import initial_stress_kernel
+    from numpy import einsum, diag
+    freedom = 3
+    nodes_count = len(nodes)
+    dimension = freedom * nodes_count
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    data = _global_values(indptr, indices, dimension)
+    elements_count = len(elements)
+    (xi, eta, w) = legendre_quad(gauss_order)
+    factors = diag([thickness, thickness**3.0 / 12.0, thickness**3.0 / 12.0])
+
+    def local_matrices(batch):
+        products = initial_stress_kernel(nodes, elements[batch], sigma_x, sigma_y, tau_xy, xi, eta, w)
+        return einsum("eab,ij->eaibj", products, factors).reshape(len(batch), 4 * freedom, 4 * freedom)
+
+    _assembly_batches(data, positions, elements_count, order, local_matrices)
+    return _global_matrix(data, indices, indptr, dimension, upper)
+
+
+_ELASTICITY_ENTRIES = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
+
+
+def _entries_parts(left, right):
+    """
+    Function splits a product left^T * D * right into parts that are linear in independent entries of a symmetric
+    matrix D: left^T * D * right = sum of D[p, q] * part[p, q] over p <= q
+    :param left: [3; n]-matrix
+    :param right: [3; n]-matrix
+    :return: A list of [n; n]-matrices ordered as _ELASTICITY_ENTRIES
+    """
+    from numpy import outer
+    parts = []
+    for (p, q) in _ELASTICITY_ENTRIES:
+        part = outer(left[p], right[q])
+        if p != q:
+            part = part + outer(left[q], right[p])
+        parts.append(part)
+    return parts
+
+
+class AffineMatrix(object):
+    """
+    Global matrix decomposed into parts that are assembled once on a shared sparsity pattern:
+    matrix = sum of coefficients[name] * parts[name]. A matrix for new coefficients (thicknesses, material constants)
+    is formed by a few operations with arrays of values of CSR (or BSR) matrices, without reassembly
+    """
+    def __init__(self, indptr, indices, shape, parts, upper=False):
+        """
+        :param indptr: CSR (or BSR) structure of the pattern
+        :param indices: CSR (or BSR) structure of the pattern
+        :param shape: A shape of the matrix
+        :param parts: A dictionary: name of a part -> an array of values on the pattern
+        :param upper: Values are accumulated on the upper triangle pattern (see sparsity_pattern)
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.shape = shape
+        self.parts = parts
+        self.upper = upper
+
+    def part(self, name):
+        # type: (object) -> csr_matrix
+        return _global_matrix(self.parts[name].copy() if self.upper else self.parts[name], self.indices, self.indptr,
+                              self.shape[0], self.upper)
+
+    def combine(self, coefficients, out=None):
+        # type: (dict, csr_matrix) -> csr_matrix
+        """
+        Function forms a linear combination of parts
+        :param coefficients: A dictionary: name of a part -> coefficient (missing parts have zero coefficients)
+        :param out: A matrix of the same pattern returned by a previous call; its values are overwritten (a new matrix
+        is created if None)
+        :return: The matrix in the CSR (or BSR) sparse format
+        """
+        data = _global_values(self.indptr, self.indices, self.shape[0]) if out is None else out.data.reshape(-1)
+        data[:] = 0.0
+        for (name, coefficient) in coefficients.items():
+            if coefficient != 0.0:
+                data += coefficient * self.parts[name]
+        if out is not None:
+            if self.upper:
+                _global_matrix(data, self.indices, self.indptr, self.shape[0], True)
+            return out
+        return _global_matrix(data, self.indices, self.indptr, self.shape[0], self.upper)
+
+
+class MindlinPlateAffine(AffineMatrix):
+    """
+    Decomposition of the stiffness matrix of a Mindlin plate:
+    K = t^3 / 12 * sum of D[p, q] * bending[p, q] + kappa * t * D[2, 2] * shear
+    """
+    def coefficients(self, thickness, elasticity_matrix, kappa=5.0 / 6.0):
+        # type: (float, array, float) -> dict
+        coefficients = {"shear": kappa * thickness * elasticity_matrix[2, 2]}
+        for (p, q) in _ELASTICITY_ENTRIES:
+            coefficients[("bending", p, q)] = thickness**3.0 / 12.0 * elasticity_matrix[p, q]
+        return coefficients
+
+    def stiffness(self, thickness, elasticity_matrix, kappa=5.0 / 6.0, out=None):
+        # type: (float, array, float, csr_matrix) -> csr_matrix
+        """
+        Function forms the stiffness matrix; it equals the result of assembly_quads_mindlin_plate with the same
+        arguments
+        :param thickness: A thickness of a plate
+        :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
+        :param kappa: The shear correction factor
+        :param out: A matrix returned by a previous call to overwrite
+        :return: Global stiffness matrix in the CSR sparse format
+        """
+        return self.combine(self.coefficients(thickness, elasticity_matrix, kappa), out)
+
+
+class LaminatedPlateAffine(AffineMatrix):
+    """
+    Decomposition of the stiffness matrix of a laminated Mindlin plate into membrane, coupling, bending and shear parts:
+    K = sum of A[p, q] * membrane[p, q] + B[p, q] * coupling[p, q] + D[p, q] * bending[p, q] + S * shear,
+    A, B, D are the integrals of elasticity matrices of layers multiplied by 1, z, z^2 over the thickness and S is the
+    integral of kappa * D[2, 2]
+    """
+    def coefficients(self, thicknesses, elasticity_matrices, kappa=5.0 / 6.0):
+        # type: (list, list, float) -> dict
+        from numpy import sum
+        coefficients = {"shear": 0.0}
+        for (p, q) in _ELASTICITY_ENTRIES:
+            for name in ("membrane", "coupling", "bending"):
+                coefficients[(name, p, q)] = 0.0
+        z0 = -sum(thicknesses) / 2.0
+        for j in range(len(thicknesses)):
+            z1 = z0 + thicknesses[j]
+            df = elasticity_matrices[j]
+            for (p, q) in _ELASTICITY_ENTRIES:
+                coefficients[("membrane", p, q)] += (z1 - z0) * df[p, q]
+                coefficients[("coupling", p, q)] += (z1**2.0 - z0**2.0) / 2.0 * df[p, q]
+                coefficients[("bending", p, q)] += (z1**3.0 - z0**3.0) / 3.0 * df[p, q]
+            coefficients["shear"] += (z1 - z0) * kappa * df[2, 2]
+            z0 = z1
+        return coefficients
+
+    def stiffness(self, thicknesses, elasticity_matrices, kappa=5.0 / 6.0, out=None):
+        # type: (list, list, float, csr_matrix) -> csr_matrix
+        """
+        Function forms the stiffness matrix; it equals the result of assembly_quads_mindlin_plate_laminated with
+        the same arguments
+        :param thicknesses: An array of thicknesses that stores thicknesses of each layer
+        :param elasticity_matrices: A list of two-dimensional arrays, stress-strain relations of corresponded layers
+        :param kappa: The shear correction factor
+        :param out: A matrix returned by a previous call to overwrite
+        :return: Global stiffness matrix in the CSR sparse format
+        """
+        return self.combine(self.coefficients(thicknesses, elasticity_matrices, kappa), out)
+
+
+@timed(ASSEMBLY)
+def assembly_quads_mindlin_plate_affine(nodes, elements, gauss_order=3, integration="full", pattern=None, order=None,
+                                        blocks=False, upper=False):
+    # type: (array, array, int, str, tuple) -> MindlinPlateAffine
+    """
+    Assembly routine of the decomposed stiffness matrix of Mindlin plates (see assembly_quads_mindlin_plate). Parts
+    don't depend on a thickness and a material, so they are assembled once for a sweep over thicknesses and materials
+    :param nodes: A two-dimensional array of plate's nodes coordinates
+    :param elements: A two-dimensional array of plate's quadrilaterals (mesh)
+    :param gauss_order: An order of gaussian quadratures
+    :param integration: "full", "selective" or "mitc4" ("stabilized" depends on a thickness non-linearly)
+    :param pattern: A sparsity pattern (see sparsity_pattern) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param blocks: Return a BSR matrix of [freedom; freedom]-blocks if a pattern isn't given (see block_pattern)
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
+    :return: MindlinPlateAffine
+    """
+    from quadrature import legendre_quad
+    from shape_functions import iso_quad
+
+    if integration not in ("full", "selective", "mitc4"):
+        raise ValueError("Integration scheme doesn't allow the affine decomposition: " + str(integration))
+    freedom = 3
+    element_nodes = 4
+    nodes_count = len(nodes)
+    dimension = freedom * nodes_count
+    element_dimension = freedom * element_nodes
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    bending_data = [_global_values(indptr, indices, dimension) for entry in _ELASTICITY_ENTRIES]
+    shear_data = _global_values(indptr, indices, dimension)
+    elements_count = len(elements)
+    (xi, eta, w) = legendre_quad(gauss_order)
+    (xi_r, eta_r, w_r) = legendre_quad(1)
+    for (step, element_index) in enumerate(range(elements_count) if order is None else order):
+        bending = [zeros((element_dimension, element_dimension)) for entry in _ELASTICITY_ENTRIES]
+        shear = zeros((element_dimension, element_dimension))
         element = nodes[elements[element_index, :], :]
         for i in range(len(w)):
             (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi[i], eta[i])
-            bm = array([
-                [shape_dx[0], 0.0,         0.0, 0.0, 0.0, shape_dx[1], 0.0,         0.0, 0.0, 0.0, shape_dx[2], 0.0,         0.0, 0.0, 0.0, shape_dx[3], 0.0,         0.0, 0.0, 0.0],
-                [0.0,         shape_dy[0], 0.0, 0.0, 0.0, 0.0,         shape_dy[1], 0.0, 0.0, 0.0, 0.0,         shape_dy[2], 0.0, 0.0, 0.0, 0.0,         shape_dy[3], 0.0, 0.0, 0.0],
-                [shape_dy[0], shape_dx[0], 0.0, 0.0, 0.0, shape_dy[1], shape_dx[1], 0.0, 0.0, 0.0, shape_dy[2], shape_dx[2], 0.0, 0.0, 0.0, shape_dy[3], shape_dx[3], 0.0, 0.0, 0.0]
-            ])
-            bf = array([
-                [0.0, 0.0, 0.0, shape_dx[0], 0.0,         0.0, 0.0, 0.0, shape_dx[1], 0.0,         0.0, 0.0, 0.0, shape_dx[2], 0.0,         0.0, 0.0, 0.0, shape_dx[3], 0.0],
-                [0.0, 0.0, 0.0, 0.0,         shape_dy[0], 0.0, 0.0, 0.0, 0.0,         shape_dy[1], 0.0, 0.0, 0.0, 0.0,         shape_dy[2], 0.0, 0.0, 0.0, 0.0,         shape_dy[3]],
-                [0.0, 0.0, 0.0, shape_dy[0], shape_dx[0], 0.0, 0.0, 0.0, shape_dy[1], shape_dx[1], 0.0, 0.0, 0.0, shape_dy[2], shape_dx[2], 0.0, 0.0, 0.0, shape_dy[3], shape_dx[3]]
-            ])
-            bc = array([
-                [0.0, 0.0, shape_dx[0], shape[0], 0.0, 0.0, 0.0, shape_dx[1], shape[1], 0.0, 0.0, 0.0, shape_dx[2], shape[2], 0.0, 0.0, 0.0, shape_dx[3], shape[3], 0.0],
-                [0.0, 0.0, shape_dy[0], 0.0, shape[0], 0.0, 0.0, shape_dy[1], 0.0, shape[1], 0.0, 0.0, shape_dy[2], 0.0, shape[2], 0.0, 0.0, shape_dy[3], 0.0, shape[3]]
-            ])
-            z0 = -h / 2.0
-            for j in range(len(thicknesses)):
-                z1 = z0 + thicknesses[j]
-                df = elasticity_matrices[j]
-                dc = array([
-                    [df[2, 2], 0.0],
-                    [0.0, df[2, 2]]
-                ])
-                local = local + (z1 - z0) * (bm.transpose().dot(df).dot(bm)) * jacobian * w[i]
-                local = local + (z1**2.0 - z0**2.0) / 2.0 * (bm.transpose().dot(df).dot(bf)) * jacobian * w[i]
-                local = local + (z1**2.0 - z0**2.0) / 2.0 * (bf.transpose().dot(df).dot(bm)) * jacobian * w[i]
-                local = local + (z1**3.0 - z0**3.0) / 3.0 * (bf.transpose().dot(df).dot(bf)) * jacobian * w[i]
-                local = local + (z1 - z0) * kappa * (bc.transpose().dot(dc).dot(bc)) * jacobian * w[i]
-                z0 = z1
-
-        for i in range(element_dimension):
-            ii = elements[element_index, i / freedom] * freedom + i % freedom
-            for j in range(i, element_dimension):
-                jj = elements[element_index, j / freedom] * freedom + j % freedom
-                global_matrix[ii, jj] += local[i, j]
-                if i != j:
-                    global_matrix[jj, ii] = global_matrix[ii, jj]
-        print_progress(element_index, elements_count - 1)
-    print "\nThe assembly routine is completed"
-    return global_matrix.tocsr()
-
-
-def assembly_quads_mindlin_plate_geometric(nodes, elements, thickness, sigma_x, sigma_y, tau_xy, gauss_order=3):
+            bf = zeros((3, element_dimension))
+            bf[0, 1::3] = shape_dx
+            bf[1, 2::3] = shape_dy
+            bf[2, 1::3] = shape_dy
+            bf[2, 2::3] = shape_dx
+            for (k, part) in enumerate(_entries_parts(bf, bf)):
+                bending[k] += part * jacobian * w[i]
+            if integration != "selective":
+                if integration == "mitc4":
+                    bc = _mitc4_shear_matrix(element, xi[i], eta[i])
+                else:
+                    bc = _mindlin_shear_matrix(shape, shape_dx, shape_dy)
+                shear += bc.transpose().dot(bc) * jacobian * w[i]
+        if integration == "selective":
+            (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi_r[0], eta_r[0])
+            bc = _mindlin_shear_matrix(shape, shape_dx, shape_dy)
+            shear = bc.transpose().dot(bc) * jacobian * w_r[0]
+        for k in range(len(_ELASTICITY_ENTRIES)):
+            add.at(bending_data[k], positions[element_index], bending[k].ravel())
+        add.at(shear_data, positions[element_index], shear.ravel())
+        progress(step, elements_count - 1)
+    parts = {"shear": shear_data}
+    for (k, (p, q)) in enumerate(_ELASTICITY_ENTRIES):
+        parts[("bending", p, q)] = bending_data[k]
+    return MindlinPlateAffine(indptr, indices, (dimension, dimension), parts, upper)
+
+
+@timed(ASSEMBLY)
+def assembly_quads_mindlin_plate_laminated_affine(nodes, elements, gauss_order=3, pattern=None, order=None,
+                                                  blocks=False, upper=False):
+    # type: (array, array, int, tuple) -> LaminatedPlateAffine
+    """
+    Assembly routine of the decomposed stiffness matrix of laminated Mindlin plates (see
+    assembly_quads_mindlin_plate_laminated). Parts don't depend on thicknesses and materials of layers
+    :param nodes: A two-dimensional array of plate's nodes coordinates
+    :param elements: A two-dimensional array of plate's quadrilaterals (mesh)
+    :param gauss_order: An order of gaussian quadratures
+    :param pattern: A sparsity pattern (see sparsity_pattern) or None
+    :param order: A permutation of elements: an order of processing (see partition), natural by default
+    :param blocks: Return a BSR matrix of [freedom; freedom]-blocks if a pattern isn't given (see block_pattern)
+    :param upper: Return the upper triangle of the symmetric matrix (see solvers.SymmetricOperator); a given pattern
+    of the upper triangle implies it
+    :return: LaminatedPlateAffine
+    """
     from quadrature import legendre_quad
     from shape_functions import iso_quad
-    from numpy import sum
-    print "The assembly routine is started"
-    freedom = 3
+
+    freedom = 5
     element_nodes = 4
     nodes_count = len(nodes)
     dimension = freedom * nodes_count
     element_dimension = freedom * element_nodes
-    geometric = lil_matrix((dimension, dimension))
+    (indptr, indices, positions) = _pattern(elements, nodes_count, freedom, blocks, upper) if pattern is None \
+        else pattern
+    upper = _upper_storage(pattern, upper)
+    names = [(name, p, q) for name in ("membrane", "coupling", "bending") for (p, q) in _ELASTICITY_ENTRIES]
+    data = [_global_values(indptr, indices, dimension) for name in names]
+    shear_data = _global_values(indptr, indices, dimension)
     elements_count = len(elements)
     (xi, eta, w) = legendre_quad(gauss_order)
-
-    for element_index in range(elements_count):
-        kg = zeros((element_dimension, element_dimension))
-        vertices = nodes[elements[element_index, :], :]
-        sx = sigma_x[elements[element_index, :]]
-        sy = sigma_y[elements[element_index, :]]
-        txy = tau_xy[elements[element_index, :]]
+    for (step, element_index) in enumerate(range(elements_count) if order is None else order):
+        local = [zeros((element_dimension, element_dimension)) for name in names]
+        shear = zeros((element_dimension, element_dimension))
+        element = nodes[elements[element_index, :], :]
         for i in range(len(w)):
-            (jacobian, shape, shape_dx, shape_dy) = iso_quad(vertices, xi[i], eta[i])
-            s0 = array([
-                [sum(shape * sx), sum(shape * txy)],
-                [sum(shape * txy), sum(shape * sy)]
-            ])
-            bb = array([
-                [shape_dx[0], 0.0, 0.0, shape_dx[1], 0.0, 0.0, shape_dx[2], 0.0, 0.0, shape_dx[3], 0.0, 0.0],
-                [shape_dy[0], 0.0, 0.0, shape_dy[1], 0.0, 0.0, shape_dy[2], 0.0, 0.0, shape_dy[3], 0.0, 0.0]
-            ])
-            bs1 = array([
-                [0.0, shape_dx[0], 0.0, 0.0, shape_dx[1], 0.0, 0.0, shape_dx[2], 0.0, 0.0, shape_dx[3], 0.0],
-                [0.0, shape_dy[0], 0.0, 0.0, shape_dy[1], 0.0, 0.0, shape_dy[2], 0.0, 0.0, shape_dy[3], 0.0]
-            ])
-            bs2 = array([
-                [0.0, 0.0, shape_dx[0], 0.0, 0.0, shape_dx[1], 0.0, 0.0, shape_dx[2], 0.0, 0.0, shape_dx[3]],
-                [0.0, 0.0, shape_dy[0], 0.0, 0.0, shape_dy[1], 0.0, 0.0, shape_dy[2], 0.0, 0.0, shape_dy[3]]
-            ])
-            kg = kg + thickness * bb.transpose().dot(s0).dot(bb) * jacobian * w[i] + thickness ** 3.0 / 12.0 * (
-            bs1.transpose().dot(s0).dot(bs1) + bs2.transpose().dot(s0).dot(bs2)) * jacobian * w[i]
-
-        for i in range(element_dimension):
-            ii = elements[element_index, i / freedom] * freedom + i % freedom
-            for j in range(i, element_dimension):
-                jj = elements[element_index, j / freedom] * freedom + j % freedom
-                geometric[ii, jj] += kg[i, j]
-                if ii != jj:
-                    geometric[jj, ii] = geometric[ii, jj]
-        print_progress(element_index, elements_count - 1)
-    print "\nThe assembly routine is completed"
-    return geometric.tocsr()
+            (jacobian, shape, shape_dx, shape_dy) = iso_quad(element, xi[i], eta[i])
+            bm = zeros((3, element_dimension))
+            bm[0, 0::5] = shape_dx
+            bm[1, 1::5] = shape_dy
+            bm[2, 0::5] = shape_dy
+            bm[2, 1::5] = shape_dx
+            bf = zeros((3, element_dimension))
+            bf[0, 3::5] = shape_dx
+            bf[1, 4::5] = shape_dy
+            bf[2, 3::5] = shape_dy
+            bf[2, 4::5] = shape_dx
+            bc = zeros((2, element_dimension))
+            bc[0, 2::5] = shape_dx
+            bc[0, 3::5] = shape
+            bc[1, 2::5] = shape_dy
+            bc[1, 4::5] = shape
+            coupling = [part + part.transpose() for part in _entries_parts(bm, bf)]
+            for (k, part) in enumerate(_entries_parts(bm, bm) + coupling + _entries_parts(bf, bf)):
+                local[k] += part * jacobian * w[i]
+            shear += bc.transpose().dot(bc) * jacobian * w[i]
+        for k in range(len(names)):
+            add.at(data[k], positions[element_index], local[k].ravel())
+        add.at(shear_data, positions[element_index], shear.ravel())
+        progress(step, elements_count - 1)
+    parts = dict(zip(names, data))
+    parts["shear"] = shear_data
+    return LaminatedPlateAffine(indptr, indices, (dimension, dimension), parts, upper)
 
 
+@timed(RECOVERY)
 def plate_stresses(nodes, elements, elasticity_matrix, displacement, z=0.0):
     from shape_functions import iso_quad, iso_triangle
+    from dtypes import results
     from math import sqrt
     freedom = 3
     element_nodes = len(elements[0, :])
@@ -306,7 +1174,6 @@ def plate_stresses(nodes, elements, elasticity_matrix, displacement, z=0.0):
     tau_yz = zeros(nodes_count)
     mises = zeros(nodes_count)
     adjacent = zeros(nodes_count)
-    print("Recovering stresses")
     for element in elements:
         vertices = nodes[element[:], :]
         el_displ = zeros(element_nodes * freedom)
@@ -347,23 +1214,58 @@ def plate_stresses(nodes, elements, elasticity_matrix, displacement, z=0.0):
     tau_xz /= adjacent
     tau_yz /= adjacent
     mises /= adjacent
-    return sigma_x, sigma_y, tau_xy, tau_xz, tau_yz, mises
+    return tuple(results(values) for values in (sigma_x, sigma_y, tau_xy, tau_xz, tau_yz, mises))
 
 
 
-def assembly_initial_value(stiffness, force, position, value=0.0):
+def assembly_initial_value(stiffness, force, position, value=0.0, upper=False):
     """
     Assembly routine modifies a linear system of equations. Unknown variable at the specified position will be equal to 
     the specified value 
-    :param stiffness: A global matrix (mutable data type) of format CSR
+    :param stiffness: A global matrix (mutable data type) of format CSR or BSR
     :param force: A column-vector (mutable data type)
-    :param position: Number of unknown variable at the linear system  
-    :param value: A value which variable at specified position must be equal
+    :param position: Number of unknown variable at the linear system or an array of numbers (all of them are
+    eliminated in one pass over the matrix)
+    :param value: A value which variable at specified position must be equal (an array of values of positions)
+    :param upper: The matrix is the upper triangle of a symmetric matrix in the CSR format (see
+    solvers.SymmetricOperator): columns of variables are zeroed too and values are lifted to the column-vector
     :return: None
     """
-    from scipy.sparse import  csr_matrix
+    from scipy.sparse import  csr_matrix, bsr_matrix
+    from numpy import ndim, asarray, broadcast_to
+    if upper:
+        if not isinstance(stiffness, csr_matrix):
+            raise ValueError('The upper triangle of a stiffness matrix must be of CSR format.')
+        from numpy import repeat, arange, diff, in1d
+        from solvers import SymmetricOperator
+        positions = asarray(position).ravel()
+        values = broadcast_to(asarray(value, dtype=float), positions.shape)
+        if values.any():
+            prescribed = zeros(stiffness.shape[0])
+            prescribed[positions] = values
+            force -= SymmetricOperator(stiffness).dot(prescribed)
+        # entries of columns are stored in rows above the diagonal
+        rows = repeat(arange(stiffness.shape[0]), diff(stiffness.indptr))
+        in_rows = in1d(rows, positions)
+        stiffness.data[in1d(stiffness.indices, positions) | in_rows] = 0.0
+        stiffness.data[(rows == stiffness.indices) & in_rows] = 1.0
+        force[positions] = values
+        return
+    if ndim(position) > 0:
+        for (each, each_value) in zip(position, broadcast_to(asarray(value, dtype=float), (len(position),))):
+            assembly_initial_value(stiffness, force, each, each_value)
+        return
+    if isinstance(stiffness, bsr_matrix):
+        size = stiffness.blocksize[0]
+        (row, component) = divmod(position, size)
+        (start, end) = (stiffness.indptr[row], stiffness.indptr[row + 1])
+        stiffness.data[start:end, component, :] = 0.0
+        diagonal = start + list(stiffness.indices[start:end]).index(row)
+        stiffness.data[diagonal, component, component] = 1.0
+        force[position] = value
+        return
     if not isinstance(stiffness, csr_matrix):
-        raise ValueError('Stiffness matrix given must be of CSR format.')
+        raise ValueError('Stiffness matrix given must be of CSR or BSR format.')
     stiffness.data[stiffness.indptr[position]:stiffness.indptr[position + 1]] = 0.0
     # dimension = stiffness.shape[0]
     # for j in range(dimension):
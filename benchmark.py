@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from mesh2d import boundary_nodes
+
+
+def _fix(stiffness, force, nodes_indices, freedom, components=None):
+    from assembly2d import assembly_initial_value
+    for i in nodes_indices:
+        for j in (range(freedom) if components is None else components):
+            assembly_initial_value(stiffness, force, freedom * i + j, 0.0)
+
+
+def plane_stress(nodes, elements):
+    """
+    Pipeline of the plane stress analysis: thermal loads, fixed boundary
+    """
+    from assembly2d import assembly_quads_stress_strain, assembly_triangles_stress_strain
+    from force import thermal_force_quads, edge_force_triangles
+    from stress_strain_matrix import plane_stress_isotropic
+    from profiling import phase, BOUNDARY_CONDITIONS, SOLVE
+    from scipy.sparse.linalg import spsolve
+    from numpy import array
+    d = plane_stress_isotropic(1.0, 0.3)
+    if elements.shape[1] == 4:
+        stiffness = assembly_quads_stress_strain(nodes, elements, 1.0, d)
+        force = thermal_force_quads(nodes, elements, 1.0, d, 1.0E-4)
+    else:
+        stiffness = assembly_triangles_stress_strain(nodes, elements, d)
+        force = edge_force_triangles(nodes, elements, 2, lambda point: array([1.0, 0.0]))
+    with phase(BOUNDARY_CONDITIONS):
+        _fix(stiffness, force, boundary_nodes(elements)[::2], 2)
+    with phase(SOLVE):
+        spsolve(stiffness, force)
+
+
+def mindlin(nodes, elements):
+    """
+    Pipeline of the Mindlin plate bending analysis: uniform pressure, clamped boundary, stresses recovery
+    """
+    from assembly2d import assembly_quads_mindlin_plate, plate_stresses
+    from force import volume_force_quads
+    from stress_strain_matrix import plane_stress_isotropic
+    from profiling import phase, BOUNDARY_CONDITIONS, SOLVE
+    from scipy.sparse.linalg import spsolve
+    from numpy import array
+    d = plane_stress_isotropic(203200.0, 0.3)
+    stiffness = assembly_quads_mindlin_plate(nodes, elements, 0.01, d, 2, integration="selective")
+    force = volume_force_quads(nodes, elements, 1.0, 3, lambda point: array([0.05, 0.0, 0.0]), 2)
+    with phase(BOUNDARY_CONDITIONS):
+        _fix(stiffness, force, boundary_nodes(elements), 3)
+    with phase(SOLVE):
+        x = spsolve(stiffness, force)
+    plate_stresses(nodes, elements, d, x, 0.005)
+
+
+def laminated(nodes, elements):
+    """
+    Pipeline of the laminated Mindlin plate analysis: three layers, thermal loads, clamped boundary
+    """
+    from assembly2d import assembly_quads_mindlin_plate_laminated
+    from force import thermal_force_plate_5
+    from stress_strain_matrix import plane_stress_isotropic
+    from profiling import phase, BOUNDARY_CONDITIONS, SOLVE
+    from scipy.sparse.linalg import spsolve
+    thicknesses = [0.004, 0.002, 0.004]
+    matrices = [plane_stress_isotropic(203200.0, 0.3), plane_stress_isotropic(70000.0, 0.33),
+                plane_stress_isotropic(203200.0, 0.3)]
+    stiffness = assembly_quads_mindlin_plate_laminated(nodes, elements, thicknesses, matrices, 2)
+    force = thermal_force_plate_5(nodes, elements, thicknesses, matrices, 1.0E-5, 2)
+    with phase(BOUNDARY_CONDITIONS):
+        _fix(stiffness, force, boundary_nodes(elements), 5)
+    with phase(SOLVE):
+        spsolve(stiffness, force)
+
+
+def geometric(nodes, elements):
+    """
+    Pipeline of the Mindlin plate buckling analysis: uniform compression, clamped boundary, the lowest eigenvalue
+    """
+    from assembly2d import assembly_quads_mindlin_plate, assembly_quads_mindlin_plate_geometric
+    from stress_strain_matrix import plane_stress_isotropic
+    from profiling import phase, BOUNDARY_CONDITIONS, EIGEN
+    from scipy.sparse.linalg import eigsh
+    from numpy import ones, ones_like, zeros, setdiff1d, arange
+    h = 0.01
+    freedom = 3
+    stiffness = assembly_quads_mindlin_plate(nodes, elements, h, plane_stress_isotropic(203200.0, 0.3), 2,
+                                             integration="selective")
+    sigma = ones(len(nodes))
+    geometric_matrix = assembly_quads_mindlin_plate_geometric(nodes, elements, h, sigma, sigma, zeros(len(nodes)), 2)
+    with phase(BOUNDARY_CONDITIONS):
+        fixed = (freedom * boundary_nodes(elements).reshape(-1, 1) + arange(freedom)).ravel()
+        active = setdiff1d(arange(freedom * len(nodes)), fixed)
+        stiffness = stiffness[active, :][:, active]
+        geometric_matrix = geometric_matrix[active, :][:, active]
+    with phase(EIGEN):
+        eigsh(A=stiffness, M=geometric_matrix, k=1, sigma=0.0, which="LM", v0=ones_like(active, dtype=float))
+
+
+PIPELINES = {
+    "plane_stress": plane_stress,
+    "mindlin": mindlin,
+    "laminated": laminated,
+    "geometric": geometric
+}
+
+
+def meshes(sizes, gear=None):
+    """
+    Generator of benchmark meshes
+    :param sizes: A sequence of nodes counts in a direction of structured meshes
+    :param gear: A file of the gear mesh (it is skipped if None)
+    :return: Tuples (mesh name, size, nodes, elements)
+    """
+    from mesh2d import rectangular_quads, rectangular_triangles, annular, read
+    from profiling import phase, MESH_READ
+    for n in sizes:
+        with phase(MESH_READ, "rectangular_quads"):
+            (nodes, elements) = rectangular_quads(n, n, 0.0, 0.0, 1.0, 1.0)
+        yield "quads", n, nodes, elements
+        with phase(MESH_READ, "rectangular_triangles"):
+            (nodes, elements) = rectangular_triangles(n, n, 0.0, 0.0, 1.0, 1.0)
+        yield "triangles", n, nodes, elements
+        with phase(MESH_READ, "annular"):
+            (nodes, elements) = annular(4 * n, n, 0.5, 1.0)
+        yield "annular", n, nodes, elements
+    if gear is not None:
+        (nodes, elements) = read(gear)
+        yield "gear", None, nodes, elements
+
+
+def run(sizes, pipelines=None, gear=None):
+    """
+    Function runs the benchmark
+    :param sizes: A sequence of nodes counts in a direction of structured meshes
+    :param pipelines: Names of pipelines to run (all pipelines by default)
+    :param gear: A file of the gear mesh (it is skipped if None)
+    :return: A list of dictionaries: mesh, size, nodes and elements counts, pipeline and records of phases
+    """
+    from profiling import set_sink, RecordingSink
+    names = sorted(PIPELINES.keys()) if pipelines is None else pipelines
+    sink = RecordingSink()
+    previous = set_sink(sink)
+    results = []
+    try:
+        for (mesh, size, nodes, elements) in meshes(sizes, gear):
+            mesh_records = sink.records
+            sink.records = []
+            for name in names:
+                if elements.shape[1] != 4 and name != "plane_stress":
+                    continue
+                PIPELINES[name](nodes, elements)
+                for record in sink.records:
+                    if record["nnz"] is not None and record["wall_time"]:
+                        record["nnz_per_second"] = record["nnz"] / record["wall_time"]
+                results.append({
+                    "mesh": mesh,
+                    "size": size,
+                    "nodes": len(nodes),
+                    "elements": len(elements),
+                    "pipeline": name,
+                    "phases": mesh_records + sink.records
+                })
+                sink.records = []
+    finally:
+        set_sink(previous)
+    return results
+
+
+def save(results, filename):
+    """
+    Subroutine saves results of the benchmark and a description of the environment to a JSON file
+    """
+    import json
+    import platform
+    import numpy
+    import scipy
+    with open(filename, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "results": results
+        }, f, indent=1, sort_keys=True)
+
+
+def compare(results, filename):
+    """
+    Function compares wall times of phases with previously saved results
+    :param results: Results of the benchmark
+    :param filename: A JSON file of previous results
+    :return: A list of tuples (mesh, size, pipeline, routine, previous wall time, current wall time)
+    """
+    import json
+    with open(filename) as f:
+        previous = json.load(f)["results"]
+
+    def times(items):
+        table = {}
+        for item in items:
+            for record in item["phases"]:
+                key = (item["mesh"], item["size"], item["pipeline"], record["routine"] or record["phase"])
+                table[key] = table.get(key, 0.0) + record["wall_time"]
+        return table
+
+    old = times(previous)
+    new = times(results)
+    return [key + (old[key], new[key]) for key in sorted(new.keys()) if key in old]
+
+
+def report(results):
+    """
+    Subroutine prints a table of results
+    """
+    print("%-10s %5s %8s %-13s %-38s %10s %14s %14s %8s" % ("mesh", "size", "elements", "pipeline", "routine",
+                                                            "time, s", "elements/s", "nnz/s", "+MiB"))
+    for item in results:
+        for record in item["phases"]:
+            print("%-10s %5s %8d %-13s %-38s %10.4f %14s %14s %8s" % (
+                item["mesh"], item["size"], item["elements"], item["pipeline"], record["routine"] or record["phase"],
+                record["wall_time"],
+                "" if record["elements_per_second"] is None else "%.0f" % record["elements_per_second"],
+                "" if record.get("nnz_per_second") is None else "%.0f" % record["nnz_per_second"],
+                "" if record.get("memory_delta") is None else "%.1f" % (record["memory_delta"] / 1048576.0)))
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description="Headless benchmark of the analysis pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[11, 21, 41],
+                        help="nodes counts in a direction of structured meshes")
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(PIPELINES.keys()), help="pipelines to run")
+    parser.add_argument("--gear", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples",
+                                                       "gear.txt"), help="gear mesh file")
+    parser.add_argument("--no-gear", action="store_true", help="skip the gear mesh")
+    parser.add_argument("--output", help="JSON file of results")
+    parser.add_argument("--compare", help="JSON file of previous results")
+    arguments = parser.parse_args()
+    benchmark = run(arguments.sizes, arguments.pipelines, None if arguments.no_gear else arguments.gear)
+    report(benchmark)
+    if arguments.output is not None:
+        save(benchmark, arguments.output)
+    if arguments.compare is not None:
+        print("%-10s %5s %-13s %-38s %10s %10s %8s" % ("mesh", "size", "pipeline", "routine", "before, s", "after, s",
+                                                       "speedup"))
+        for (mesh, size, pipeline, routine, before, after) in compare(benchmark, arguments.compare):
+            print("%-10s %5s %-13s %-38s %10.4f %10.4f %8.2f" % (mesh, size, pipeline, routine, before, after,
+                                                                 before / after if after > 0.0 else float("inf")))
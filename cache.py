@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+_VERSION = "1"  # must be changed when formulations of cached routines change
+
+
+def _update(digest, value):
+    """
+    Subroutine feeds a value (an array, a sequence or a scalar) to a hash function
+    :param digest: A hash object
+    :param value: A value of an argument
+    :return: None
+    """
+    from numpy import ndarray, generic, ascontiguousarray
+    if isinstance(value, generic):
+        value = value.item()
+    if isinstance(value, ndarray):
+        digest.update(("array%s%s" % (value.dtype.str, value.shape)).encode("utf-8"))
+        digest.update(ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(("sequence%d" % len(value)).encode("utf-8"))
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(("%s:%r" % (type(value).__name__, value)).encode("utf-8"))
+
+
+def key(routine, arguments):
+    # type: (str, dict) -> str
+    """
+    Function evaluates a content address of a result of a routine
+    :param routine: A name of the routine
+    :param arguments: A dictionary of arguments: name -> value
+    :return: A hexadecimal SHA-1 digest
+    """
+    from hashlib import sha1
+    digest = sha1(("%s:%s" % (_VERSION, routine)).encode("utf-8"))
+    for name in sorted(arguments.keys()):
+        digest.update(name.encode("utf-8"))
+        _update(digest, arguments[name])
+    return digest.hexdigest()
+
+
+class MatrixCache(object):
+    """
+    On-disk cache of sparse matrices. Each entry is a directory named by a content address that stores arrays of
+    a CSR or BSR matrix as .npy files. Entries are loaded lazily through memory mapping (copy-on-write, so a loaded
+    matrix can be modified in memory). Entries are written to temporary directories and renamed, so concurrent writers
+    never expose incomplete entries. The least recently used entries are evicted when the total size exceeds the limit.
+    """
+    _ARRAYS = ("data", "indices", "indptr", "shape")
+
+    def __init__(self, directory, max_bytes=None):
+        """
+        :param directory: A directory of the cache (it is created if it doesn't exist)
+        :param max_bytes: A limit of the total size of entries (unbounded if None)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+
+    def load(self, address):
+        """
+        Function loads an entry
+        :param address: A content address
+        :return: A CSR or BSR matrix or None if the entry doesn't exist
+        """
+        from numpy import load
+        from scipy.sparse import csr_matrix, bsr_matrix
+        path = os.path.join(self.directory, address)
+        try:
+            arrays = dict((name, load(os.path.join(path, name + ".npy"), mmap_mode="c")) for name in self._ARRAYS)
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        shape = tuple(int(s) for s in arrays["shape"])
+        if arrays["data"].ndim == 3:
+            return bsr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape)
+        return csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape)
+
+    def store(self, address, matrix):
+        """
+        Subroutine stores an entry
+        :param address: A content address
+        :param matrix: A sparse matrix (it is converted to the CSR format unless it is BSR)
+        :return: None
+        """
+        from numpy import save, array
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        if matrix.format != "bsr":
+            matrix = matrix.tocsr()
+        temporary = mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            save(os.path.join(temporary, "data.npy"), matrix.data)
+            save(os.path.join(temporary, "indices.npy"), matrix.indices)
+            save(os.path.join(temporary, "indptr.npy"), matrix.indptr)
+            save(os.path.join(temporary, "shape.npy"), array(matrix.shape))
+            os.rename(temporary, os.path.join(self.directory, address))
+        except OSError:
+            pass  # the same entry has been stored by a concurrent writer
+        finally:
+            if os.path.isdir(temporary):
+                rmtree(temporary, ignore_errors=True)
+        self.evict(keep=address)
+
+    def entries(self):
+        """
+        Function lists entries of the cache
+        :return: A list of tuples (time of the last access, size in bytes, content address)
+        """
+        result = []
+        for address in os.listdir(self.directory):
+            path = os.path.join(self.directory, address)
+            if address.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+                result.append((os.path.getmtime(path), size, address))
+            except OSError:
+                continue  # the entry has been evicted by a concurrent process
+        return result
+
+    def evict(self, keep=None):
+        """
+        Subroutine removes the least recently used entries while the total size exceeds the limit
+        :param keep: A content address that must not be removed
+        :return: None
+        """
+        from shutil import rmtree
+        if self.max_bytes is None:
+            return
+        entries = sorted(self.entries())
+        total = sum(size for (accessed, size, address) in entries)
+        for (accessed, size, address) in entries:
+            if total <= self.max_bytes:
+                break
+            if address == keep:
+                continue
+            rmtree(os.path.join(self.directory, address), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        from shutil import rmtree
+        for (accessed, size, address) in self.entries():
+            rmtree(os.path.join(self.directory, address), ignore_errors=True)
+
+
+_cache = MatrixCache(os.environ["PYFEM_CACHE_DIR"]) if os.environ.get("PYFEM_CACHE_DIR") else None
+
+
+def enable(directory, max_bytes=None):
+    """
+    Routine enables the cache of assembled matrices (the cache is disabled by default or enabled by the environment
+    variable PYFEM_CACHE_DIR)
+    :param directory: A directory of the cache
+    :param max_bytes: A limit of the total size of entries (unbounded if None)
+    :return: The cache
+    """
+    global _cache
+    _cache = MatrixCache(directory, max_bytes)
+    return _cache
+
+
+def disable():
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    return _cache
+
+
+def pattern_kind(pattern, blocks=False, upper=False):
+    """
+    Function tells a kind of a sparsity pattern, which defines the format of an assembled matrix
+    :param pattern: A pattern (see assembly2d.sparsity_pattern, assembly2d.block_pattern) or None
+    :param blocks: The kind of a pattern built by a routine if it isn't given
+    :param upper: The kind of a pattern built by a routine if it isn't given
+    :return: "block" - a pattern of blocks (a BSR matrix), "upper" - a pattern of the upper triangle, "scalar" -
+    a pattern of the full matrix
+    """
+    from numpy import repeat, arange, diff
+    if pattern is None:
+        return "block" if blocks else "upper" if upper else "scalar"
+    (indptr, indices, positions) = pattern
+    # positions of a block pattern address values of blocks, freedom^2 values per an index
+    if len(indices) and positions.max() >= len(indices):
+        return "block"
+    rows = repeat(arange(len(indptr) - 1), diff(indptr))
+    return "upper" if (indices >= rows).all() else "scalar"
+
+
+def cached(routine):
+    """
+    Decorator makes an assembly routine consult the cache: a result is addressed by the name of the routine and
+    the values of all arguments (nodes, elements, material matrices, thicknesses, orders of quadratures, etc.) except
+    a precomputed sparsity pattern and an order of elements, which don't change the result; only the kind of
+    the pattern (see pattern_kind) is a part of the address, it replaces the arguments blocks and upper
+    :param routine: A routine that returns a sparse matrix
+    :return: Decorated routine
+    """
+    from functools import wraps
+    from inspect import getcallargs
+
+    @wraps(routine)
+    def wrapper(*args, **kwargs):
+        if _cache is None:
+            return routine(*args, **kwargs)
+        arguments = getcallargs(routine, *args, **kwargs)
+        if "pattern" in arguments:
+            arguments["pattern"] = pattern_kind(arguments["pattern"], arguments.pop("blocks", False),
+                                                arguments.pop("upper", False))
+        arguments.pop("order", None)
+        address = key(routine.__name__, arguments)
+        matrix = _cache.load(address)
+        if matrix is None:
+            matrix = routine(*args, **kwargs)
+            _cache.store(address, matrix)
+        return matrix
+
+    wrapper.__wrapped__ = routine
+    return wrapper
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from profiling import phase, BOUNDARY_CONDITIONS, SOLVE, EIGEN
+
+
+def _rotation(angle):
+    from numpy import array, cos, sin
+    return array([
+        [cos(angle), -sin(angle)],
+        [sin(angle), cos(angle)]
+    ])
+
+
+def cyclic_pairs(nodes, sectors, tolerance=1.0E-8):
+    """
+    Function matches nodes of the cut boundaries of a sector of a rotationally periodic structure: the image of a node
+    of the first cut under the rotation by 2 * pi / sectors about the origin is a node of the second cut
+    :param nodes: A two-dimensional array of coordinates of the sector
+    :param sectors: A count of sectors of the structure (at least 3)
+    :param tolerance: A tolerance of coincidence relative to the size of the sector
+    :return: Tuple: masters - nodes of the first cut, slaves - their images on the second cut
+    """
+    from numpy import pi, arange, isfinite, any
+    from scipy.spatial import cKDTree
+    if sectors < 3:
+        raise ValueError("At least 3 sectors are required")
+    points = nodes[:, :2].astype(float)
+    size = (points.max(axis=0) - points.min(axis=0)).max()
+    rotated = points.dot(_rotation(2.0 * pi / sectors).transpose())
+    (distances, images) = cKDTree(points).query(rotated, distance_upper_bound=tolerance * size)
+    matched = isfinite(distances)
+    (masters, slaves) = (arange(len(points))[matched], images[matched])
+    if any(masters == slaves):
+        raise ValueError("Nodes on the axis of rotation are not supported")
+    return masters, slaves
+
+
+def _harmonic_modes(arguments):
+    """
+    Worker function solves the eigenvalue problem of a harmonic index
+    :return: Tuple: the harmonic index, eigenvalues, eigenvectors in freedoms of the sector
+    """
+    (symmetry, stiffness, matrix, harmonic, count, sigma) = arguments
+    from scipy.sparse.linalg import eigsh, eigs
+    from numpy import ones
+    t = symmetry.transformation(harmonic)
+    a = (t.conj().transpose().dot(stiffness).dot(t)).tocsc()
+    b = (t.conj().transpose().dot(matrix).dot(t)).tocsc()
+    count = min(count, a.shape[0] - 2)
+    if a.dtype.kind == "c":
+        (values, vectors) = eigs(A=a, M=b, k=count, sigma=sigma, which="LM", v0=ones(a.shape[0], dtype=a.dtype))
+        values = values.real
+    else:
+        (values, vectors) = eigsh(A=a, M=b, k=count, sigma=sigma, which="LM", v0=ones(a.shape[0]))
+    order = values.argsort()
+    return harmonic, values[order], t.dot(vectors[:, order])
+
+
+class CyclicSymmetry(object):
+    """
+    Cyclic symmetry of a rotationally periodic structure (e.g. a gear) modeled by one sector: freedoms of nodes of the
+    second cut (slaves) are expressed by freedoms of nodes of the first cut (masters). A displacement field of the
+    harmonic index k satisfies u_slave = exp(i * k * alpha) * Q(alpha) * u_master, alpha = 2 * pi / sectors, Q rotates
+    vector freedoms. The matrix of the harmonic index is T_k^H K T_k, K is a matrix of the sector, so:
+    - static problems with loads repeated in each sector are the real problem k = 0;
+    - spectra of modal and buckling problems are the union of spectra of harmonic indices k = 0, ..., sectors // 2
+    solved independently (complex Hermitian matrices for 0 < k < sectors / 2).
+        symmetry = CyclicSymmetry(nodes, elements, 18, 3, components=(1, 2), fixed=clamped)
+        x = symmetry.solve(assembly_quads_mindlin_plate(nodes, elements, h, d), force)
+        (full_nodes, full_elements, full_x) = symmetry.expand(x)
+    """
+    def __init__(self, nodes, elements, sectors, freedom, components=None, fixed=(), tolerance=1.0E-8):
+        """
+        :param nodes: A two-dimensional array of coordinates of the sector
+        :param elements: A two-dimensional array of elements of the sector
+        :param sectors: A count of sectors of the structure
+        :param freedom: A count of freedoms in each node
+        :param components: Indices of components (x, y) of the vector freedom of a node: (0, 1) for the plane stress,
+        (1, 2) for Mindlin plates, None if all freedoms are scalar (e.g. deflections or temperatures)
+        :param fixed: Indices of prescribed (zero) freedoms of the sector
+        :param tolerance: A tolerance of matching of nodes of cuts relative to the size of the sector
+        """
+        from numpy import asarray, unique
+        self.nodes = nodes
+        self.elements = elements
+        self.sectors = sectors
+        self.freedom = freedom
+        self.components = components
+        self.fixed = unique(asarray(fixed, dtype=int))
+        with phase(BOUNDARY_CONDITIONS, "cyclic_pairs"):
+            (self.masters, self.slaves) = cyclic_pairs(nodes, sectors, tolerance)
+
+    @property
+    def angle(self):
+        from numpy import pi
+        return 2.0 * pi / self.sectors
+
+    def _coupling(self):
+        """
+        Function evaluates coefficients of the periodic coupling of slave freedoms with master freedoms (without phases)
+        :return: Tuple of arrays: rows (slave freedoms), columns (master freedoms), values
+        """
+        from numpy import concatenate, arange, full
+        freedom = self.freedom
+        (rows, columns, values) = ([], [], [])
+        scalar = [c for c in range(freedom) if self.components is None or c not in self.components]
+        for c in scalar:
+            rows.append(freedom * self.slaves + c)
+            columns.append(freedom * self.masters + c)
+            values.append(full(len(self.slaves), 1.0))
+        if self.components is not None:
+            q = _rotation(self.angle)
+            for (a, row) in enumerate(self.components):
+                for (b, column) in enumerate(self.components):
+                    rows.append(freedom * self.slaves + row)
+                    columns.append(freedom * self.masters + column)
+                    values.append(full(len(self.slaves), q[a, b]))
+        if not rows:
+            return arange(0), arange(0), arange(0, dtype=float)
+        return concatenate(rows), concatenate(columns), concatenate(values)
+
+    def independent(self):
+        """
+        :return: An array of independent freedoms of the sector: freedoms of all nodes but slaves, except prescribed
+        freedoms and master freedoms coupled with prescribed slave freedoms
+        """
+        from numpy import ones, arange
+        (rows, columns, values) = self._coupling()
+        dimension = self.freedom * len(self.nodes)
+        keep = ones(dimension, dtype=bool)
+        keep[(self.freedom * self.slaves[:, None] + arange(self.freedom)).ravel()] = False
+        keep[self.fixed] = False
+        free = ones(dimension, dtype=bool)
+        free[self.fixed] = False
+        keep[columns[~free[rows] & (values != 0.0)]] = False
+        return arange(dimension)[keep]
+
+    def transformation(self, harmonic=0):
+        """
+        Function evaluates the transformation of independent freedoms to all freedoms of the sector
+        :param harmonic: A harmonic index
+        :return: A CSR matrix [freedom * nodes_count; len(independent())], it is real for k = 0 and k = sectors / 2
+        """
+        from numpy import exp, concatenate, arange, full, empty, cos, pi
+        from scipy.sparse import csr_matrix
+        independent = self.independent()
+        dimension = self.freedom * len(self.nodes)
+        column_of = full(dimension, -1)
+        column_of[independent] = arange(len(independent))
+        (rows, columns, values) = self._coupling()
+        used = (column_of[columns] >= 0) & (values != 0.0)
+        (rows, columns, values) = (rows[used], column_of[columns[used]], values[used])
+        if (2 * harmonic) % self.sectors == 0:
+            phase_factor = cos(pi * 2 * harmonic / self.sectors)
+        else:
+            phase_factor = exp(1j * harmonic * self.angle)
+        data = empty(len(independent) + len(values), dtype=type(phase_factor * 1.0))
+        data[:len(independent)] = 1.0
+        data[len(independent):] = phase_factor * values
+        return csr_matrix((data, (concatenate((independent, rows)), concatenate((arange(len(independent)), columns)))),
+                          shape=(dimension, len(independent)))
+
+    def reduce(self, matrix, harmonic=0):
+        """
+        :param matrix: A matrix of the sector (stiffness, geometric, mass)
+        :param harmonic: A harmonic index
+        :return: The matrix of the harmonic index in independent freedoms: T^H K T
+        """
+        t = self.transformation(harmonic)
+        return t.conj().transpose().dot(matrix).dot(t).tocsr()
+
+    def solve(self, stiffness, force):
+        """
+        Function solves the static problem with loads repeated in each sector
+        :param stiffness: The stiffness matrix of the sector
+        :param force: The force vector of the sector (assembled over elements of the sector, so loads of cut nodes are
+        shared by masters and slaves)
+        :return: Displacements of the sector (slaves included)
+        """
+        from scipy.sparse.linalg import spsolve
+        t = self.transformation(0)
+        with phase(SOLVE, "CyclicSymmetry"):
+            return t.dot(spsolve(t.transpose().dot(stiffness).dot(t).tocsc(), t.transpose().dot(force)))
+
+    def modes(self, stiffness, matrix, count=6, harmonics=None, sigma=0.0, processes=1):
+        """
+        Function solves the eigenvalue problem K x = lambda B x for harmonic indices (in parallel processes)
+        :param stiffness: The stiffness matrix of the sector
+        :param matrix: The mass or geometric matrix of the sector
+        :param count: A count of eigenvalues of each harmonic index (nearest to the shift)
+        :param harmonics: A sequence of harmonic indices (0, ..., sectors // 2 by default)
+        :param sigma: The shift
+        :param processes: A count of worker processes (None - a count of CPUs, 1 - in this process)
+        :return: A dictionary: harmonic index -> tuple: eigenvalues (ascending), eigenvectors in freedoms of the sector
+        (columns, complex for 0 < k < sectors / 2)
+        """
+        harmonics = range(self.sectors // 2 + 1) if harmonics is None else harmonics
+        tasks = [(self, stiffness, matrix, harmonic, count, sigma) for harmonic in harmonics]
+        with phase(EIGEN, "CyclicSymmetry (%d harmonics)" % len(tasks)):
+            if processes == 1:
+                results = [_harmonic_modes(task) for task in tasks]
+            else:
+                from multiprocessing import Pool
+                pool = Pool(processes)
+                try:
+                    results = pool.map(_harmonic_modes, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
+        return dict((harmonic, (values, vectors)) for (harmonic, values, vectors) in results)
+
+    def expand(self, values=None, harmonic=0):
+        """
+        Function expands the sector to the full structure: slave nodes of a sector are master nodes of the next one
+        :param values: Freedoms of the sector (e.g. a solution or a mode) or None
+        :param harmonic: A harmonic index of values
+        :return: Tuple: nodes, elements, values (real parts, None if values is None) of the full structure
+        """
+        from numpy import ones, arange, cumsum, vstack, concatenate, exp, asarray, zeros
+        nodes_count = len(self.nodes)
+        kept = ones(nodes_count, dtype=bool)
+        kept[self.slaves] = False
+        kept_count = int(kept.sum())
+        index = cumsum(kept) - 1
+        full_nodes = []
+        full_elements = []
+        full_values = []
+        if values is not None:
+            values = asarray(values).reshape(nodes_count, self.freedom)
+        for sector in range(self.sectors):
+            rotation = _rotation(sector * self.angle)
+            full_nodes.append(self.nodes[kept, :2].dot(rotation.transpose()))
+            numbering = sector * kept_count + index
+            numbering[self.slaves] = ((sector + 1) % self.sectors) * kept_count + index[self.masters]
+            full_elements.append(numbering[self.elements])
+            if values is not None:
+                sector_values = exp(1j * harmonic * sector * self.angle) * values[kept]
+                if self.components is not None:
+                    sector_values[:, self.components] = sector_values[:, self.components].dot(rotation.transpose())
+                full_values.append(sector_values.real)
+        return vstack(full_nodes), vstack(full_elements), \
+            (concatenate(full_values).ravel() if values is not None else None)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from profiling import phase, ASSEMBLY, SOLVE
+
+
+def _block(matrix, rows, columns):
+    """
+    Function extracts a block of a sparse matrix (empty sets of indices are allowed)
+    :return: The block in the CSR sparse format
+    """
+    from scipy.sparse import csr_matrix
+    if len(rows) == 0 or len(columns) == 0:
+        return csr_matrix((len(rows), len(columns)))
+    return matrix[rows, :][:, columns].tocsr()
+
+
+def _local_schur(lu, k_bi, k_ib, k_bb, chunk=64):
+    """
+    Function evaluates the Schur complement S = K_bb - K_bi * K_ii^-1 * K_ib of a subdomain as a dense matrix (a column
+    costs a solve by the interior factorization)
+    :return: A dense matrix [interface_count; interface_count]
+    """
+    schur = k_bb.toarray()
+    if lu is not None:
+        for start in range(0, schur.shape[1], chunk):
+            batch = slice(start, start + chunk)
+            schur[:, batch] -= k_bi.dot(lu.solve(k_ib[:, batch].toarray()))
+    return schur
+
+
+def _subdomain(connection, nodes, elements, freedom, assembly, interior, interface, fixed, tolerance=1.0E-8):
+    """
+    Worker process of a subdomain: it assembles the stiffness matrix of the subdomain, factors the interior block,
+    evaluates the pseudo-inverse of its Schur complement (the Neumann problem of the preconditioner) and serves requests
+    of the master process. Only vectors of interface freedoms (and the interior solution at the end) are passed through
+    the pipe
+    :param connection: An end of a pipe
+    :param nodes: Nodes of the subdomain
+    :param elements: Elements of the subdomain (local numbering of nodes)
+    :param freedom: A count of freedoms in each node
+    :param assembly: A function assembly(nodes, elements) that returns the stiffness matrix of a mesh
+    :param interior: Local indices of interior freedoms
+    :param interface: Local indices of interface freedoms
+    :param fixed: Local indices of prescribed freedoms
+    :param tolerance: Eigenvalues of the Schur complement below tolerance * the maximal eigenvalue span its kernel
+    (rigid body motions of a floating subdomain)
+    """
+    from scipy.sparse.linalg import splu
+    from numpy.linalg import eigh
+    from profiling import set_sink, SilentSink
+    set_sink(SilentSink())
+    try:
+        stiffness = assembly(nodes, elements).tocsr()
+        k_if = _block(stiffness, interior, fixed)
+        k_bi = _block(stiffness, interface, interior)
+        k_ib = _block(stiffness, interior, interface)
+        k_bb = _block(stiffness, interface, interface)
+        k_bf = _block(stiffness, interface, fixed)
+        lu = splu(_block(stiffness, interior, interior).tocsc()) if len(interior) else None
+        del stiffness
+        schur = _local_schur(lu, k_bi, k_ib, k_bb)
+        (eigenvalues, eigenvectors) = eigh(schur)
+        kernel = eigenvalues <= tolerance * (eigenvalues.max() if len(eigenvalues) else 0.0)
+        pseudo_inverse = (eigenvectors[:, ~kernel] / eigenvalues[~kernel]).dot(eigenvectors[:, ~kernel].transpose())
+        connection.send(("ready", (schur.diagonal(), eigenvectors[:, kernel])))
+        del schur, eigenvectors
+    except Exception as e:
+        connection.send(("error", repr(e)))
+        return
+
+    def interior_solve(values):
+        return lu.solve(values) if lu is not None else values
+
+    force = None
+    scaling = None
+    while True:
+        (request, values) = connection.recv()
+        if request == "rhs":
+            (force, prescribed) = values
+            force = force - k_if.dot(prescribed)
+            connection.send(-k_bf.dot(prescribed) - k_bi.dot(interior_solve(force)))
+        elif request == "apply":
+            connection.send(k_bb.dot(values) - k_bi.dot(interior_solve(k_ib.dot(values))))
+        elif request == "recover":
+            connection.send(interior_solve(force - k_ib.dot(values)))
+        elif request == "scaling":
+            scaling = values
+            connection.send(None)
+        elif request == "precondition":
+            connection.send(scaling * pseudo_inverse.dot(scaling * values))
+        else:
+            connection.close()
+            return
+
+
+class DecomposedSolver(object):
+    """
+    Non-overlapping domain decomposition solver: elements are partitioned into subdomains (recursive coordinate
+    bisection), each subdomain is assembled and its interior is factored in a separate worker process, the interface
+    problem (the Schur complement system) is solved by the conjugate gradient method with the balancing Neumann-Neumann
+    preconditioner: each subdomain solves its Neumann problem (the pseudo-inverse of its Schur complement) for
+    the residual weighted by stiffness scaling, kernels of floating subdomains (rigid body motions) span a coarse space
+    that is solved exactly. The global matrix is never assembled, so memory is spread over subdomains:
+        with DecomposedSolver(nodes, elements, 3, lambda n, e: assembly_quads_mindlin_plate(n, e, h, d), 4, fixed) as s:
+            (x, info) = s.solve(force)
+    """
+    def __init__(self, nodes, elements, freedom, assembly, parts, fixed=(), labels=None):
+        """
+        :param nodes: A two-dimensional array of coordinates
+        :param elements: A two-dimensional array of elements
+        :param freedom: A count of freedoms in each node
+        :param assembly: A function assembly(nodes, elements) that returns the stiffness matrix of a mesh. It's
+        inherited by worker processes, so it may be a lambda or a closure
+        :param parts: A count of subdomains (worker processes)
+        :param fixed: Indices of prescribed freedoms
+        :param labels: Indices of subdomains of elements (the recursive coordinate bisection by default)
+        """
+        from multiprocessing import Process, Pipe
+        from numpy import unique, zeros, arange, asarray, searchsorted, in1d, add, hstack
+        from numpy.linalg import inv
+        from partition import recursive_coordinate_bisection, interface_nodes
+        self.dimension = freedom * len(nodes)
+        if labels is None:
+            labels = recursive_coordinate_bisection(nodes, elements, parts)
+        self.fixed = unique(asarray(fixed, dtype=int))
+        shared = interface_nodes(elements, labels)
+        interface = (freedom * shared[:, None] + arange(freedom)).ravel()
+        self.interface = interface[~in1d(interface, self.fixed)]
+        self.subdomains = []
+        self.connections = []
+        self.processes = []
+        try:
+            for part in range(labels.max() + 1):
+                subdomain_elements = elements[labels == part]
+                used = unique(subdomain_elements)
+                dofs = (freedom * used[:, None] + arange(freedom)).ravel()
+                is_fixed = in1d(dofs, self.fixed)
+                is_interface = in1d(dofs, self.interface)
+                local = arange(len(dofs))
+                interior = local[~is_fixed & ~is_interface]
+                boundary = local[is_interface]
+                prescribed = local[is_fixed]
+                self.subdomains.append({
+                    "interior": dofs[interior],
+                    "interface": searchsorted(self.interface, dofs[boundary]),
+                    "fixed": dofs[prescribed]
+                })
+                (master, worker) = Pipe()
+                process = Process(target=_subdomain, args=(worker, nodes[used], searchsorted(used, subdomain_elements),
+                                                           freedom, assembly, interior, boundary, prescribed))
+                process.daemon = True
+                process.start()
+                self.connections.append(master)
+                self.processes.append(process)
+            diagonal = zeros(len(self.interface))
+            kernels = []
+            with phase(ASSEMBLY, "DecomposedSolver", len(elements)):
+                for (subdomain, connection) in zip(self.subdomains, self.connections):
+                    (status, values) = connection.recv()
+                    if status != "ready":
+                        raise RuntimeError("Subdomain failed: " + values)
+                    add.at(diagonal, subdomain["interface"], values[0])
+                    kernels.append(values)
+                # the stiffness scaling is a partition of unity on the interface
+                scalings = [values[0] / diagonal[subdomain["interface"]]
+                            for (subdomain, values) in zip(self.subdomains, kernels)]
+                self._exchange("scaling", scalings)
+                coarse = []
+                for (subdomain, scaling, (values, kernel)) in zip(self.subdomains, scalings, kernels):
+                    columns = zeros((len(self.interface), kernel.shape[1]))
+                    columns[subdomain["interface"]] = scaling[:, None] * kernel
+                    coarse.append(columns)
+                self.coarse = hstack(coarse) if coarse else zeros((len(self.interface), 0))
+                self.coarse_schur = self._schur(self.coarse)
+                self.coarse_inverse = inv(self.coarse.transpose().dot(self.coarse_schur))
+        except BaseException:
+            self.close()
+            raise
+
+    def _exchange(self, request, values):
+        """
+        Function sends a request to all subdomains and receives their replies (subdomains work concurrently)
+        :param values: A list of values for each subdomain
+        :return: A list of replies
+        """
+        for (connection, value) in zip(self.connections, values):
+            connection.send((request, value))
+        return [connection.recv() for connection in self.connections]
+
+    def _schur(self, vector):
+        """
+        :param vector: A vector of interface freedoms or a matrix of vectors (a column per vector)
+        :return: Products of the Schur complement by vectors
+        """
+        from numpy import zeros, add
+        result = zeros((len(self.interface),) + vector.shape[1:])
+        replies = self._exchange("apply", [vector[subdomain["interface"]] for subdomain in self.subdomains])
+        for (subdomain, reply) in zip(self.subdomains, replies):
+            add.at(result, subdomain["interface"], reply)
+        return result
+
+    def _precondition(self, residual):
+        """
+        Function applies the balancing Neumann-Neumann preconditioner: Q r + P M P^T r, M is the sum of Neumann problems
+        of subdomains, Q = Z (Z^T S Z)^-1 Z^T is the coarse solution, P = I - Q S
+        """
+        from numpy import zeros, add
+        coarse = self.coarse_inverse.dot(self.coarse.transpose().dot(residual))
+        balanced = residual - self.coarse_schur.dot(coarse)
+        result = zeros(len(self.interface))
+        replies = self._exchange("precondition", [balanced[subdomain["interface"]] for subdomain in self.subdomains])
+        for (subdomain, reply) in zip(self.subdomains, replies):
+            add.at(result, subdomain["interface"], reply)
+        result -= self.coarse.dot(self.coarse_inverse.dot(self.coarse_schur.transpose().dot(result)))
+        return result + self.coarse.dot(coarse)
+
+    def solve(self, force, values=0.0, tol=1.0E-10, maxiter=None):
+        """
+        Function solves the system for a right-hand side
+        :param force: A global force vector
+        :param values: Prescribed values of fixed freedoms: a scalar or an array of the length of fixed
+        :param tol: A relative tolerance of the interface problem
+        :param maxiter: A maximal count of iterations (10 counts of interface freedoms, at least 1000, by default)
+        :return: Tuple: the solution, a dictionary: converged, iterations, residual (relative), interface (a count of
+        interface freedoms), subdomains, coarse (a dimension of the coarse space). A RuntimeWarning is issued if
+        the interface problem didn't converge
+        """
+        from numpy import add, sqrt, dot, asarray, zeros
+        from warnings import warn
+        solution = zeros(self.dimension)
+        solution[self.fixed] = asarray(values, dtype=float)
+        with phase(SOLVE, "DecomposedSolver"):
+            rhs = force[self.interface].astype(float)
+            replies = self._exchange("rhs", [(force[subdomain["interior"]], solution[subdomain["fixed"]])
+                                             for subdomain in self.subdomains])
+            for (subdomain, reply) in zip(self.subdomains, replies):
+                add.at(rhs, subdomain["interface"], reply)
+            # the coarse component of the solution is exact, residuals stay orthogonal to the coarse space
+            coarse = self.coarse_inverse.dot(self.coarse.transpose().dot(rhs))
+            u = self.coarse.dot(coarse)
+            r = rhs - self.coarse_schur.dot(coarse)
+            norm = sqrt(dot(rhs, rhs))
+            norm = 1.0 if norm == 0.0 else norm
+            z = self._precondition(r)
+            p = z.copy()
+            rz = dot(r, z)
+            iteration = 0
+            limit = max(10 * len(self.interface), 1000) if maxiter is None else maxiter
+            while sqrt(dot(r, r)) > tol * norm and iteration < limit:
+                q = self._schur(p)
+                alpha = rz / dot(p, q)
+                u += alpha * p
+                r -= alpha * q
+                z = self._precondition(r)
+                rz_next = dot(r, z)
+                p = z + rz_next / rz * p
+                rz = rz_next
+                iteration += 1
+            residual = sqrt(dot(r, r)) / norm
+            if residual > tol:
+                warn("The interface problem didn't converge in %d iterations (the residual %.3e)" % (
+                    iteration, residual), RuntimeWarning)
+            solution[self.interface] = u
+            replies = self._exchange("recover", [u[subdomain["interface"]] for subdomain in self.subdomains])
+            for (subdomain, reply) in zip(self.subdomains, replies):
+                solution[subdomain["interior"]] = reply
+        return solution, {
+            "converged": residual <= tol,
+            "iterations": iteration,
+            "residual": residual,
+            "interface": len(self.interface),
+            "subdomains": len(self.subdomains),
+            "coarse": self.coarse.shape[1]
+        }
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (IOError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from numpy import int32, int64, float32, float64, iinfo
+
+_MAX_FREEDOM = 8  # connectivity is compact if indices of freedoms of nodes fit as well
+_policy = {
+    "indices": "auto",
+    "coordinates": float64,
+    "results": float64
+}
+
+
+def set_policy(indices=None, coordinates=None, results=None):
+    """
+    Routine changes the global dtype policy. Assembly and solution are always performed in float64, the policy
+    affects storage only
+    :param indices: "auto" - int32 connectivity and indices of sparse matrices when they fit, int64 otherwise;
+    "int64" - int64 always
+    :param coordinates: A dtype of coordinates of nodes made by mesh generators (float64 or float32)
+    :param results: A dtype of recovered fields (float64 or float32)
+    :return: The previous policy (a dictionary)
+    """
+    previous = get_policy()
+    if indices is not None:
+        if indices not in ("auto", "int64"):
+            raise ValueError("Unknown indices policy: " + str(indices))
+        _policy["indices"] = indices
+    if coordinates is not None:
+        _policy["coordinates"] = _floating(coordinates)
+    if results is not None:
+        _policy["results"] = _floating(results)
+    return previous
+
+
+def get_policy():
+    return dict(_policy)
+
+
+def _floating(dtype):
+    from numpy import dtype as numpy_dtype
+    if numpy_dtype(dtype) not in (numpy_dtype(float32), numpy_dtype(float64)):
+        raise ValueError("Only float32 and float64 are supported: " + str(dtype))
+    return numpy_dtype(dtype).type
+
+
+class policy(object):
+    """
+    Context manager changes the dtype policy for a block, e.g. a mesh of a large model:
+        with policy(coordinates=float32):
+            (nodes, elements) = rectangular_quads(3001, 3001, 0.0, 0.0, 1.0, 1.0)
+    """
+    def __init__(self, indices=None, coordinates=None, results=None):
+        self.arguments = (indices, coordinates, results)
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = set_policy(*self.arguments)
+        return get_policy()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _policy.update(self.previous)
+        return False
+
+
+def index_dtype(max_value):
+    """
+    :param max_value: A maximal value of indices
+    :return: int32 if the value fits it and the policy allows, int64 otherwise
+    """
+    if _policy["indices"] == "auto" and max_value <= iinfo(int32).max:
+        return int32
+    return int64
+
+
+def connectivity_dtype(nodes_count):
+    """
+    :param nodes_count: A count of nodes of a mesh
+    :return: A dtype of elements arrays
+    """
+    return index_dtype(_MAX_FREEDOM * nodes_count)
+
+
+def coordinates_dtype():
+    return _policy["coordinates"]
+
+
+def results_dtype():
+    return _policy["results"]
+
+
+def indices(values, max_value=None):
+    """
+    Function converts an array of indices to the dtype of the policy (the array is returned as is if it is of the dtype)
+    :param values: An array of indices
+    :param max_value: A maximal value of indices (the maximum of values by default)
+    :return: An array of indices
+    """
+    if max_value is None:
+        max_value = values.max() if values.size else 0
+    return values.astype(index_dtype(max_value), copy=False)
+
+
+def results(values):
+    """
+    Function converts recovered fields to the dtype of the policy
+    :param values: An array of values
+    :return: An array of values
+    """
+    return values.astype(_policy["results"], copy=False)
@@ -29,7 +29,7 @@ if __name__ == "__main__":
     ])
     (nodes, elements) = read('gear.txt')
 
-    stiffness = assembly_quads_mindlin_plate(nodes, elements, h, df, 5)
+    stiffness = assembly_quads_mindlin_plate(nodes, elements, h, df, 2, integration="mitc4")
 
     nodes_count = len(nodes)
     dimension = freedom * nodes_count
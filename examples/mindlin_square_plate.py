@@ -11,6 +11,7 @@ if __name__ == "__main__":
     from force import volume_force_quads
     from scipy.sparse.linalg import spsolve
     from numpy import array
+    from profiling import phase, BOUNDARY_CONDITIONS, SOLVE
 
     a = 1.0 # A side of a square plate
     h = 0.01 # A thickness of a square plate
@@ -22,22 +23,19 @@ if __name__ == "__main__":
 
     stiffness = assembly_quads_mindlin_plate(nodes, elements, h, plane_stress_isotropic(e, nu))
 
-    print("Evaluating force...")
-
     def force_func(node): return array([q, 0.0, 0.0])
 
     force = volume_force_quads(nodes=nodes, elements=elements, thickness=1.0, freedom=3, force_function=force_func, gauss_order=3)
 
-    print("Evaluating boundary conditions...")
-    for i in range(len(nodes)):
-        if (abs(nodes[i, 0] - 0) < 0.0000001) or (abs(nodes[i, 0] - a) < 0.0000001) or (abs(nodes[i, 1] - 0) < 0.0000001) or (abs(nodes[i, 1] - a) < 0.0000001):
-            assembly_initial_value(stiffness, force, 3 * i, 0.0)
-            assembly_initial_value(stiffness, force, 3 * i + 1, 0.0)
-            assembly_initial_value(stiffness, force, 3 * i + 2, 0.0)
-
-    print("Solving a system of linear equations")
+    with phase(BOUNDARY_CONDITIONS):
+        for i in range(len(nodes)):
+            if (abs(nodes[i, 0] - 0) < 0.0000001) or (abs(nodes[i, 0] - a) < 0.0000001) or (abs(nodes[i, 1] - 0) < 0.0000001) or (abs(nodes[i, 1] - a) < 0.0000001):
+                assembly_initial_value(stiffness, force, 3 * i, 0.0)
+                assembly_initial_value(stiffness, force, 3 * i + 1, 0.0)
+                assembly_initial_value(stiffness, force, 3 * i + 2, 0.0)
 
-    x = spsolve(stiffness, force)
+    with phase(SOLVE):
+        x = spsolve(stiffness, force)
 
     w = x[0::3]
     theta_x = x[1::3]
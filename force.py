@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from numpy import zeros
+from profiling import timed, LOADS
 
 
+@timed(LOADS)
 def nodal_force(nodes, freedom, force_function):
     """
     Assembly routine for nodal forces processing
@@ -20,6 +22,28 @@ def nodal_force(nodes, freedom, force_function):
     return force
 
 
+@timed(LOADS)
+def point_force(nodes, elements, freedom, points, forces, index=None):
+    """
+    Assembly routine for concentrated forces at arbitrary points: a force is distributed to nodes of the element that
+    contains its point by shape functions (work-equivalent nodal forces, a force at a node is applied to the node)
+    :param nodes: A two dimensional array of coordinates
+    :param elements: A two dimensional array of elements
+    :param freedom: A count of freedoms in each node
+    :param points: An array of points of forces [points_count; 2]
+    :param forces: An array of forces [points_count; freedom]
+    :param index: A spatial index of the mesh (see spatial.SpatialIndex) or None
+    :return: An array of values
+    """
+    from numpy import asarray
+    from spatial import SpatialIndex
+    index = SpatialIndex(nodes, elements) if index is None else index
+    (matrix, found) = index.interpolation_matrix(points)
+    if (found < 0).any():
+        raise ValueError("Points are outside the mesh: " + str(asarray(points)[found < 0].tolist()))
+    return matrix.transpose().dot(asarray(forces, dtype=float).reshape(len(found), freedom)).ravel()
+
+
 def interval(func, a, b, gauss_order):
     """
     This routine integrates a function over an interval [a; b] using Gauss-Legendre rules
@@ -41,6 +65,7 @@ def interval(func, a, b, gauss_order):
     return [s0, s1]
 
 
+@timed(LOADS)
 def edge_force_quads(nodes, elements, freedom, force_function, gauss_order=3):
     """
     Assembly routine for processing of forces distributed over edges (quadrilaterals)
@@ -75,6 +100,7 @@ def edge_force_quads(nodes, elements, freedom, force_function, gauss_order=3):
     return force
 
 
+@timed(LOADS)
 def edge_force_triangles(nodes, elements, freedom, force_function, gauss_order=3):
     """
     Assembly routine for processing of forces distributed over edges (triangles)
@@ -105,6 +131,7 @@ def edge_force_triangles(nodes, elements, freedom, force_function, gauss_order=3
     return force
 
 
+@timed(LOADS)
 def volume_force_quads(nodes, elements, thickness, freedom, force_function, gauss_order=3):
     from quadrature import legendre_quad
     from shape_functions import iso_quad
@@ -132,72 +159,56 @@ def volume_force_quads(nodes, elements, thickness, freedom, force_function, gaus
     return force
 
 
-def thermal_force_quads(nodes, elements, thickness, elasticity_matrix, alpha_t, tfunc=None, gauss_order=3):
+@timed(LOADS)
+def thermal_force_quads(nodes, elements, thickness, elasticity_matrix, alpha_t, tfunc=None, gauss_order=3,
+                        temperatures=None):
+    """
+    Assembly routine for thermal loads of the plane stress state
+    :param nodes: A two dimensional array of coordinates
+    :param elements: A two dimensional array of quadrilaterals
+    :param thickness: A thickness
+    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
+    :param alpha_t: A coefficient of thermal expansion
+    :param tfunc: A function tfunc(x, y) of temperature or None (a unit temperature)
+    :param gauss_order: An order of gaussian quadratures
+    :param temperatures: An array of temperatures at Gauss points [elements_count * points_count] (see
+    spatial.gauss_points, spatial.transfer_matrix), it is used instead of tfunc
+    :return: An array of values
+    """
     from quadrature import legendre_quad
-    from shape_functions import iso_quad
-    from numpy import sum, array
+    from kernels import PLANE_STRAINS, load_kernel
+    from numpy import array, arange, add, vectorize
     freedom = 2
     dimension = len(nodes) * freedom
     force = zeros(dimension)
-    element_nodes = 4
     (xi, eta, w) = legendre_quad(gauss_order)
     alpha = array([alpha_t, alpha_t, 0.0])
-    for element in elements:
-        fe = zeros(element_nodes * freedom)
-        vertices = nodes[element[:], :]
-        for i in range(len(w)):
-            (jacobian, shape, shape_dx, shape_dy) = iso_quad(vertices, xi[i], eta[i])
-            b = array([
-                [shape_dx[0], 0.0, shape_dx[1], 0.0, shape_dx[2], 0.0, shape_dx[3], 0.0],
-                [0.0, shape_dy[0], 0.0, shape_dy[1], 0.0, shape_dy[2], 0.0, shape_dy[3]],
-                [shape_dy[0], shape_dx[0], shape_dy[1], shape_dx[1], shape_dy[2], shape_dx[2], shape_dy[3], shape_dx[3]]
-            ])
-            if tfunc is None:
-                fe = fe + thickness * b.transpose().dot(elasticity_matrix).dot(alpha) * w[i] * jacobian
-            else:
-                therm = tfunc(sum(vertices[:, 0] * shape), sum(vertices[:, 1] * shape))
-                fe = fe + thickness * therm * b.transpose().dot(elasticity_matrix).dot(alpha) * w[i] * jacobian
-
-        for i in range(element_nodes * freedom):
-            ii = element[i / freedom] * freedom + i % freedom
-            force[ii] += fe[i]
-
+    factors = None if tfunc is None else vectorize(tfunc, otypes=[float])
+    if temperatures is not None:
+        factors = temperatures
+    fe = thickness * load_kernel(nodes, elements, PLANE_STRAINS, freedom, elasticity_matrix.dot(alpha), xi, eta, w,
+                                 factors)
+    add.at(force, (elements[:, :, None] * freedom + arange(freedom)).ravel(), fe.ravel())
     return force
 
 
+@timed(LOADS)
 def thermal_force_plate_5(nodes, elements, thicknesses, elasticity_matrices, alpha_t, gauss_order=3):
     from quadrature import legendre_quad
-    from shape_functions import iso_quad
-    from numpy import sum, array
+    from kernels import PLANE_STRAINS, load_kernel
+    from numpy import sum, array, arange, add
     freedom = 5
     dimension = len(nodes) * freedom
     force = zeros(dimension)
-    element_nodes = 4
     (xi, eta, w) = legendre_quad(gauss_order)
     alpha = array([alpha_t, alpha_t, 0.0])
-    h = sum(thicknesses)
-    for element in elements:
-        fe = zeros(element_nodes * freedom)
-        vertices = nodes[element[:], :]
-        for i in range(len(w)):
-            (jacobian, shape, shape_dx, shape_dy) = iso_quad(vertices, xi[i], eta[i])
-            bm = array([
-                [shape_dx[0], 0.0, 0.0, 0.0, 0.0, shape_dx[1], 0.0, 0.0, 0.0, 0.0, shape_dx[2], 0.0, 0.0, 0.0, 0.0,
-                 shape_dx[3], 0.0, 0.0, 0.0, 0.0],
-                [0.0, shape_dy[0], 0.0, 0.0, 0.0, 0.0, shape_dy[1], 0.0, 0.0, 0.0, 0.0, shape_dy[2], 0.0, 0.0, 0.0, 0.0,
-                 shape_dy[3], 0.0, 0.0, 0.0],
-                [shape_dy[0], shape_dx[0], 0.0, 0.0, 0.0, shape_dy[1], shape_dx[1], 0.0, 0.0, 0.0, shape_dy[2],
-                 shape_dx[2], 0.0, 0.0, 0.0, shape_dy[3], shape_dx[3], 0.0, 0.0, 0.0]
-            ])
-            z0 = -h / 2.0
-            for j in range(len(thicknesses)):
-                z1 = z0 + thicknesses[j]
-                df = elasticity_matrices[j]
-                fe = fe + (z1 - z0) * bm.transpose().dot(df).dot(alpha) * w[i] * jacobian
-                z0 = z1
-
-        for i in range(element_nodes * freedom):
-            ii = element[i / freedom] * freedom + i % freedom
-            force[ii] += fe[i]
-
+    # membrane forces of the unit temperature: the integral of stresses of layers over the thickness
+    stress = zeros(3)
+    z0 = -sum(thicknesses) / 2.0
+    for j in range(len(thicknesses)):
+        z1 = z0 + thicknesses[j]
+        stress += (z1 - z0) * elasticity_matrices[j].dot(alpha)
+        z0 = z1
+    fe = load_kernel(nodes, elements, PLANE_STRAINS, freedom, stress, xi, eta, w)
+    add.at(force, (elements[:, :, None] * freedom + arange(freedom)).ravel(), fe.ravel())
     return force
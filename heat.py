@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+from profiling import phase, progress, SOLVE
+
+
+def _full(matrix):
+    """
+    :return: The full CSR matrix of a matrix or of the upper triangle of a symmetric matrix (see assembly2d routines with
+    upper=True), the upper triangle is recognized by the empty strictly lower triangle
+    """
+    from scipy.sparse import tril
+    from solvers import SymmetricOperator
+    if tril(matrix, -1).nnz == 0:
+        return SymmetricOperator(matrix).full()
+    return matrix.tocsr()
+
+
+class ThetaMethod(object):
+    """
+    Theta-method time integration of the heat conduction C dT/dt + K T = Q(t):
+    (C / dt + theta * K) T_(n+1) = (C / dt - (1 - theta) * K) T_n + theta * Q_(n+1) + (1 - theta) * Q_n,
+    theta = 1 - the backward Euler method, 0.5 - the Crank-Nicolson method. The matrix of the left side is factorized
+    once, so a step costs a sparse product and triangular solves. Prescribed temperatures are constant in time:
+        integrator = ThetaMethod(assembly_conduction(nodes, elements, k), assembly_capacity(nodes, elements, rho_c),
+                                 dt, fixed=boundary, values=20.0)
+        (temperature, times) = integrator.integrate(initial, 1000, directory="heat",
+                                                    gauss=gauss_interpolation(nodes, elements))
+        temperatures = load(os.path.join("heat", "gauss.npy"), mmap_mode="r")
+        force = thermal_force_quads(nodes, elements, h, d, alpha, temperatures=temperatures[-1])
+    """
+    def __init__(self, conductivity, capacity, dt, theta=1.0, fixed=(), values=0.0):
+        """
+        :param conductivity: The conductivity matrix (see assembly2d.assembly_conduction), full or the upper triangle
+        :param capacity: The capacity matrix (see assembly2d.assembly_capacity), full or the upper triangle
+        :param dt: A time step
+        :param theta: A parameter of the method from [0; 1]
+        :param fixed: Indices of nodes of prescribed temperatures
+        :param values: Prescribed temperatures (a value or an array of values of fixed nodes)
+        """
+        from numpy import asarray, unique, ones, arange, broadcast_to, zeros
+        from scipy.sparse.linalg import splu
+        if not 0.0 <= theta <= 1.0:
+            raise ValueError("The parameter theta must be from [0; 1]")
+        self.dt = dt
+        self.theta = theta
+        dimension = conductivity.shape[0]
+        self.fixed = unique(asarray(fixed, dtype=int))
+        self.values = broadcast_to(asarray(values, dtype=float), (len(self.fixed),)).copy()
+        free = ones(dimension, dtype=bool)
+        free[self.fixed] = False
+        self.free = arange(dimension)[free]
+        (conductivity, capacity) = (_full(conductivity), _full(capacity))
+        left = (capacity / dt + theta * conductivity).tocsr()
+        self.right = (capacity / dt - (1.0 - theta) * conductivity).tocsr()
+        reduced = left[self.free]
+        self.lifting = reduced[:, self.fixed].dot(self.values) if len(self.fixed) else zeros(len(self.free))
+        with phase(SOLVE, "splu"):
+            self.factor = splu(reduced[:, self.free].tocsc())
+
+    def step(self, temperature, load=None, next_load=None):
+        """
+        Function makes a step of the method
+        :param temperature: Temperatures of the current step
+        :param load: Heat loads of the current step or None
+        :param next_load: Heat loads of the next step or None
+        :return: Temperatures of the next step
+        """
+        from numpy import empty
+        rhs = self.right.dot(temperature)
+        if load is not None:
+            rhs += (1.0 - self.theta) * load
+        if next_load is not None:
+            rhs += self.theta * next_load
+        result = empty(len(rhs))
+        result[self.fixed] = self.values
+        result[self.free] = self.factor.solve(rhs[self.free] - self.lifting)
+        return result
+
+    def iterate(self, temperature, steps, load=None, time=0.0):
+        """
+        Generator integrates the conduction from an initial state
+        :param temperature: Initial temperatures (a value or an array)
+        :param steps: A count of steps
+        :param load: None, an array of heat loads constant in time or a function load(time) that returns an array
+        :param time: The initial time
+        :return: Tuples: a time, temperatures (the initial state first)
+        """
+        from numpy import asarray, broadcast_to
+        temperature = broadcast_to(asarray(temperature, dtype=float), (len(self.free) + len(self.fixed),)).copy()
+        temperature[self.fixed] = self.values
+        loads = load if callable(load) else (lambda moment: load)
+        current = loads(time)
+        yield time, temperature
+        for step in range(1, steps + 1):
+            following = loads(time + step * self.dt)
+            temperature = self.step(temperature, current, following)
+            current = following
+            yield time + step * self.dt, temperature
+
+    def integrate(self, temperature, steps, load=None, time=0.0, every=1, directory=None, gauss=None):
+        """
+        Function integrates the conduction and streams snapshots to memory-mapped .npy files of a directory:
+        temperatures.npy [snapshots_count; nodes_count], gauss.npy [snapshots_count; gauss_points_count] (if gauss is
+        given) and times.npy [snapshots_count]; the initial state is the first snapshot
+        :param temperature: Initial temperatures (a value or an array)
+        :param steps: A count of steps
+        :param load: None, an array of heat loads constant in time or a function load(time) that returns an array
+        :param time: The initial time
+        :param every: A count of steps between snapshots
+        :param directory: A directory of snapshots (created if it doesn't exist) or None
+        :param gauss: A matrix of interpolation of temperatures at Gauss points (see spatial.gauss_interpolation,
+        spatial.transfer_matrix) or None
+        :return: Tuple: temperatures of the last step, an array of times of snapshots
+        """
+        from numpy import save, array
+        from numpy.lib.format import open_memmap
+        count = steps // every + 1
+        (temperatures, gauss_temperatures, times) = (None, None, [])
+        if directory is not None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            dimension = len(self.free) + len(self.fixed)
+            temperatures = open_memmap(os.path.join(directory, "temperatures.npy"), mode="w+", dtype=float,
+                                       shape=(count, dimension))
+            if gauss is not None:
+                gauss_temperatures = open_memmap(os.path.join(directory, "gauss.npy"), mode="w+", dtype=float,
+                                                 shape=(count, gauss.shape[0]))
+        with phase(SOLVE, "theta method (%d steps)" % steps):
+            for (step, (moment, current)) in enumerate(self.iterate(temperature, steps, load, time)):
+                if step % every == 0:
+                    if temperatures is not None:
+                        temperatures[len(times)] = current
+                    if gauss_temperatures is not None:
+                        gauss_temperatures[len(times)] = gauss.dot(current)
+                    times.append(moment)
+                progress(step, steps)
+        for snapshots in (temperatures, gauss_temperatures):
+            if snapshots is not None:
+                snapshots.flush()
+        times = array(times)
+        if directory is not None:
+            save(os.path.join(directory, "times.npy"), times)
+        return current, times
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# channels of an element: values of shape functions and their derivatives
+SHAPE = 0
+DX = 1
+DY = 2
+
+# A strain map is a sequence of strains, a strain is a sequence of terms (channel, component): the strain is the sum
+# of channels of shape functions of nodes multiplied by freedoms of the component
+PLANE_STRAINS = (((DX, 0),), ((DY, 1),), ((DY, 0), (DX, 1)))
+
+
+def bending_strains(x, y):
+    """
+    :param x: A component of the rotation theta_x
+    :param y: A component of the rotation theta_y
+    :return: A strain map of curvatures: kappa_x, kappa_y, kappa_xy
+    """
+    return ((DX, x),), ((DY, y),), ((DY, x), (DX, y))
+
+
+def shear_strains(w, x, y):
+    """
+    :param w: A component of the deflection
+    :param x: A component of the rotation theta_x
+    :param y: A component of the rotation theta_y
+    :return: A strain map of transverse shear strains: gamma_xz = dw/dx + theta_x, gamma_yz = dw/dy + theta_y
+    """
+    return ((DX, w), (SHAPE, x)), ((DY, w), (SHAPE, y))
+
+
+def strain_operator(strains, freedom):
+    """
+    :param strains: A strain map
+    :param freedom: A count of freedoms in each node
+    :return: An array [strains_count; 3; freedom]: coefficients of channels of a node in strains
+    """
+    from numpy import zeros
+    operator = zeros((len(strains), 3, freedom))
+    for (s, terms) in enumerate(strains):
+        for (channel, component) in terms:
+            operator[s, channel, component] += 1.0
+    return operator
+
+
+def coupling(strains, freedom, matrix):
+    """
+    Function evaluates the coupling of channels of nodes by a matrix of stress-strain relations:
+    C[c, i, d, j] = sum of E[s, c, i] * D[s, t] * E[t, d, j], E is the strain operator
+    :param strains: A strain map
+    :param freedom: A count of freedoms in each node
+    :param matrix: A matrix of stress-strain relations [strains_count; strains_count] or an array of matrices of
+    elements [elements_count; strains_count; strains_count]
+    :return: An array [3 * freedom; 3 * freedom] or [elements_count; 3 * freedom; 3 * freedom], ordered as (c, i)
+    """
+    from numpy import einsum, asarray
+    operator = strain_operator(strains, freedom)
+    result = einsum("sci,...st,tdj->...cidj", operator, asarray(matrix, dtype=float), operator)
+    return result.reshape(result.shape[:-4] + (3 * freedom, 3 * freedom))
+
+
+def element_geometry(nodes, elements, xi, eta):
+    """
+    Function evaluates isoparametric mappings of all quadrilaterals or triangles at once (load_cases.quads_geometry
+    adds coordinates of points)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals or triangles
+    :param xi: An array of coordinates of points in the first parametric direction
+    :param eta: An array of coordinates of points in the second parametric direction
+    :return: Tuple: jacobians [elements_count; points_count], shape functions [points_count; element_nodes],
+    derivatives of shape functions in the first and the second directions [elements_count; points_count; element_nodes]
+    """
+    from numpy import asarray, einsum
+    from shape_functions import reference_shape
+    (shape, shape_dxi, shape_deta) = reference_shape(asarray(xi, dtype=float), asarray(eta, dtype=float),
+                                                     elements.shape[1])
+    vertices = nodes[elements, :2]
+    x_xi = einsum("pa,ea->ep", shape_dxi, vertices[:, :, 0])
+    y_xi = einsum("pa,ea->ep", shape_dxi, vertices[:, :, 1])
+    x_eta = einsum("pa,ea->ep", shape_deta, vertices[:, :, 0])
+    y_eta = einsum("pa,ea->ep", shape_deta, vertices[:, :, 1])
+    jacobian = x_xi * y_eta - x_eta * y_xi
+    shape_dx = (y_eta[:, :, None] * shape_dxi[None, :, :] - y_xi[:, :, None] * shape_deta[None, :, :]) / \
+        jacobian[:, :, None]
+    shape_dy = (x_xi[:, :, None] * shape_deta[None, :, :] - x_eta[:, :, None] * shape_dxi[None, :, :]) / \
+        jacobian[:, :, None]
+    return jacobian, shape, shape_dx, shape_dy
+
+
+def channel_products(nodes, elements, xi, eta, w):
+    """
+    Function integrates products of channels of node pairs of quadrilaterals or triangles:
+    M[e, c, a, d, b] = sum of w_p * |J_ep| * G[e, p, c, a] * G[e, p, d, b] over points p, G holds values and derivatives
+    of shape functions (SHAPE, DX, DY) of nodes a, b
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals or triangles
+    :param xi: Quadrature points in the first parametric direction
+    :param eta: Quadrature points in the second parametric direction
+    :param w: Quadrature weights
+    :return: An array [elements_count; 3; element_nodes; 3; element_nodes]
+    """
+    from numpy import empty, einsum, asarray
+    (jacobian, shape, shape_dx, shape_dy) = element_geometry(nodes, elements, xi, eta)
+    channels = empty(shape_dx.shape[:2] + (3, elements.shape[1]))
+    channels[:, :, SHAPE] = shape
+    channels[:, :, DX] = shape_dx
+    channels[:, :, DY] = shape_dy
+    weighted = channels * (jacobian * asarray(w, dtype=float))[:, :, None, None]
+    return einsum("epca,epdb->ecadb", weighted, channels)
+
+
+def element_area(products):
+    """
+    :param products: Products of channels (see channel_products)
+    :return: Areas of elements (shape functions sum to one) [elements_count]
+    """
+    return products[:, SHAPE, :, SHAPE, :].sum(axis=(1, 2))
+
+
+def stiffness_kernel(products, couplings):
+    """
+    Function evaluates local matrices of elements by blocks of node pairs:
+    K[e, a, i, b, j] = sum of C[c, i, d, j] * M[e, c, a, d, b] over channels c, d. A [freedom; freedom]-block of
+    a node pair costs a product of a row of 9 channel products by a [9; freedom^2]-matrix, zero columns of B matrices
+    are never touched
+    :param products: Products of channels of elements (see channel_products)
+    :param couplings: A coupling of channels (see coupling), shared by elements or an array of couplings of elements
+    :return: An array of local matrices [elements_count; element_nodes * freedom; element_nodes * freedom]
+    """
+    from numpy import matmul
+    (elements_count, element_nodes) = (products.shape[0], products.shape[2])
+    freedom = couplings.shape[-1] // 3
+    # [e, a, b, (c, d)]
+    pairs = products.transpose((0, 2, 4, 1, 3)).reshape(elements_count, element_nodes * element_nodes, 9)
+    # [(c, d), (i, j)]
+    weights = couplings.reshape(couplings.shape[:-2] + (3, freedom, 3, freedom)).swapaxes(-3, -2)
+    weights = weights.reshape(weights.shape[:-4] + (9, freedom * freedom))
+    if weights.ndim == 2:
+        blocks = pairs.reshape(-1, 9).dot(weights)
+    else:
+        blocks = matmul(pairs, weights)
+    blocks = blocks.reshape(elements_count, element_nodes, element_nodes, freedom, freedom).transpose((0, 1, 3, 2, 4))
+    return blocks.reshape(elements_count, element_nodes * freedom, element_nodes * freedom)
+
+
+def initial_stress_kernel(nodes, elements, sigma_x, sigma_y, tau_xy, xi, eta, w):
+    """
+    Function integrates products of gradients of shape functions of node pairs of quadrilaterals by initial stresses
+    interpolated from nodes: S[e, a, b] = sum of w_p * |J_ep| * grad N_a^T * sigma_0 * grad N_b over points p
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param sigma_x: An array of normal stresses in x-direction at nodes
+    :param sigma_y: An array of normal stresses in y-direction at nodes
+    :param tau_xy: An array of shear stresses at nodes
+    :param xi: Quadrature points in the first parametric direction
+    :param eta: Quadrature points in the second parametric direction
+    :param w: Quadrature weights
+    :return: An array [elements_count; 4; 4]
+    """
+    from numpy import einsum, asarray
+    (jacobian, shape, shape_dx, shape_dy) = element_geometry(nodes, elements, xi, eta)
+    weights = jacobian * asarray(w, dtype=float)
+    (sx, sy, txy) = [weights * shape.dot(asarray(stress, dtype=float)[elements].transpose()).transpose()
+                     for stress in (sigma_x, sigma_y, tau_xy)]
+    return einsum("epa,ep,epb->eab", shape_dx, sx, shape_dx) + einsum("epa,ep,epb->eab", shape_dy, sy, shape_dy) + \
+        einsum("epa,ep,epb->eab", shape_dx, txy, shape_dy) + einsum("epa,ep,epb->eab", shape_dy, txy, shape_dx)
+
+
+def load_kernel(nodes, elements, strains, freedom, stress, xi, eta, w, factors=None):
+    """
+    Function evaluates local vectors B^T * sigma of quadrilaterals by channels of nodes (e.g. thermal loads)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param strains: A strain map
+    :param freedom: A count of freedoms in each node
+    :param stress: A vector of stresses [strains_count]
+    :param xi: Quadrature points in the first parametric direction
+    :param eta: Quadrature points in the second parametric direction
+    :param w: Quadrature weights
+    :param factors: None, a function factors(x, y) of arrays of coordinates of points that returns factors of
+    the stresses or an array of factors at points [elements_count; points_count]
+    :return: An array of local vectors [elements_count; 4 * freedom]
+    """
+    from numpy import empty, einsum, asarray
+    (jacobian, shape, shape_dx, shape_dy) = element_geometry(nodes, elements, xi, eta)
+    weights = jacobian * asarray(w, dtype=float)
+    if callable(factors):
+        points = einsum("pa,eaj->epj", shape, nodes[elements, :2])
+        weights = weights * factors(points[:, :, 0], points[:, :, 1])
+    elif factors is not None:
+        weights = weights * asarray(factors, dtype=float).reshape(weights.shape)
+    channels = empty((3,) + shape_dx.shape[:2] + (4,))
+    channels[SHAPE] = shape
+    channels[DX] = shape_dx
+    channels[DY] = shape_dy
+    # coefficients of channels in the work of the stresses: [c, i]
+    work = einsum("sci,s->ci", strain_operator(strains, freedom), asarray(stress, dtype=float))
+    return einsum("ep,cepa,ci->eai", weights, channels, work).reshape(len(elements), 4 * freedom)
@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from numpy import zeros, arange, repeat
+from scipy.sparse import coo_matrix
+from profiling import timed, phase, LOADS, BOUNDARY_CONDITIONS, SOLVE, RECOVERY
+
+_QUAD_CORNERS = ([-1.0, 1.0, 1.0, -1.0], [-1.0, -1.0, 1.0, 1.0])
+
+
+def quads_geometry(nodes, elements, xi, eta):
+    """
+    Function evaluates the isoparametric mapping of all quadrilaterals at once (see shape_functions.iso_quad)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param xi: An array of coordinates of points in the first parametric direction
+    :param eta: An array of coordinates of points in the second parametric direction
+    :return: Tuple: jacobians [elements_count; points_count], shape functions [points_count; 4], derivatives of shape
+    functions in the first and the second directions [elements_count; points_count; 4], coordinates of points
+    [elements_count; points_count; 2]
+    """
+    from numpy import einsum
+    from kernels import element_geometry
+    (jacobian, shape, shape_dx, shape_dy) = element_geometry(nodes, elements, xi, eta)
+    points = einsum("pa,eaj->epj", shape, nodes[elements, :2])
+    return jacobian, shape, shape_dx, shape_dy, points
+
+
+def _element_dofs(elements, freedom):
+    return (elements[:, :, None] * freedom + arange(freedom)).reshape(len(elements), -1)
+
+
+@timed(LOADS)
+def volume_load_operator(nodes, elements, freedom, thickness=1.0, gauss_order=3):
+    """
+    Load operator of forces distributed over quadrilaterals: force = operator * q, q is a vector of values of
+    the distributed force at Gauss points [elements_count * points_count * freedom] (or a matrix, a column per case)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param freedom: A count of freedoms in each node
+    :param thickness: A thickness
+    :param gauss_order: An order of gaussian quadratures
+    :return: Tuple: the operator in the CSR sparse format, coordinates of Gauss points [elements_count * points_count; 2]
+    """
+    from quadrature import legendre_quad
+    (xi, eta, w) = legendre_quad(gauss_order)
+    (jacobian, shape, shape_dx, shape_dy, points) = quads_geometry(nodes, elements, xi, eta)
+    (elements_count, points_count) = jacobian.shape
+    element_nodes = elements.shape[1]
+    # indices [element; point; node; component]
+    values = thickness * (jacobian * w)[:, :, None, None] * shape[None, :, :, None] + zeros((1, 1, 1, freedom))
+    rows = elements[:, None, :, None] * freedom + arange(freedom)
+    columns = (arange(elements_count * points_count).reshape(elements_count, points_count, 1, 1) * freedom +
+               arange(freedom))
+    rows = repeat(rows, points_count, axis=1)
+    columns = repeat(columns, element_nodes, axis=2)
+    operator = coo_matrix((values.ravel(), (rows.ravel(), columns.ravel())),
+                          shape=(freedom * len(nodes), elements_count * points_count * freedom)).tocsr()
+    return operator, points.reshape(-1, 2)
+
+
+@timed(LOADS)
+def thermal_load_operator(nodes, elements, thickness, elasticity_matrix, alpha_t, gauss_order=3):
+    """
+    Load operator of thermal strains of the plane stress state (see force.thermal_force_quads):
+    force = operator * t, t is a vector of temperatures at Gauss points [elements_count * points_count] (or a matrix,
+    a column per case)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param thickness: A thickness
+    :param elasticity_matrix: A two-dimensional array that represents stress-strain relations
+    :param alpha_t: A coefficient of thermal expansion
+    :param gauss_order: An order of gaussian quadratures
+    :return: Tuple: the operator in the CSR sparse format, coordinates of Gauss points [elements_count * points_count; 2]
+    """
+    from quadrature import legendre_quad
+    freedom = 2
+    (xi, eta, w) = legendre_quad(gauss_order)
+    (jacobian, shape, shape_dx, shape_dy, points) = quads_geometry(nodes, elements, xi, eta)
+    (elements_count, points_count) = jacobian.shape
+    element_nodes = elements.shape[1]
+    s = elasticity_matrix.dot([alpha_t, alpha_t, 0.0])  # stresses of the unit temperature
+    values = zeros((elements_count, points_count, element_nodes, freedom))
+    values[:, :, :, 0] = shape_dx * s[0] + shape_dy * s[2]
+    values[:, :, :, 1] = shape_dy * s[1] + shape_dx * s[2]
+    values *= thickness * (jacobian * w)[:, :, None, None]
+    rows = repeat(_element_dofs(elements, freedom)[:, None, :], points_count, axis=1)
+    columns = repeat(arange(elements_count * points_count), element_nodes * freedom)
+    operator = coo_matrix((values.ravel(), (rows.ravel(), columns)),
+                          shape=(freedom * len(nodes), elements_count * points_count)).tocsr()
+    return operator, points.reshape(-1, 2)
+
+
+@timed(LOADS)
+def edge_load_operator(nodes, edges, freedom, gauss_order=3):
+    """
+    Load operator of forces distributed over edges (see force.edge_force_quads): force = operator * q, q is a vector of
+    values of the distributed force at Gauss points of edges [edges_count * points_count * freedom]
+    :param nodes: A two-dimensional array of coordinates
+    :param edges: A two-dimensional array of edges [edges_count; 2] (e.g. mesh2d.boundary_edges)
+    :param freedom: A count of freedoms in each node
+    :param gauss_order: A count of Gauss-Legendre quadratures points
+    :return: Tuple: the operator in the CSR sparse format, coordinates of Gauss points [edges_count * points_count; 2]
+    """
+    from quadrature import legendre_interval
+    from numpy import array, sqrt, sum
+    (p, w) = legendre_interval(gauss_order)
+    shape = array([0.5 * (1.0 - p), 0.5 * (1.0 + p)]).transpose()  # [point; node]
+    a = nodes[edges[:, 0], :2].astype(float)
+    b = nodes[edges[:, 1], :2].astype(float)
+    jacobian = sqrt(sum((b - a)**2.0, axis=1)) / 2.0
+    points = shape[None, :, 0, None] * a[:, None, :] + shape[None, :, 1, None] * b[:, None, :]
+    edges_count = len(edges)
+    points_count = len(w)
+    values = (jacobian[:, None] * w)[:, :, None, None] * shape[None, :, :, None] + zeros((1, 1, 1, freedom))
+    rows = repeat(edges[:, None, :, None] * freedom + arange(freedom), points_count, axis=1)
+    columns = repeat(arange(edges_count * points_count).reshape(edges_count, points_count, 1, 1) * freedom +
+                     arange(freedom), 2, axis=2)
+    operator = coo_matrix((values.ravel(), (rows.ravel(), columns.ravel())),
+                          shape=(freedom * len(nodes), edges_count * points_count * freedom)).tocsr()
+    return operator, points.reshape(-1, 2)
+
+
+class LoadCases(object):
+    """
+    Container of load cases of a model. Load operators are built once; each case adds a column of values at Gauss
+    points (or at nodes), and all cases are assembled to one [dimension; cases_count] array by one sparse product
+    per kind of loads:
+        cases = LoadCases(nodes, elements, freedom=2)
+        cases.add_edges("pressure", lambda points: ...)
+        for i in range(100):
+            cases.add_thermal("thermal %d" % i, temperatures[i])
+        forces = cases.assemble()
+    """
+    def __init__(self, nodes, elements, freedom, thickness=1.0, gauss_order=3, edges=None, elasticity_matrix=None,
+                 alpha_t=None):
+        """
+        :param nodes: A two-dimensional array of coordinates
+        :param elements: A two-dimensional array of quadrilaterals
+        :param freedom: A count of freedoms in each node
+        :param thickness: A thickness (volume and thermal loads)
+        :param gauss_order: An order of gaussian quadratures
+        :param edges: Loaded edges (boundary edges of the mesh by default)
+        :param elasticity_matrix: Stress-strain relations (thermal loads)
+        :param alpha_t: A coefficient of thermal expansion (thermal loads)
+        """
+        self.nodes = nodes
+        self.elements = elements
+        self.freedom = freedom
+        self.thickness = thickness
+        self.gauss_order = gauss_order
+        self.edges = edges
+        self.elasticity_matrix = elasticity_matrix
+        self.alpha_t = alpha_t
+        self.names = []
+        self._operators = {}
+        self._columns = {"volume": [], "edges": [], "thermal": [], "nodal": []}
+
+    @property
+    def dimension(self):
+        return self.freedom * len(self.nodes)
+
+    def _operator(self, kind):
+        from mesh2d import boundary_edges
+        if kind not in self._operators:
+            if kind == "volume":
+                self._operators[kind] = volume_load_operator(self.nodes, self.elements, self.freedom, self.thickness,
+                                                             self.gauss_order)
+            elif kind == "edges":
+                if self.edges is None:
+                    self.edges = boundary_edges(self.elements)
+                self._operators[kind] = edge_load_operator(self.nodes, self.edges, self.freedom, self.gauss_order)
+            else:
+                if self.elasticity_matrix is None or self.alpha_t is None or self.freedom != 2:
+                    raise ValueError("Thermal loads require the plane stress state, elasticity_matrix and alpha_t")
+                self._operators[kind] = thermal_load_operator(self.nodes, self.elements, self.thickness,
+                                                              self.elasticity_matrix, self.alpha_t, self.gauss_order)
+        return self._operators[kind]
+
+    def points(self, kind):
+        """
+        :param kind: "volume", "edges" or "thermal"
+        :return: Coordinates of Gauss points [points_count; 2] where values of loads of the kind are given
+        """
+        return self._operator(kind)[1]
+
+    def _add(self, name, kind, values):
+        from numpy import asarray
+        if callable(values):
+            values = values(self.points(kind))
+        self._columns[kind].append((len(self.names), asarray(values, dtype=float).ravel()))
+        self.names.append(name)
+        return len(self.names) - 1
+
+    def add_volume(self, name, values):
+        """
+        Function adds a case of forces distributed over elements
+        :param name: A name of the case
+        :param values: An array [points_count; freedom] of values at points('volume') or a function of the points
+        :return: An index of the case
+        """
+        return self._add(name, "volume", values)
+
+    def add_edges(self, name, values):
+        """
+        Function adds a case of forces distributed over edges
+        :param name: A name of the case
+        :param values: An array [points_count; freedom] of values at points('edges') or a function of the points
+        :return: An index of the case
+        """
+        return self._add(name, "edges", values)
+
+    def add_thermal(self, name, temperatures):
+        """
+        Function adds a case of thermal loads
+        :param name: A name of the case
+        :param temperatures: An array [points_count] of temperatures at points('thermal') or a function of the points
+        :return: An index of the case
+        """
+        return self._add(name, "thermal", temperatures)
+
+    def add_nodal(self, name, forces):
+        """
+        Function adds a case of nodal forces (point loads)
+        :param name: A name of the case
+        :param forces: A dictionary: index of a node -> a sequence of components of a force
+        :return: An index of the case
+        """
+        vector = zeros(self.dimension)
+        for (node, force) in forces.items():
+            vector[self.freedom * node:self.freedom * node + len(force)] += force
+        self._columns["nodal"].append((len(self.names), vector))
+        self.names.append(name)
+        return len(self.names) - 1
+
+    @timed(LOADS)
+    def assemble(self):
+        """
+        Function assembles all cases
+        :return: An array [dimension; cases_count]
+        """
+        from numpy import column_stack
+        forces = zeros((self.dimension, len(self.names)))
+        for (kind, columns) in self._columns.items():
+            if not columns:
+                continue
+            cases = [index for (index, values) in columns]
+            values = column_stack([values for (index, values) in columns])
+            if kind == "nodal":
+                forces[:, cases] += values
+            else:
+                forces[:, cases] += self._operator(kind)[0].dot(values)
+        return forces
+
+
+@timed(BOUNDARY_CONDITIONS)
+def apply_dirichlet(stiffness, forces, dofs, values=0.0):
+    """
+    Function eliminates prescribed unknowns from a system with many right-hand sides at once (the known values are
+    lifted to the right-hand sides)
+    :param stiffness: A global matrix
+    :param forces: An array [dimension] or [dimension; cases_count]
+    :param dofs: Indices of prescribed unknowns
+    :param values: Prescribed values: a scalar, an array [len(dofs)] or [len(dofs); cases_count]
+    :return: Tuple: the reduced matrix (CSR), reduced right-hand sides, indices of free unknowns, an array of
+    prescribed values [len(dofs); cases_count] (or [len(dofs)])
+    """
+    from numpy import setdiff1d, unique, asarray, broadcast_to
+    dofs = unique(dofs)
+    free = setdiff1d(arange(stiffness.shape[0]), dofs)
+    stiffness = stiffness.tocsr()
+    values = asarray(values, dtype=float)
+    if values.ndim == 1 and forces.ndim == 2:
+        values = values[:, None]
+    values = broadcast_to(values, (len(dofs),) + forces.shape[1:])
+    reduced = forces[free]
+    if values.any():
+        reduced = reduced - stiffness[free, :][:, dofs].dot(values)
+    return stiffness[free, :][:, free], reduced, free, values
+
+
+@timed(BOUNDARY_CONDITIONS)
+def constrain(stiffness, forces, dofs, values=0.0, upper=False):
+    """
+    Function imposes prescribed unknowns without changing the format and the pattern of a matrix: rows and columns of
+    prescribed unknowns are replaced by rows and columns of the identity matrix, the known values are lifted to
+    the right-hand sides. Unlike apply_dirichlet, blocks of BSR matrices are kept
+    :param stiffness: A global matrix in the CSR or BSR format (diagonal entries must be stored)
+    :param forces: An array [dimension] or [dimension; cases_count]
+    :param dofs: Indices of prescribed unknowns
+    :param values: Prescribed values: a scalar, an array [len(dofs)] or [len(dofs); cases_count]
+    :param upper: The matrix is the upper triangle of a symmetric matrix (see solvers.SymmetricOperator), the result
+    is the upper triangle too
+    :return: Tuple: the constrained matrix (a copy), right-hand sides
+    """
+    from numpy import unique, asarray, broadcast_to, diff, ones, eye
+    from solvers import SymmetricOperator
+    dofs = unique(dofs)
+    matrix = stiffness.copy() if stiffness.format in ("csr", "bsr") else stiffness.tocsr()
+    size = matrix.blocksize[0] if matrix.format == "bsr" else 1
+    values = asarray(values, dtype=float)
+    if values.ndim == 1 and forces.ndim == 2:
+        values = values[:, None]
+    prescribed = zeros(forces.shape)
+    prescribed[dofs] = broadcast_to(values, (len(dofs),) + forces.shape[1:])
+    if values.any():
+        forces = forces - (SymmetricOperator(matrix) if upper else matrix).dot(prescribed)
+    else:
+        forces = forces.copy()
+    forces[dofs] = prescribed[dofs]
+    free = ones(matrix.shape[0])
+    free[dofs] = 0.0
+    free = free.reshape(-1, size)
+    data = matrix.data.reshape(-1, size, size)
+    rows = repeat(arange(len(matrix.indptr) - 1), diff(matrix.indptr))
+    data *= free[rows][:, :, None] * free[matrix.indices][:, None, :]
+    diagonal = matrix.indices == rows
+    data[diagonal] += (1.0 - free[rows[diagonal]])[:, :, None] * eye(size)
+    return matrix, forces
+
+
+def _batched_cg(stiffness, forces, tol, maxiter, preconditioner=None):
+    """
+    Function runs the preconditioned (Jacobi by default) conjugate gradient method for all right-hand sides
+    simultaneously: recurrences of columns are independent, but each iteration performs one sparse matrix by dense
+    matrix product
+    """
+    from numpy import sqrt, sum, where
+    from solvers import jacobi
+    forces = forces.reshape(forces.shape[0], -1)
+    preconditioner = jacobi(stiffness) if preconditioner is None else preconditioner
+    x = zeros(forces.shape)
+    r = forces.copy()
+    z = preconditioner.matmat(r)
+    p = z.copy()
+    rz = sum(r * z, axis=0)
+    norms = sqrt(sum(forces**2.0, axis=0))
+    norms[norms == 0.0] = 1.0
+    converged = sqrt(sum(r**2.0, axis=0)) <= tol * norms
+    iteration = 0
+    while not converged.all() and iteration < maxiter:
+        q = stiffness.dot(p)
+        pq = sum(p * q, axis=0)
+        alpha = where(converged, 0.0, rz / where(pq == 0.0, 1.0, pq))
+        x += alpha * p
+        r -= alpha * q
+        z = preconditioner.matmat(r)
+        rz_next = sum(r * z, axis=0)
+        beta = where(converged, 0.0, rz_next / where(rz == 0.0, 1.0, rz))
+        p = z + beta * p
+        rz = rz_next
+        converged = sqrt(sum(r**2.0, axis=0)) <= tol * norms
+        iteration += 1
+    if not converged.all():
+        raise ValueError("Conjugate gradients didn't converge in %d iterations" % maxiter)
+    return x
+
+
+def solve(stiffness, forces, dofs, values=0.0, method="lu", tol=1.0E-10, maxiter=None, return_info=False):
+    """
+    Function solves a linear system with prescribed unknowns for many right-hand sides
+    :param stiffness: A global matrix
+    :param forces: An array [dimension] or [dimension; cases_count]
+    :param dofs: Indices of prescribed unknowns
+    :param values: Prescribed values (see apply_dirichlet)
+    :param method: "lu" - one sparse LU factorization for all cases, "cg" - conjugate gradients for all cases at once
+    (a symmetric positive definite matrix is required; BSR matrices are constrained in place of elimination and
+    preconditioned by the block Jacobi method, other matrices by the Jacobi method), "refined" - one float32 LU
+    factorization and iterative refinement of all cases (see solvers.refined_solve)
+    :param tol: A relative tolerance of the "cg" and "refined" methods
+    :param maxiter: A maximal count of iterations of the "cg" method (the dimension by default)
+    :param return_info: Return a dictionary of the solution too: method, and for the "refined" method entries of
+    the dictionary of solvers.refined_solve (iterations, residuals, converged, fallback - whether the float64
+    factorization was used, reason), its method is the entry refinement
+    :return: An array of solutions of the shape of forces or a tuple: the array, the dictionary (see return_info)
+    """
+    from scipy.sparse.linalg import splu
+    from numpy import unique
+    from solvers import refined_solve, block_jacobi
+    if method not in ("lu", "cg", "refined"):
+        raise ValueError("Unknown method: " + str(method))
+    if method == "cg" and stiffness.format == "bsr":
+        (constrained, constrained_forces) = constrain(stiffness, forces, dofs, values)
+        with phase(SOLVE, "cg (bsr)"):
+            x = _batched_cg(constrained, constrained_forces, tol,
+                            constrained.shape[0] if maxiter is None else maxiter, block_jacobi(constrained))
+        return (x.reshape(forces.shape), {"method": method}) if return_info else x.reshape(forces.shape)
+    (reduced, reduced_forces, free, prescribed) = apply_dirichlet(stiffness, forces, dofs, values)
+    info = {"method": method}
+    with phase(SOLVE, method):
+        if method == "lu":
+            x = splu(reduced.tocsc()).solve(reduced_forces)
+        elif method == "refined":
+            (x, refined) = refined_solve(reduced, reduced_forces, tol)
+            info.update(refined, method=method, refinement=refined["method"])
+        else:
+            x = _batched_cg(reduced, reduced_forces, tol, reduced.shape[0] if maxiter is None else maxiter)
+    result = zeros(forces.shape)
+    result[free] = x.reshape(reduced_forces.shape)
+    result[unique(dofs)] = prescribed
+    return (result, info) if return_info else result
+
+
+class StressRecovery(object):
+    """
+    Sparse operator of stresses recovery: stresses at corners of elements are evaluated by one sparse product for all
+    cases, von Mises stresses are evaluated at corners, then values are averaged over elements adjacent to each node
+    """
+    def __init__(self, corners, averaging, components, mises):
+        """
+        :param corners: An operator [elements_count * corners_count * components; dimension]
+        :param averaging: An operator [nodes_count; elements_count * corners_count]
+        :param components: A count of stresses components
+        :param mises: A function of an array [components; ...] of stresses that returns von Mises stresses
+        """
+        self.corners = corners
+        self.averaging = averaging
+        self.components = components
+        self.mises = mises
+
+    @timed(RECOVERY)
+    def __call__(self, displacements):
+        """
+        :param displacements: An array [dimension] or [dimension; cases_count]
+        :return: A tuple of arrays [nodes_count] or [nodes_count; cases_count]: components of stresses, von Mises stress
+        """
+        from dtypes import results
+        cases = displacements.shape[1:]
+        stresses = self.corners.dot(displacements.reshape(displacements.shape[0], -1))
+        stresses = stresses.reshape(-1, self.components, stresses.shape[1]).transpose(1, 0, 2)
+        result = [self.averaging.dot(s) for s in stresses] + [self.averaging.dot(self.mises(stresses))]
+        return tuple(results(r.reshape((r.shape[0],) + cases)) for r in result)
+
+
+def _recovery(nodes, elements, freedom, values, mises):
+    """
+    Function builds a recovery operator
+    :param values: An array [elements_count; corners_count; components; element_nodes * freedom] of values of
+    operators of stresses at corners
+    """
+    from scipy.sparse import csr_matrix
+    from numpy import bincount, ones
+    (elements_count, corners_count, components, element_dimension) = values.shape
+    rows = arange(elements_count * corners_count * components).reshape(elements_count, corners_count, components, 1)
+    columns = _element_dofs(elements, freedom)[:, None, None, :]
+    (rows, columns) = (rows + 0 * columns, columns + 0 * rows)
+    corners = csr_matrix((values.ravel(), (rows.ravel(), columns.ravel())),
+                         shape=(elements_count * corners_count * components, freedom * len(nodes)))
+    adjacent = bincount(elements.ravel(), minlength=len(nodes)).astype(float)
+    averaging = csr_matrix((1.0 / adjacent[elements.ravel()], (elements.ravel(), arange(elements.size))),
+                           shape=(len(nodes), elements.size))
+    return StressRecovery(corners, averaging, components, mises)
+
+
+def plane_stress_recovery(nodes, elements, elasticity_matrix):
+    """
+    Recovery operator of stresses of the plane stress state of quadrilaterals
+    :return: StressRecovery: sigma_x, sigma_y, tau_xy, mises
+    """
+    from numpy import sqrt
+    (jacobian, shape, shape_dx, shape_dy, points) = quads_geometry(nodes, elements, *_QUAD_CORNERS)
+    (elements_count, corners_count, element_nodes) = shape_dx.shape
+    b = zeros((elements_count, corners_count, 3, element_nodes, 2))
+    b[:, :, 0, :, 0] = shape_dx
+    b[:, :, 1, :, 1] = shape_dy
+    b[:, :, 2, :, 0] = shape_dy
+    b[:, :, 2, :, 1] = shape_dx
+    values = (elasticity_matrix[None, None, :, :, None, None] * b[:, :, None, :, :, :]).sum(axis=3)
+    return _recovery(nodes, elements, 2, values.reshape(elements_count, corners_count, 3, -1),
+                     lambda s: sqrt(s[0]**2.0 - s[0] * s[1] + s[1]**2.0 + 3.0 * s[2]**2.0))
+
+
+def plate_recovery(nodes, elements, elasticity_matrix, z=0.0):
+    """
+    Recovery operator of stresses of Mindlin plates of quadrilaterals (see assembly2d.plate_stresses)
+    :param z: A coordinate of the surface where bending stresses are evaluated
+    :return: StressRecovery: sigma_x, sigma_y, tau_xy, tau_xz, tau_yz, mises
+    """
+    from numpy import sqrt
+    (jacobian, shape, shape_dx, shape_dy, points) = quads_geometry(nodes, elements, *_QUAD_CORNERS)
+    (elements_count, corners_count, element_nodes) = shape_dx.shape
+    bf = zeros((elements_count, corners_count, 3, element_nodes, 3))
+    bf[:, :, 0, :, 1] = shape_dx
+    bf[:, :, 1, :, 2] = shape_dy
+    bf[:, :, 2, :, 1] = shape_dy
+    bf[:, :, 2, :, 2] = shape_dx
+    bc = zeros((elements_count, corners_count, 2, element_nodes, 3))
+    bc[:, :, 0, :, 0] = shape_dx
+    bc[:, :, 0, :, 1] = shape[None, :, :]
+    bc[:, :, 1, :, 0] = shape_dy
+    bc[:, :, 1, :, 2] = shape[None, :, :]
+    values = zeros((elements_count, corners_count, 5, element_nodes, 3))
+    values[:, :, :3] = z * (elasticity_matrix[None, None, :, :, None, None] * bf[:, :, None, :, :, :]).sum(axis=3)
+    values[:, :, 3:] = elasticity_matrix[2, 2] * bc
+    return _recovery(nodes, elements, 3, values.reshape(elements_count, corners_count, 5, -1),
+                     lambda s: sqrt(0.5 * ((s[0] - s[1])**2.0 + s[1]**2.0 + s[0]**2.0 +
+                                           6.0 * (s[2]**2.0 + s[3]**2.0 + s[4]**2.0))))
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+from profiling import timed, MESH_READ
+from dtypes import coordinates_dtype, connectivity_dtype
 
 
 def rectangular_quads(x_count, y_count, x_origin, y_origin, width, height):
@@ -20,11 +22,9 @@ def rectangular_quads(x_count, y_count, x_origin, y_origin, width, height):
     :return: Tuple of numpy arrays: nodes [x_count*y_count; 2], elements[(x_count-1)*(y_count-1); 4]
     """
     from numpy import zeros
-    from numpy import float_
-    from numpy import int_
     from numpy import linspace
-    nodes = zeros((x_count * y_count, 2), dtype=float_)
-    elements = zeros(((x_count - 1) * (y_count - 1), 4), dtype=int_)
+    nodes = zeros((x_count * y_count, 2), dtype=coordinates_dtype())
+    elements = zeros(((x_count - 1) * (y_count - 1), 4), dtype=connectivity_dtype(len(nodes)))
     points_x = linspace(x_origin, x_origin + width, num=x_count)
     points_y = linspace(y_origin, y_origin + height, num=y_count)
     for i in range(x_count):
@@ -58,11 +58,9 @@ def rectangular_triangles(x_count, y_count, x_origin, y_origin, width, height):
     :return: Tuple of numpy arrays: nodes [x_count*y_count; 2], elements[2 * (x_count-1)*(y_count-1); 3]
     """
     from numpy import zeros
-    from numpy import float_
-    from numpy import int_
     from numpy import linspace
-    nodes = zeros((x_count * y_count, 2), dtype=float_)
-    elements = zeros((2 * (x_count - 1) * (y_count - 1), 3), dtype=int_)
+    nodes = zeros((x_count * y_count, 2), dtype=coordinates_dtype())
+    elements = zeros((2 * (x_count - 1) * (y_count - 1), 3), dtype=connectivity_dtype(len(nodes)))
     points_x = linspace(x_origin, x_origin + width, num=x_count)
     points_y = linspace(y_origin, y_origin + height, num=y_count)
     cx = x_origin + width / 2.0
@@ -113,10 +111,10 @@ def annular(xi_count, eta_count, min_radius, max_radius, alpha=None):
     :param max_radius: The inner radius of the annulus
     :return: Tuple of numpy arrays: nodes [x_count*y_count; 2], elements[(x_count-1)*(y_count-1); 4]
     """
-    from numpy import zeros, float_, int_, linspace, delete, s_
+    from numpy import zeros, linspace, delete, s_
     from math import cos, sin, sqrt, tanh, pi
-    nodes = zeros((xi_count * eta_count, 2), dtype=float_)
-    elements = zeros(((xi_count - 1) * (eta_count - 1), 4), dtype=int_)
+    nodes = zeros((xi_count * eta_count, 2), dtype=coordinates_dtype())
+    elements = zeros(((xi_count - 1) * (eta_count - 1), 4), dtype=connectivity_dtype(len(nodes)))
     hxi = 1.0 / float(xi_count - 1)
     points_xi = linspace(0.0, 1.0, num=xi_count)
     points_eta = linspace(0.0, 1.0, num=eta_count)
@@ -158,11 +156,9 @@ def annular(xi_count, eta_count, min_radius, max_radius, alpha=None):
 
 def two_curved_domain(xi_count, eta_count, left_curve, right_curve):
     from numpy import zeros
-    from numpy import float_
-    from numpy import int_
     from numpy import linspace
-    nodes = zeros((xi_count * eta_count, 2), dtype=float_)
-    elements = zeros(((xi_count - 1) * (eta_count - 1), 4), dtype=int_)
+    nodes = zeros((xi_count * eta_count, 2), dtype=coordinates_dtype())
+    elements = zeros(((xi_count - 1) * (eta_count - 1), 4), dtype=connectivity_dtype(len(nodes)))
     points_xi = linspace(0.0, 1.0, num=xi_count)
     points_eta = linspace(0.0, 1.0, num=eta_count)
     for i in range(xi_count):
@@ -184,11 +180,9 @@ def two_curved_domain(xi_count, eta_count, left_curve, right_curve):
 
 def transfinite(xi_count, eta_count, xi_curve_bottom, xi_curve_top, eta_curve_left, eta_curve_right):
     from numpy import zeros
-    from numpy import float_
-    from numpy import int_
     from numpy import linspace
-    nodes = zeros((xi_count * eta_count, 2), dtype=float_)
-    elements = zeros(((xi_count - 1) * (eta_count - 1), 4), dtype=int_)
+    nodes = zeros((xi_count * eta_count, 2), dtype=coordinates_dtype())
+    elements = zeros(((xi_count - 1) * (eta_count - 1), 4), dtype=connectivity_dtype(len(nodes)))
     points_xi = linspace(0.0, 1.0, num=xi_count)
     points_eta = linspace(0.0, 1.0, num=eta_count)
     a = xi_curve_bottom(0.0)
@@ -219,8 +213,9 @@ def transfinite(xi_count, eta_count, xi_curve_bottom, xi_curve_top, eta_curve_le
     return nodes, elements
 
 
+@timed(MESH_READ)
 def read(filename):
-    from numpy import zeros, float_, int_
+    from numpy import zeros
     with open(filename) as f:
         line = f.readline() # the first line
         numbers = line.split()
@@ -230,7 +225,7 @@ def read(filename):
         line = f.readline() # the second line
         numbers = line.split()
         nodes_count = int(numbers[0])
-        nodes = zeros((nodes_count, freedom), dtype=float_)
+        nodes = zeros((nodes_count, freedom), dtype=coordinates_dtype())
         for i in range(nodes_count):
             line = f.readline() # next line
             numbers = line.split()
@@ -240,7 +235,7 @@ def read(filename):
         line = f.readline()  # next line
         numbers = line.split()
         elements_count = int(numbers[0])
-        elements = zeros((elements_count, element_nodes), dtype=int_)
+        elements = zeros((elements_count, element_nodes), dtype=connectivity_dtype(len(nodes)))
         for i in range(elements_count):
             line = f.readline()  # next line
             numbers = line.split()
@@ -251,6 +246,55 @@ def read(filename):
         return nodes, elements
 
 
+def boundary_edges(elements):
+    """
+    Function finds edges of a boundary of a mesh (edges that belong to one element only)
+    :param elements: A two-dimensional array of elements
+    :return: A two-dimensional array of edges [edges_count; 2], nodes are ordered as in elements
+    """
+    from numpy import hstack, roll, sort, unique, int64
+    edges = hstack((elements.reshape(-1, 1), roll(elements, -1, axis=1).reshape(-1, 1)))
+    # keys of edges are products of node indices, they overflow compact (int32) connectivity
+    ordered = sort(edges, axis=1).astype(int64)
+    (keys, first, counts) = unique(ordered[:, 0] * (elements.max() + 1) + ordered[:, 1], return_index=True,
+                                   return_counts=True)
+    return edges[first[counts == 1]]
+
+
+def boundary_nodes(elements):
+    """
+    Function finds nodes of a boundary of a mesh (nodes of edges that belong to one element only)
+    :param elements: A two-dimensional array of elements
+    :return: An array of indices of boundary nodes
+    """
+    from numpy import unique
+    return unique(boundary_edges(elements))
+
+
+def vtk_poly_data(nodes, elements):
+    """
+    Function builds vtkPolyData of a planar mesh from numpy arrays in bulk (without loops over nodes and cells)
+    :param nodes: nodes array [nodes_count; 2] or [nodes_count; 3]
+    :param elements: elements array [elements_count; element_nodes]
+    :return: vtkPolyData
+    """
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray, get_vtk_to_numpy_typemap
+    from numpy import zeros, hstack, full, float64
+    coordinates = zeros((len(nodes), 3), dtype=float64)
+    coordinates[:, :nodes.shape[1]] = nodes
+    points = vtk.vtkPoints()
+    points.SetData(numpy_to_vtk(coordinates, deep=True))
+    id_type = get_vtk_to_numpy_typemap()[vtk.VTK_ID_TYPE]
+    cells = hstack((full((len(elements), 1), elements.shape[1]), elements)).astype(id_type)
+    cells_array = vtk.vtkCellArray()
+    cells_array.SetCells(len(elements), numpy_to_vtkIdTypeArray(cells.ravel(), deep=True))
+    poly_data = vtk.vtkPolyData()
+    poly_data.SetPoints(points)
+    poly_data.SetPolys(cells_array)
+    return poly_data
+
+
 def draw_vtk(nodes,
              elements,
              values=None,
@@ -282,22 +326,7 @@ def draw_vtk(nodes,
     :return: nothing
     """
     import vtk
-    points = vtk.vtkPoints()
-    for n in nodes:
-        if len(n) == 2:
-            points.InsertNextPoint([n[0], n[1], 0.0])
-        elif len(n) == 3:
-            points.InsertNextPoint([n[0], n[1], n[2]])
-
-    cells_array = vtk.vtkCellArray()
-
-    for el in elements:
-        polygon = vtk.vtkPolygon()
-        polygon.GetPointIds().SetNumberOfIds(len(el))
-        for i in range(len(el)):
-            polygon.GetPointIds().SetId(i, el[i])
-
-        cells_array.InsertNextCell(polygon)
+    poly_data = vtk_poly_data(nodes, elements)
 
     lut = vtk.vtkLookupTable()
     lut.SetNumberOfTableValues(colors_count)
@@ -318,17 +347,11 @@ def draw_vtk(nodes,
 
     bcf_actor = vtk.vtkActor()
     bcf_mapper = vtk.vtkPolyDataMapper()
-    poly_data = vtk.vtkPolyData()
-    poly_data.SetPoints(points)
-    poly_data.SetPolys(cells_array)
 
     if values is not None:
-        scalars = vtk.vtkFloatArray()
-
-        for v in values:
-            scalars.InsertNextValue(v)
-
-        poly_data.GetPointData().SetScalars(scalars)
+        from vtk.util.numpy_support import numpy_to_vtk
+        from numpy import float32
+        poly_data.GetPointData().SetScalars(numpy_to_vtk(values.astype(float32), deep=True))
         bcf = vtk.vtkBandedPolyDataContourFilter()
 
         if vtk.VTK_MAJOR_VERSION <= 5:
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+def _grid(points, bits):
+    """
+    Function maps points to integer coordinates of a 2^bits x 2^bits grid over their bounding box
+    :return: Tuple of arrays: x, y
+    """
+    from numpy import int64
+    points = points[:, :2].astype(float)
+    low = points.min(axis=0)
+    extent = (points.max(axis=0) - low).max()
+    extent = 1.0 if extent == 0.0 else extent
+    cells = (1 << bits) - 1
+    grid = ((points - low) / extent * cells + 0.5).astype(int64)
+    return grid[:, 0], grid[:, 1]
+
+
+def morton_keys(points, bits=16):
+    """
+    Function evaluates keys of points along the Morton (Z-order) curve
+    :param points: An array of coordinates [count; 2]
+    :param bits: A count of bits of each coordinate
+    :return: An array of keys [count]
+    """
+    from numpy import zeros, int64
+    (x, y) = _grid(points, bits)
+    keys = zeros(len(points), dtype=int64)
+    for bit in range(bits):
+        keys |= ((x >> bit) & 1) << (2 * bit)
+        keys |= ((y >> bit) & 1) << (2 * bit + 1)
+    return keys
+
+
+def hilbert_keys(points, bits=16):
+    """
+    Function evaluates keys of points along the Hilbert curve (consecutive keys are always adjacent cells, so the
+    Hilbert order keeps neighbours closer than the Morton order)
+    :param points: An array of coordinates [count; 2]
+    :param bits: A count of bits of each coordinate
+    :return: An array of keys [count]
+    """
+    from numpy import zeros, int64, where
+    (x, y) = _grid(points, bits)
+    keys = zeros(len(points), dtype=int64)
+    size = 1 << bits
+    s = size >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(int64)
+        ry = ((y & s) > 0).astype(int64)
+        keys += s * s * ((3 * rx) ^ ry)
+        # rotation of the quadrant
+        flip = (ry == 0) & (rx == 1)
+        x = where(flip, size - 1 - x, x)
+        y = where(flip, size - 1 - y, y)
+        swap = ry == 0
+        (x, y) = (where(swap, y, x), where(swap, x, y))
+        s >>= 1
+    return keys
+
+
+_CURVES = {
+    "hilbert": hilbert_keys,
+    "morton": morton_keys
+}
+
+
+def space_filling_order(points, curve="hilbert", bits=16):
+    """
+    Function orders points along a space-filling curve
+    :param points: An array of coordinates [count; 2]
+    :param curve: "hilbert" or "morton"
+    :param bits: A count of bits of each coordinate
+    :return: A permutation: indices of points in the order of the curve
+    """
+    if curve not in _CURVES:
+        raise ValueError("Unknown curve: " + str(curve))
+    return _CURVES[curve](points, bits).argsort(kind="mergesort")
+
+
+def inverse_permutation(permutation):
+    """
+    :param permutation: A permutation: new index -> old index
+    :return: The inverse permutation: old index -> new index
+    """
+    from numpy import empty, arange
+    inverse = empty(len(permutation), dtype=permutation.dtype)
+    inverse[permutation] = arange(len(permutation), dtype=permutation.dtype)
+    return inverse
+
+
+def reorder_mesh(nodes, elements, curve="hilbert", bits=16):
+    """
+    Function renumbers nodes along a space-filling curve of their coordinates and elements along the curve of their
+    centroids, so nodes of an element are close in memory and consecutive elements touch close entries of global
+    matrices and vectors
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of elements
+    :param curve: "hilbert" or "morton"
+    :param bits: A count of bits of each coordinate
+    :return: Tuple: reordered nodes, reordered elements (in the new numbering of nodes), node_order (new index of a node
+    -> original index), element_order (new index of an element -> original index). Inverse maps are given by
+    inverse_permutation
+    """
+    from partition import element_centroids
+    node_order = space_filling_order(nodes, curve, bits)
+    new_nodes = nodes[node_order]
+    new_elements = inverse_permutation(node_order)[elements].astype(elements.dtype)
+    element_order = space_filling_order(element_centroids(new_nodes, new_elements), curve, bits)
+    return new_nodes, new_elements[element_order], node_order, element_order
+
+
+def restore_nodal(values, node_order, freedom=1):
+    """
+    Function restores the original numbering of nodal values (e.g. a solution of a reordered model)
+    :param values: An array of values in the new numbering [nodes_count * freedom] or [nodes_count * freedom; ...]
+    :param node_order: A permutation: new index of a node -> original index
+    :param freedom: A count of values per node
+    :return: An array of values in the original numbering
+    """
+    from numpy import empty_like, arange
+    result = empty_like(values)
+    if freedom == 1:
+        result[node_order] = values
+    else:
+        result[(freedom * node_order[:, None] + arange(freedom)).ravel()] = values
+    return result
+
+
+def restore_elemental(values, element_order):
+    """
+    Function restores the original numbering of values of elements
+    :param values: An array of values in the new numbering [elements_count] or [elements_count; ...]
+    :param element_order: A permutation: new index of an element -> original index
+    :return: An array of values in the original numbering
+    """
+    from numpy import empty_like
+    result = empty_like(values)
+    result[element_order] = values
+    return result
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+def element_centroids(nodes, elements):
+    """
+    Function evaluates centroids of elements (means of vertices)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of elements
+    :return: An array [elements_count; 2]
+    """
+    return nodes[elements, :2].astype(float).mean(axis=1)
+
+
+def _bisection(centroids, parts, direction):
+    """
+    Function partitions points by recursive bisection: a set of points is split across a direction into two sets with
+    counts of points proportional to counts of parts on each side
+    :param centroids: An array of points [count; 2]
+    :param parts: A count of parts
+    :param direction: A function of points that returns a direction of a split (a unit vector)
+    :return: An array of indices of parts of points
+    """
+    from numpy import zeros, arange
+    labels = zeros(len(centroids), dtype=int)
+
+    def bisect(indices, count, first):
+        if count == 1 or len(indices) == 0:
+            labels[indices] = first
+            return
+        points = centroids[indices]
+        order = indices[points.dot(direction(points)).argsort(kind="mergesort")]
+        left = count // 2
+        cut = len(indices) * left // count
+        bisect(order[:cut], left, first)
+        bisect(order[cut:], count - left, first + left)
+
+    bisect(arange(len(centroids)), parts, 0)
+    return labels
+
+
+def recursive_coordinate_bisection(nodes, elements, parts):
+    """
+    Function partitions a mesh by the recursive coordinate bisection of centroids of elements: a set of elements is
+    split across the longest side of its bounding box, the split keeps counts of elements proportional to counts of
+    parts on each side
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of elements
+    :param parts: A count of parts
+    :return: An array of indices of parts of elements [elements_count]
+    """
+    from numpy import eye
+
+    def direction(points):
+        return eye(points.shape[1])[(points.max(axis=0) - points.min(axis=0)).argmax()]
+
+    return _bisection(element_centroids(nodes, elements), parts, direction)
+
+
+def inertial_bisection(nodes, elements, parts):
+    """
+    Function partitions a mesh by the recursive inertial bisection of centroids of elements: a set of elements is split
+    across its principal axis of the largest inertia, so inclined and curved domains (e.g. sectors of a gear) are cut
+    by shorter interfaces than by coordinate bisection
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of elements
+    :param parts: A count of parts
+    :return: An array of indices of parts of elements [elements_count]
+    """
+    from numpy.linalg import eigh
+
+    def direction(points):
+        centered = points - points.mean(axis=0)
+        (values, vectors) = eigh(centered.transpose().dot(centered))
+        return vectors[:, -1]
+
+    return _bisection(element_centroids(nodes, elements), parts, direction)
+
+
+def color_elements(elements):
+    """
+    Function colors elements greedily so that elements of a color don't share nodes: entries of local matrices of
+    elements of a color are scattered to distinct entries of a global matrix, so they can be added without races
+    :param elements: A two-dimensional array of elements
+    :return: An array of colors of elements [elements_count]
+    """
+    from numpy import zeros
+    masks = [0] * (int(elements.max()) + 1 if len(elements) else 0)  # bitmasks of colors of elements of each node
+    colors = zeros(len(elements), dtype=int)
+    for (index, element) in enumerate(elements.tolist()):
+        used = 0
+        for node in element:
+            used |= masks[node]
+        free = ~used & (used + 1)  # the lowest unused color
+        colors[index] = free.bit_length() - 1
+        for node in element:
+            masks[node] |= free
+    return colors
+
+
+def groups(labels):
+    """
+    Function groups elements by labels (colors or parts)
+    :param labels: An array of labels of elements
+    :return: Tuple: a permutation of elements ordered by labels (stable), an array of offsets of groups in the
+    permutation [labels_count + 1]
+    """
+    from numpy import bincount, concatenate, cumsum
+    order = labels.argsort(kind="mergesort")
+    offsets = concatenate(([0], cumsum(bincount(labels))))
+    return order, offsets
+
+
+def interface_nodes(elements, labels):
+    """
+    Function finds nodes shared by elements of different parts
+    :param elements: A two-dimensional array of elements
+    :param labels: An array of indices of parts of elements
+    :return: A sorted array of indices of nodes
+    """
+    from numpy import unique, repeat, int64
+    pairs = unique(elements.ravel().astype(int64) * (labels.max() + 1) + repeat(labels, elements.shape[1]))
+    (nodes, counts) = unique(pairs // (labels.max() + 1), return_counts=True)
+    return nodes[counts > 1]
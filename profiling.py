@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+MESH_READ = "mesh read"
+PATTERN = "pattern build"
+ASSEMBLY = "assembly"
+LOADS = "loads"
+BOUNDARY_CONDITIONS = "boundary conditions"
+SOLVE = "solve"
+RECOVERY = "recovery"
+EIGEN = "eigen"
+
+
+def _status(field):
+    """
+    :return: A value of a memory field of /proc/self/status in bytes or None if it isn't available (not Linux)
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def resident_memory():
+    # type: () -> int
+    """
+    :return: Current resident memory of the process (bytes) or None if the platform doesn't provide it
+    """
+    return _status("VmRSS")
+
+
+def peak_memory():
+    # type: () -> int
+    """
+    High-water mark of resident memory of the process: since the last reset by phases on Linux (see Phase), for
+    the lifetime of the process on other platforms
+    :return: A count of bytes or None if the platform doesn't provide it
+    """
+    peak = _status("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def _reset_peak_memory():
+    """
+    Subroutine resets the high-water mark of resident memory (Linux 4.0+)
+    :return: True if the mark is reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except (IOError, OSError):
+        return False
+
+
+class Phase(object):
+    """
+    Record of a named phase of an analysis. Memory of a phase is measured from its start: the high-water mark of
+    the process is reset when a phase starts (running phases keep maxima observed before), so peak_memory is the peak
+    resident memory during the phase and memory_delta is the peak above the resident memory at the start. Where
+    the mark can't be reset (not Linux), peak_memory is the high-water mark of the process and memory_delta is None
+    """
+    def __init__(self, name, routine=None, elements=None):
+        """
+        :param name: A name of the phase (MESH_READ, PATTERN, ASSEMBLY, LOADS, BOUNDARY_CONDITIONS, SOLVE, RECOVERY,
+        EIGEN or any other string)
+        :param routine: A name of the routine that is timed
+        :param elements: A count of elements processed by the phase
+        """
+        self.name = name
+        self.routine = routine
+        self.elements = elements
+        self.nnz = None
+        self.start = time.time()
+        self.wall_time = None
+        self.peak_memory = None
+        self.memory_delta = None
+        self.start_memory = None
+        self.resettable = False
+
+    def begin(self):
+        """
+        Subroutine starts the measurement of memory (running phases observe the high-water mark before it is reset)
+        """
+        for running in _phases:
+            running.observe()
+        self.resettable = _reset_peak_memory()
+        self.start_memory = resident_memory()
+        self.peak_memory = peak_memory()
+
+    def observe(self):
+        peak = peak_memory()
+        if peak is not None and (self.peak_memory is None or peak > self.peak_memory):
+            self.peak_memory = peak
+
+    def finish(self):
+        self.wall_time = time.time() - self.start
+        self.observe()
+        if self.resettable and self.start_memory is not None and self.peak_memory is not None:
+            self.memory_delta = self.peak_memory - self.start_memory
+
+    def record(self):
+        # type: () -> dict
+        """
+        :return: A dictionary that represents the phase
+        """
+        throughput = None
+        if self.elements is not None and self.wall_time:
+            throughput = self.elements / self.wall_time
+        return {
+            "phase": self.name,
+            "routine": self.routine,
+            "start": self.start,
+            "wall_time": self.wall_time,
+            "elements": self.elements,
+            "elements_per_second": throughput,
+            "nnz": self.nnz,
+            "peak_memory": self.peak_memory,
+            "memory_delta": self.memory_delta
+        }
+
+    def progress(self, step, max_step):
+        _sink.progress(self, step, max_step)
+
+
+class SilentSink(object):
+    """
+    Sink ignores all phases
+    """
+    def start(self, phase):
+        pass
+
+    def progress(self, phase, step, max_step):
+        pass
+
+    def finish(self, phase):
+        pass
+
+
+class RecordingSink(SilentSink):
+    """
+    Sink keeps records of finished phases in the list 'records'
+    """
+    def __init__(self):
+        self.records = []
+
+    def finish(self, phase):
+        self.records.append(phase.record())
+
+
+class ProgressSink(SilentSink):
+    """
+    Sink prints percentage of progress not more often than once per the interval and a summary of each phase
+    """
+    def __init__(self, stream=None, interval=0.25):
+        """
+        :param stream: A file-like object (standard output by default)
+        :param interval: Minimal interval between updates of the progress (seconds)
+        """
+        self.stream = stream
+        self.interval = interval
+        self.last = 0.0
+
+    def _write(self, text):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def progress(self, phase, step, max_step):
+        now = time.time()
+        if now - self.last < self.interval:
+            return
+        self.last = now
+        percent = 100.0 * float(step) / float(max_step) if max_step > 0 else 100.0
+        self._write("\r%s: %d%%" % (phase.routine or phase.name, percent))
+
+    def finish(self, phase):
+        text = "\r%s: %.3f s" % (phase.routine or phase.name, phase.wall_time)
+        if phase.elements is not None and phase.wall_time > 0.0:
+            text += ", %.0f elements/s" % (phase.elements / phase.wall_time)
+        if phase.nnz is not None:
+            text += ", nnz = %d" % phase.nnz
+        self._write(text + "\n")
+
+
+class JsonLinesSink(SilentSink):
+    """
+    Sink writes a JSON object per finished phase, one object per line
+    """
+    def __init__(self, output):
+        """
+        :param output: A file name or a file-like object
+        """
+        if not hasattr(output, "write"):
+            output = open(output, "a")
+        self.output = output
+
+    def finish(self, phase):
+        import json
+        self.output.write(json.dumps(phase.record(), sort_keys=True) + "\n")
+        self.output.flush()
+
+
+class LoggingSink(SilentSink):
+    """
+    Sink reports finished phases to a logger of the standard 'logging' module
+    """
+    def __init__(self, logger=None, level=None):
+        """
+        :param logger: A logger ('pyfem' logger by default)
+        :param level: A level of messages (INFO by default)
+        """
+        import logging
+        self.logger = logger if logger is not None else logging.getLogger("pyfem")
+        self.level = level if level is not None else logging.INFO
+
+    def finish(self, phase):
+        record = phase.record()
+        self.logger.log(self.level, "%s (%s): %.3f s, elements: %s, nnz: %s, peak memory: %s, memory delta: %s",
+                        record["phase"], record["routine"], record["wall_time"], record["elements"], record["nnz"],
+                        record["peak_memory"], record["memory_delta"])
+
+
+_sink = ProgressSink()
+_phases = []
+
+
+def set_sink(sink):
+    """
+    Routine replaces the sink that receives all phases
+    :param sink: An object with methods start(phase), progress(phase, step, max_step) and finish(phase)
+    :return: The previous sink
+    """
+    global _sink
+    previous = _sink
+    _sink = sink
+    return previous
+
+
+def get_sink():
+    return _sink
+
+
+class phase(object):
+    """
+    Context manager times a phase, e.g. a solution in a script:
+        with phase(SOLVE):
+            x = spsolve(stiffness, force)
+    """
+    def __init__(self, name, routine=None, elements=None):
+        self.phase = Phase(name, routine, elements)
+
+    def __enter__(self):
+        self.phase.begin()
+        _phases.append(self.phase)
+        _sink.start(self.phase)
+        return self.phase
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _phases.remove(self.phase)
+        self.phase.finish()
+        _sink.finish(self.phase)
+        return False
+
+
+def progress(step, max_step):
+    """
+    Subroutine reports progress of the innermost running phase
+    :param step: Current step value
+    :param max_step: Maximum value
+    :return: None
+    """
+    if _phases:
+        _sink.progress(_phases[-1], step, max_step)
+
+
+def timed(name):
+    """
+    Decorator times each call of a routine as a phase. A count of elements is taken from the argument 'elements' if it
+    has a length (or from the result of a mesh routine that returns a tuple (nodes, elements)) and a count of non-zero
+    entries is taken from the result if it is a sparse matrix
+    :param name: A name of the phase
+    :return: Decorator
+    """
+    from functools import wraps
+    from inspect import getcallargs
+
+    def decorator(routine):
+        @wraps(routine)
+        def wrapper(*args, **kwargs):
+            elements = getcallargs(getattr(routine, "__wrapped__", routine), *args, **kwargs).get("elements")
+            # a scalar index of an element or a generator of elements has no count
+            if not hasattr(elements, "__len__") or getattr(elements, "ndim", 1) == 0:
+                elements = None
+            with phase(name, routine.__name__, None if elements is None else len(elements)) as p:
+                result = routine(*args, **kwargs)
+                if hasattr(result, "nnz"):
+                    p.nnz = result.nnz
+                elif elements is None and isinstance(result, tuple) and len(result) == 2:
+                    p.elements = len(result[1])
+            return result
+        return wrapper
+
+    return decorator
@@ -3,6 +3,28 @@
 from numpy import array
 
 
+def _memoize(rule):
+    """
+    Decorator caches quadrature rules: a rule is evaluated once for each order, the returned arrays are read-only
+    :param rule: A function that evaluates a quadrature rule for the given order
+    :return: Memoized function
+    """
+    from functools import wraps
+    cache = {}
+
+    @wraps(rule)
+    def memoized(order):
+        if order not in cache:
+            arrays = rule(order)
+            for a in arrays:
+                a.setflags(write=False)
+            cache[order] = arrays
+        return cache[order]
+
+    return memoized
+
+
+@_memoize
 def legendre_interval(count):
     # type: (int) -> (array, array)
     """
@@ -53,57 +75,110 @@ def legendre_interval(count):
         return p, w
 
 
+# Fully symmetric rules of the unit triangle with positive weights and interior points only. Each rule is given by its
+# orbits: (w,) is the centroid, (w, a) stands for three points with barycentric coordinates (a, a, 1 - 2a) and (w, a, b)
+# stands for six points with barycentric coordinates (a, b, 1 - a - b). Weights are normalized to the area of the unit
+# triangle (1/2). Degrees 4-6 and 8-12 are the rules of D.A. Dunavant (1985), degree 7 is the 15-point rule of
+# H. Xiao and Z. Gimbutas (2010) because Dunavant's rule of this degree has a negative weight.
+_TRIANGLE_ORBITS = {
+    1: [
+        (0.5,)
+    ],
+    2: [
+        (1.0 / 6.0, 1.0 / 6.0)
+    ],
+    4: [
+        (0.05497587182766108, 0.09157621350977094),
+        (0.11169079483900558, 0.44594849091596483)
+    ],
+    5: [
+        (0.11249999999999932,),
+        (0.06619707639425329, 0.4701420641051149),
+        (0.0629695902724136, 0.10128650732345634)
+    ],
+    6: [
+        (0.058393137863217495, 0.24928674517087593),
+        (0.025422453185109, 0.06308901449150996),
+        (0.041425537809170083, 0.053145049844794116, 0.31035245103381254)
+    ],
+    7: [
+        (0.017451668878491512, 0.05354449418354037),
+        (0.0635794870508515, 0.24207944318656666),
+        (0.03084455270970481, 0.47395240967418273),
+        (0.027395479013809423, 0.24104980949925356, 0.7110113500294893)
+    ],
+    8: [
+        (0.07215780383888451,),
+        (0.047545817133647486, 0.4592925882927105),
+        (0.05160868526736273, 0.17056930775174511),
+        (0.01622924881160018, 0.05054722831703167),
+        (0.013615157087214046, 0.008394777409934592, 0.2631128296346878)
+    ],
+    9: [
+        (0.04856789814270665,),
+        (0.01566735011253776, 0.4896825191998686),
+        (0.03891377050277766, 0.43708959149475135),
+        (0.0398238694636256, 0.18820353561963007),
+        (0.012788837829316897, 0.044729513394396715),
+        (0.02164176968875327, 0.03683841205497962, 0.22196298916044818)
+    ],
+    10: [
+        (0.04540899519134507,),
+        (0.018362978878136708, 0.48557763338379156),
+        (0.022660529717765776, 0.10948157548510204),
+        (0.036378958422762016, 0.1417072194147516, 0.3079398387643375),
+        (0.014163621265524588, 0.025003534762703502, 0.24667256063983098),
+        (0.004710833481871304, 0.00954081540032502, 0.06680325101221461)
+    ],
+    12: [
+        (0.01286553313971505, 0.4882173899646821),
+        (0.02184627188587707, 0.4397243925614134),
+        (0.03142911222146637, 0.27121038492270644),
+        (0.017398057053674566, 0.12757614734607056),
+        (0.003083130435667128, 0.02131735005988464),
+        (0.020185778630062885, 0.11534349445956368, 0.2757132726381876),
+        (0.0111783867166987, 0.022838332474462077, 0.2813255798440848),
+        (0.00865811561837165, 0.025734050788662772, 0.11625191496150472)
+    ],
+}
+_TRIANGLE_DEGREES = {3: 4, 11: 12}  # degrees that have no rule with fewer points than the next degree
+
+
+@_memoize
 def legendre_triangle(order):
     # type: (int) -> (array, array, array)
     """
-    Gauss-Legendre rules of the unit triangle
-    :param order: Approximation order (1 - Linear, 2 - Quadratic, 3 - Cubic...)
+    Symmetric Gauss rules of the unit triangle with positive weights and interior points (the minimal count of points
+    known for each degree)
+    :param order: Approximation order, i.e. degree of polynomials that are integrated exactly (1 - Linear,
+    2 - Quadratic, 3 - Cubic, ..., 12). Greater orders are reduced to 12.
     :return: tuple(array of coordinates in the first parametric direction, array of coordinates in the second parametric
     direction, array of weights). The arrays are the same size.
     """
-    if order <= 1:
-        xi = array([1.0 / 3.0])
-        eta = array([1.0 / 3.0])
-        w = array([1.0 / 2.0])
-        return xi, eta, w
-    elif order == 2:
-        xi = array([1.0 / 2.0,
-                    0.0,
-                    1.0 / 2.0])
-        eta = array([1.0 / 2.0,
-                     1.0 / 2.0,
-                     0.0])
-        w = array([1.0 / 6.0,
-                   1.0 / 6.0,
-                   1.0 / 6.0])
-        return xi, eta, w
-    elif order == 3:
-        xi = array([1.0 / 6.0,
-                    2.0 / 3.0,
-                    1.0 / 6.0])
-        eta = array([1.0 / 6.0,
-                     1.0 / 6.0,
-                     2.0 / 3.0])
-        w = array([1.0 / 6.0,
-                   1.0 / 6.0,
-                   1.0 / 6.0])
-        return xi, eta, w
-    else:
-        xi = array([1.0 / 3.0,
-                    1.0 / 5.0,
-                    1.0 / 5.0,
-                    3.0 / 5.0])
-        eta = array([1.0 / 3.0,
-                     3.0 / 5.0,
-                     1.0 / 5.0,
-                     1.0 / 5.0])
-        w = array([-9.0 / 32.0,
-                   25.0 / 96.0,
-                   25.0 / 96.0,
-                   25.0 / 96.0])
-        return xi, eta, w
+    degree = min(max(order, 1), 12)
+    degree = _TRIANGLE_DEGREES.get(degree, degree)
+    xi = []
+    eta = []
+    w = []
+    for orbit in _TRIANGLE_ORBITS[degree]:
+        if len(orbit) == 1:
+            points = [(1.0 / 3.0, 1.0 / 3.0)]
+        elif len(orbit) == 2:
+            a = orbit[1]
+            points = [(a, a), (1.0 - 2.0 * a, a), (a, 1.0 - 2.0 * a)]
+        else:
+            a = orbit[1]
+            b = orbit[2]
+            c = 1.0 - a - b
+            points = [(a, b), (b, a), (a, c), (c, a), (b, c), (c, b)]
+        for p in points:
+            xi.append(p[0])
+            eta.append(p[1])
+            w.append(orbit[0])
+    return array(xi), array(eta), array(w)
 
 
+@_memoize
 def legendre_tetrahedra(order):
     # type: (int) -> (array, array, array, array)
     """
@@ -161,6 +236,7 @@ def legendre_tetrahedra(order):
         return xi, eta, mu, w
 
 
+@_memoize
 def legendre_quad(order):
     # type: (int) -> (array, array, array)
     """
@@ -183,6 +259,7 @@ def legendre_quad(order):
     return xi, eta, weight
 
 
+@_memoize
 def legendre_hexahedra(order):
     # type: (int) -> (array, array, array, array)
     """
@@ -209,6 +286,7 @@ def legendre_hexahedra(order):
     return xi, eta, mu, weight
 
 
+@_memoize
 def lobatto_interval(count):
     # type: (int) -> (array, array)
     """
@@ -257,6 +335,7 @@ def lobatto_interval(count):
         return p, w
 
 
+@_memoize
 def lobatto_quad(order):
     # type: (int) -> (array, array, array)
     """
@@ -279,6 +358,7 @@ def lobatto_quad(order):
     return xi, eta, weight
 
 
+@_memoize
 def lobatto_hexahedra(order):
     # type: (int) -> (array, array, array, array)
     """
@@ -312,7 +392,7 @@ if __name__ == "__main__":
         (p, w) = legendre_interval(i)
         print(i.__str__() + ": " + p.__str__() + " " + w.__str__() + " sum(w) = " + w.sum().__str__())
     print("Rules of the unit triangle")
-    for i in range(1, 5):
+    for i in range(1, 13):
         (xi, eta, w) = legendre_triangle(i)
         print(i.__str__() + ": " + xi.__str__() + " " + eta.__str__() + " " + w.__str__() + " sum(w) = " + w.sum().__str__())
     print("Rules of the unit tetrahedra")
@@ -2,6 +2,32 @@
 # -*- coding: utf-8 -*-
 
 
+def reference_shape(xi, eta, element_nodes):
+    """
+    Function evaluates shape functions of quadrilaterals (bilinear) or triangles (linear) and their derivatives in
+    parametric directions; scalars or arrays of parametric points are accepted
+    :param xi: Coordinates in the first parametric direction (a scalar or an array)
+    :param eta: Coordinates in the second parametric direction (a scalar or an array)
+    :param element_nodes: A count of nodes of an element (4 or 3)
+    :return: Tuple of arrays [points_count; element_nodes] (or [element_nodes] for scalars): shape functions,
+    derivatives in xi, derivatives in eta
+    """
+    from numpy import array, ones_like, zeros_like
+    if element_nodes == 4:
+        shape = array([(1.0 - xi) * (1.0 - eta), (1.0 + xi) * (1.0 - eta), (1.0 + xi) * (1.0 + eta),
+                       (1.0 - xi) * (1.0 + eta)]) / 4.0
+        shape_dxi = array([-(1.0 - eta), 1.0 - eta, 1.0 + eta, -(1.0 + eta)]) / 4.0
+        shape_deta = array([-(1.0 - xi), -(1.0 + xi), 1.0 + xi, 1.0 - xi]) / 4.0
+    elif element_nodes == 3:
+        (one, zero) = (ones_like(xi), zeros_like(xi))
+        shape = array([1.0 - xi - eta, xi, eta])
+        shape_dxi = array([-one, one, zero])
+        shape_deta = array([-one, zero, one])
+    else:
+        raise ValueError("Only quadrilaterals and triangles are supported")
+    return shape.transpose(), shape_dxi.transpose(), shape_deta.transpose()
+
+
 def iso_quad(element_nodes, xi, eta):
     """
     Isoparametric shape function for a quadrilateral element (nodes must be ordered counterclockwise)
@@ -16,24 +42,7 @@ def iso_quad(element_nodes, xi, eta):
     from numpy import sum
     from numpy.linalg import det
     from numpy.linalg import inv
-    shape = array([
-        (1.0 - xi) * (1.0 - eta) / 4.0,
-        (1.0 + xi) * (1.0 - eta) / 4.0,
-        (1.0 + xi) * (1.0 + eta) / 4.0,
-        (1.0 - xi) * (1.0 + eta) / 4.0
-    ])  # bilinear shape functions
-    shape_dxi = array([
-        -(1.0 - eta) / 4.0,
-        (1.0 - eta) / 4.0,
-        (1.0 + eta) / 4.0,
-        -(1.0 + eta) / 4.0
-    ])  # derivatives of the shape functions in the first parametric direction
-    shape_deta = array([
-        -(1.0 - xi) / 4.0,
-        -(1.0 + xi) / 4.0,
-        (1.0 + xi) / 4.0,
-        (1.0 - xi) / 4.0
-    ])  # derivatives of the shape functions in the second parametric direction
+    (shape, shape_dxi, shape_deta) = reference_shape(xi, eta, 4)  # bilinear shape functions and derivatives
     x = element_nodes[:, 0]
     y = element_nodes[:, 1]
     jacobi = array([
@@ -47,6 +56,25 @@ def iso_quad(element_nodes, xi, eta):
     return jacobian, shape, shape_dx, shape_dy
 
 
+def quad_jacobi(element_nodes, xi, eta):
+    """
+    Jacobi matrix of the isoparametric mapping of a quadrilateral element
+    :param element_nodes: a sequence of nodes in the element: [4; 2]-matrix
+    :param xi: Coordinate in the first parametric direction
+    :param eta: Coordinate in the second parametric direction
+    :return: [2; 2]-matrix: [[dx/dxi, dy/dxi], [dx/deta, dy/deta]]
+    """
+    from numpy import array
+    from numpy import sum
+    (shape, shape_dxi, shape_deta) = reference_shape(xi, eta, 4)
+    x = element_nodes[:, 0]
+    y = element_nodes[:, 1]
+    return array([
+        [sum(shape_dxi * x), sum(shape_dxi * y)],
+        [sum(shape_deta * x), sum(shape_deta * y)]
+    ])
+
+
 def iso_triangle(element_nodes, xi, eta):
     """
     Isoparametric shape function for a triangular element (nodes must be ordered counterclockwise)
@@ -61,21 +89,7 @@ def iso_triangle(element_nodes, xi, eta):
     from numpy import sum
     from numpy.linalg import det
     from numpy.linalg import inv
-    shape = array([
-        1.0 - xi - eta,
-        xi,
-        eta
-    ])  # linear shape functions
-    shape_dxi = array([
-        -1.0,
-        1.0,
-        0.0
-    ])  # derivatives of the shape functions in the first parametric direction
-    shape_deta = array([
-        -1.0,
-        0.0,
-        1.0
-    ])
+    (shape, shape_dxi, shape_deta) = reference_shape(xi, eta, 3)  # linear shape functions and derivatives
     x = element_nodes[:, 0]
     y = element_nodes[:, 1]
     jacobi = array([
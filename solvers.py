@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from numpy import float32, float64
+from scipy.sparse.linalg import LinearOperator
+from profiling import phase, SOLVE
+
+
+def _norms(values):
+    from numpy import sqrt, sum
+    return sqrt(sum(values.reshape(values.shape[0], -1)**2.0, axis=0))
+
+
+def _lu_refinement(matrix, rhs, tol, maxiter, stagnation, info):
+    """
+    Iterative refinement with the float32 sparse LU factorization: corrections are solved in float32, residuals are
+    evaluated in float64. Residuals are scaled before they are rounded to float32, so small corrections don't underflow
+    :return: A solution or None if the refinement stagnated
+    """
+    from scipy.sparse.linalg import splu
+    lu = splu(matrix.astype(float32).tocsc())
+    info["factor_nnz"] = lu.L.nnz + lu.U.nnz
+    rhs_norms = _norms(rhs)
+    rhs_norms[rhs_norms == 0.0] = 1.0
+    x = lu.solve(rhs.astype(float32)).astype(float64)
+    previous = None
+    for iteration in range(maxiter + 1):
+        residual = rhs - matrix.dot(x)
+        norms = _norms(residual)
+        relative = (norms / rhs_norms).max()
+        info["residuals"].append(relative)
+        info["iterations"] = iteration
+        if relative <= tol:
+            return x
+        if previous is not None and relative > stagnation * previous:
+            info["reason"] = "stagnation: the residual %.3e after %d iterations" % (relative, iteration)
+            return None
+        previous = relative
+        scales = norms.copy()
+        scales[scales == 0.0] = 1.0
+        scaled = (residual.reshape(residual.shape[0], -1) / scales).reshape(residual.shape)
+        correction = lu.solve(scaled.astype(float32)).astype(float64)
+        x += (correction.reshape(correction.shape[0], -1) * scales).reshape(x.shape)
+    info["reason"] = "the residual %.3e after %d iterations" % (info["residuals"][-1], maxiter)
+    return None
+
+
+def _ilu_cg(matrix, rhs, tol, maxiter, drop_tol, fill_factor, info):
+    """
+    Conjugate gradients in float64 preconditioned by the float32 incomplete LU factorization
+    :return: A solution or None if the iterations didn't converge
+    """
+    from scipy.sparse.linalg import spilu, cg
+    from numpy import zeros, linalg
+    ilu = spilu(matrix.astype(float32).tocsc(), drop_tol=drop_tol, fill_factor=fill_factor)
+    info["factor_nnz"] = ilu.L.nnz + ilu.U.nnz
+    preconditioner = LinearOperator(matrix.shape, lambda v: ilu.solve(v.astype(float32)).astype(float64),
+                                    dtype=float64)
+    columns = rhs.reshape(rhs.shape[0], -1)
+    x = zeros(columns.shape)
+    for j in range(columns.shape[1]):
+        norm = linalg.norm(columns[:, j])
+        if norm == 0.0:
+            continue
+        history = []
+        (x[:, j], code) = cg(matrix, columns[:, j], tol=tol, maxiter=maxiter, M=preconditioner,
+                             callback=lambda xk: history.append(None))
+        info["iterations"] = max(info["iterations"], len(history))
+        info["residuals"].append(linalg.norm(columns[:, j] - matrix.dot(x[:, j])) / norm)
+        if code != 0:
+            info["reason"] = "conjugate gradients didn't converge (code %d, the residual %.3e)" % (
+                code, info["residuals"][-1])
+            return None
+    return x.reshape(rhs.shape)
+
+
+def refined_solve(matrix, rhs, tol=1.0E-10, maxiter=None, method="lu", stagnation=0.5, fallback=True, drop_tol=1.0E-4,
+                  fill_factor=10.0):
+    """
+    Mixed precision solution of a linear system: the factorization (or the preconditioner) is computed and stored in
+    float32, residuals and the solution are float64. If iterations stagnate (it happens for ill-conditioned systems,
+    e.g. thin Mindlin plates), the system is solved by the float64 sparse LU factorization
+    :param matrix: A sparse matrix (e.g. CSR matrix of assembly2d)
+    :param rhs: A right-hand side [dimension] or right-hand sides [dimension; cases_count]
+    :param tol: A relative tolerance of residuals
+    :param maxiter: A maximal count of iterations (20 for "lu", the dimension for "ilu")
+    :param method: "lu" - iterative refinement with the float32 LU factorization, "ilu" - conjugate gradients with
+    the float32 incomplete LU preconditioner (a symmetric positive definite matrix is required)
+    :param stagnation: The refinement stagnates if a residual decreases less than by this factor in an iteration
+    :param fallback: Solve by the float64 factorization if the mixed precision solution fails (raise ValueError if False)
+    :param drop_tol: A drop tolerance of the incomplete LU factorization
+    :param fill_factor: A fill factor of the incomplete LU factorization
+    :return: Tuple: the solution, a dictionary: method, iterations, residuals (relative residuals of iterations),
+    factor_nnz, converged (of the mixed precision solution), fallback (whether float64 factorization was used), reason
+    """
+    from scipy.sparse.linalg import splu
+    from numpy import asarray
+    if method not in ("lu", "ilu"):
+        raise ValueError("Unknown method: " + str(method))
+    matrix = matrix.tocsr()
+    rhs = asarray(rhs, dtype=float64)
+    info = {
+        "method": method,
+        "iterations": 0,
+        "residuals": [],
+        "factor_nnz": None,
+        "converged": False,
+        "fallback": False,
+        "reason": None
+    }
+    with phase(SOLVE, "refined_solve (%s)" % method):
+        try:
+            if method == "lu":
+                x = _lu_refinement(matrix, rhs, tol, 20 if maxiter is None else maxiter, stagnation, info)
+            else:
+                x = _ilu_cg(matrix, rhs, tol, matrix.shape[0] if maxiter is None else maxiter, drop_tol, fill_factor,
+                            info)
+        except RuntimeError as e:
+            x = None
+            info["reason"] = "float32 factorization failed: " + str(e)
+        if x is not None:
+            info["converged"] = True
+            return x, info
+        if not fallback:
+            raise ValueError("Mixed precision solution failed: " + info["reason"])
+        info["fallback"] = True
+        x = splu(matrix.tocsc()).solve(rhs)
+    return x, info
+
+
+def jacobi(matrix):
+    """
+    Jacobi preconditioner: the inverse of the diagonal of a matrix
+    :param matrix: A sparse matrix
+    :return: LinearOperator (it is applied to vectors and to arrays of columns)
+    """
+    inverse = 1.0 / matrix.diagonal()
+
+    def apply(values):
+        return (inverse * values.reshape(values.shape[0], -1).transpose()).transpose().reshape(values.shape)
+
+    return LinearOperator(matrix.shape, matvec=apply, matmat=apply, dtype=float64)
+
+
+def block_jacobi(matrix, blocksize=None):
+    """
+    Block Jacobi preconditioner: inverses of diagonal blocks of a matrix. Blocks of matrices of assembly2d with
+    blocks=True couple freedoms of a node, so the preconditioner is more effective than the Jacobi one for plates
+    :param matrix: A BSR matrix or a sparse matrix (it is converted to BSR)
+    :param blocksize: A size of blocks (the block size of a BSR matrix by default)
+    :return: LinearOperator (it is applied to vectors and to arrays of columns)
+    """
+    from numpy import zeros, arange, repeat, diff, einsum
+    from numpy.linalg import inv
+    if blocksize is None:
+        if matrix.format != "bsr":
+            raise ValueError("A block size is required for matrices of format " + matrix.format)
+        blocksize = matrix.blocksize[0]
+    if matrix.format != "bsr" or matrix.blocksize != (blocksize, blocksize):
+        matrix = matrix.tobsr(blocksize=(blocksize, blocksize))
+    rows_count = matrix.shape[0] // blocksize
+    rows = repeat(arange(rows_count), diff(matrix.indptr))
+    diagonal = matrix.indices == rows
+    blocks = zeros((rows_count, blocksize, blocksize))
+    blocks[rows[diagonal]] = matrix.data[diagonal]
+    inverse = inv(blocks)
+
+    def apply(values):
+        columns = values.reshape(rows_count, blocksize, -1)
+        return einsum("rij,rjk->rik", inverse, columns).reshape(values.shape)
+
+    return LinearOperator(matrix.shape, matvec=apply, matmat=apply, dtype=float64)
+
+
+class SymmetricOperator(LinearOperator):
+    """
+    Symmetric matrix stored as its upper triangle U (see assembly2d routines with upper=True): products are evaluated
+    as U x + U^T x - diag(U) x, so values and indices take about a half of the memory of the full matrix. The operator
+    is accepted by cg, eigsh and other iterative solvers of scipy:
+        operator = SymmetricOperator(assembly_quads_mindlin_plate(nodes, elements, h, d, upper=True))
+        (x, info) = cg(operator, force, M=jacobi(operator))
+    """
+    def __init__(self, upper):
+        """
+        :param upper: The upper triangle of a symmetric matrix (a sparse matrix, it is converted to CSR)
+        """
+        super(SymmetricOperator, self).__init__(upper.dtype, upper.shape)
+        self.upper = upper.tocsr()
+        self._diagonal = self.upper.diagonal()
+
+    def _matvec(self, x):
+        x = x.ravel()
+        return self.upper.dot(x) + self.upper.transpose().dot(x) - self._diagonal * x
+
+    def _matmat(self, x):
+        return self.upper.dot(x) + self.upper.transpose().dot(x) - self._diagonal[:, None] * x
+
+    def _adjoint(self):
+        return self
+
+    def diagonal(self):
+        return self._diagonal
+
+    def full(self):
+        """
+        :return: The full matrix in the CSR format (it takes the memory of the full matrix)
+        """
+        from scipy.sparse import diags
+        return (self.upper + self.upper.transpose() - diags(self._diagonal)).tocsr()
+
+
+def symmetric_solve(upper, rhs):
+    """
+    Function solves a symmetric positive definite system stored as its upper triangle by a direct method. The sparse
+    Cholesky factorization of scikit-sparse (CHOLMOD) reads the triangle as is (U^T is the lower triangle in the CSC
+    format without a copy); without scikit-sparse the full matrix is formed and factored by the sparse LU
+    factorization of scipy
+    :param upper: The upper triangle of a matrix (a sparse matrix or SymmetricOperator)
+    :param rhs: A right-hand side [dimension] or right-hand sides [dimension; cases_count]
+    :return: The solution
+    """
+    from numpy import asarray
+    if isinstance(upper, SymmetricOperator):
+        upper = upper.upper
+    upper = upper.tocsr()
+    rhs = asarray(rhs, dtype=float64)
+    try:
+        from sksparse.cholmod import cholesky
+    except ImportError:
+        cholesky = None
+    with phase(SOLVE, "symmetric_solve"):
+        if cholesky is not None:
+            return cholesky(upper.transpose().tocsc())(rhs)
+        from scipy.sparse.linalg import splu
+        return splu(SymmetricOperator(upper).full().tocsc()).solve(rhs)
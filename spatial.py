@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from profiling import timed, LOADS
+from cache import cached
+
+
+def inverse_mapping(vertices, points, iterations=20, tolerance=1.0E-12):
+    """
+    Function inverts isoparametric mappings of elements by Newton's method (exact in one step for triangles)
+    :param vertices: An array of vertices of elements [count; element_nodes; 2]
+    :param points: An array of points [count; 2], a point per element
+    :param iterations: A maximal count of iterations
+    :param tolerance: A tolerance of parametric coordinates
+    :return: Tuple of arrays [count]: xi, eta (nan where the iterations diverge)
+    """
+    from numpy import zeros, einsum, abs, nan, errstate
+    from shape_functions import reference_shape
+    count = len(points)
+    (xi, eta) = (zeros(count), zeros(count))
+    if vertices.shape[1] == 3:
+        (xi, eta) = (xi + 1.0 / 3.0, eta + 1.0 / 3.0)
+    with errstate(divide="ignore", invalid="ignore"):
+        for iteration in range(iterations):
+            (shape, shape_dxi, shape_deta) = reference_shape(xi, eta, vertices.shape[1])
+            residual = einsum("pa,paj->pj", shape, vertices) - points
+            x_xi = einsum("pa,paj->pj", shape_dxi, vertices)
+            x_eta = einsum("pa,paj->pj", shape_deta, vertices)
+            # [x_xi, x_eta] * [d_xi, d_eta]^T = -residual
+            determinant = x_xi[:, 0] * x_eta[:, 1] - x_eta[:, 0] * x_xi[:, 1]
+            d_xi = -(x_eta[:, 1] * residual[:, 0] - x_eta[:, 0] * residual[:, 1]) / determinant
+            d_eta = -(x_xi[:, 0] * residual[:, 1] - x_xi[:, 1] * residual[:, 0]) / determinant
+            xi += d_xi
+            eta += d_eta
+            if not (abs(d_xi) + abs(d_eta) > tolerance).any():
+                break
+        diverged = ~(abs(xi) < 1.0E3) | ~(abs(eta) < 1.0E3)
+    xi[diverged] = nan
+    eta[diverged] = nan
+    return xi, eta
+
+
+def _inside(xi, eta, element_nodes, tolerance):
+    if element_nodes == 4:
+        return (abs(xi) <= 1.0 + tolerance) & (abs(eta) <= 1.0 + tolerance)
+    return (xi >= -tolerance) & (eta >= -tolerance) & (xi + eta <= 1.0 + tolerance)
+
+
+class SpatialIndex(object):
+    """
+    Spatial index of a mesh of quadrilaterals or triangles: KD-trees of nodes and of centers of bounding boxes of
+    elements (scipy.spatial.cKDTree). Elements are grouped by size classes (half-diagonals of boxes within a factor of
+    two), a tree of a class is searched within the largest half-diagonal of the class, so a point of a graded mesh
+    meets a few elements of each class. A point is located by testing elements whose boxes contain it and inverting
+    their isoparametric mappings, all points at once:
+        index = SpatialIndex(nodes, elements)
+        deflections = index.probe(x[0::3], sensors)
+        force = point_force(nodes, elements, 2, [[0.0, 0.0]], [[0.0, -q]], index)
+    """
+    def __init__(self, nodes, elements):
+        """
+        :param nodes: A two-dimensional array of coordinates
+        :param elements: A two-dimensional array of quadrilaterals or triangles
+        """
+        from scipy.spatial import cKDTree
+        from numpy import floor, log2, maximum, unique, arange
+        self.nodes = nodes[:, :2].astype(float)
+        self.elements = elements
+        vertices = self.nodes[elements]
+        (self.low, self.high) = (vertices.min(axis=1), vertices.max(axis=1))
+        radii = 0.5 * ((self.high - self.low)**2.0).sum(axis=1)**0.5
+        centers = 0.5 * (self.low + self.high)
+        self.node_tree = cKDTree(self.nodes)
+        # [(indices of elements, a tree of centers of boxes, the largest half-diagonal)] of size classes
+        self.element_trees = []
+        if len(elements):
+            smallest = radii[radii > 0.0].min() if (radii > 0.0).any() else 1.0
+            classes = floor(log2(maximum(radii, smallest) / smallest)).astype(int)
+            for size_class in unique(classes):
+                members = arange(len(elements))[classes == size_class]
+                self.element_trees.append((members, cKDTree(centers[members]), radii[members].max()))
+
+    def nearest_nodes(self, points, count=1):
+        """
+        :param points: An array of points [points_count; 2]
+        :param count: A count of nearest nodes of each point
+        :return: Tuple: distances, indices of nodes ([points_count] if count is 1, [points_count; count] otherwise)
+        """
+        from numpy import asarray
+        return self.node_tree.query(asarray(points, dtype=float)[:, :2], k=count)
+
+    def locate(self, points, tolerance=1.0E-8):
+        """
+        Function finds elements that contain points and parametric coordinates of the points
+        :param points: An array of points [points_count; 2]
+        :param tolerance: A tolerance of parametric coordinates (points on common edges belong to one of elements)
+        :return: Tuple of arrays [points_count]: indices of elements (-1 for points outside the mesh), xi, eta
+        """
+        from numpy import asarray, array, full, nan, repeat, concatenate, unique
+        points = asarray(points, dtype=float)[:, :2]
+        count = len(points)
+        found = full(count, -1)
+        (xi, eta) = (full(count, nan), full(count, nan))
+        if count == 0 or len(self.elements) == 0:
+            return found, xi, eta
+        extent = (self.high.max(axis=0) - self.low.min(axis=0)).max()
+        margin = tolerance * (1.0 if extent == 0.0 else extent)
+        (owners, candidates) = ([], [])
+        for (members, tree, radius) in self.element_trees:
+            near = tree.query_ball_point(points, radius * (1.0 + tolerance) + margin)
+            owners.append(repeat(range(count), [len(c) for c in near]))
+            candidates.append(members[array(concatenate([c for c in near if len(c)]) if len(owners[-1]) else [],
+                                            dtype=int)])
+        (owners, candidates) = (concatenate(owners), concatenate(candidates))
+        boxed = ((points[owners] >= self.low[candidates] - margin) &
+                 (points[owners] <= self.high[candidates] + margin)).all(axis=1)
+        (owners, candidates) = (owners[boxed], candidates[boxed])
+        if len(owners) == 0:
+            return found, xi, eta
+        (p, q) = inverse_mapping(self.nodes[self.elements[candidates]], points[owners])
+        inside = _inside(p, q, self.elements.shape[1], tolerance)
+        (owners, candidates, p, q) = (owners[inside], candidates[inside], p[inside], q[inside])
+        (owners, first) = unique(owners, return_index=True)
+        found[owners] = candidates[first]
+        xi[owners] = p[first]
+        eta[owners] = q[first]
+        return found, xi, eta
+
+    def interpolation_matrix(self, points, tolerance=1.0E-8):
+        """
+        Function evaluates the matrix of interpolation of nodal values at points by shape functions of elements
+        that contain them
+        :param points: An array of points [points_count; 2]
+        :param tolerance: A tolerance of parametric coordinates (see locate)
+        :return: Tuple: a CSR matrix [points_count; nodes_count] (zero rows for points outside the mesh), an array of
+        indices of elements of points (-1 outside)
+        """
+        from numpy import repeat, arange
+        from scipy.sparse import csr_matrix
+        from shape_functions import reference_shape
+        (found, xi, eta) = self.locate(points, tolerance)
+        inside = arange(len(found))[found >= 0]
+        element_nodes = self.elements.shape[1]
+        (shape, shape_dxi, shape_deta) = reference_shape(xi[inside], eta[inside], element_nodes)
+        matrix = csr_matrix((shape.ravel(), (repeat(inside, element_nodes), self.elements[found[inside]].ravel())),
+                            shape=(len(found), len(self.nodes)))
+        return matrix, found
+
+    def probe(self, values, points, freedom=1, tolerance=1.0E-8):
+        """
+        Function evaluates a nodal field at points (e.g. sensors)
+        :param values: An array of nodal values [nodes_count * freedom] (e.g. a solution) or [nodes_count; ...]
+        :param points: An array of points [points_count; 2]
+        :param freedom: A count of values per node of a flat array
+        :param tolerance: A tolerance of parametric coordinates (see locate)
+        :return: An array of values at points [points_count] or [points_count; freedom] or [points_count; ...] (nan
+        outside the mesh)
+        """
+        from numpy import asarray, nan
+        (matrix, found) = self.interpolation_matrix(points, tolerance)
+        values = asarray(values)
+        if freedom > 1:
+            values = values.reshape(len(self.nodes), freedom)
+        result = matrix.dot(values.reshape(len(self.nodes), -1)).reshape((len(found),) + values.shape[1:])
+        result[found < 0] = nan
+        return result
+
+
+def gauss_points(nodes, elements, gauss_order=3):
+    """
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param gauss_order: An order of gaussian quadratures
+    :return: Coordinates of Gauss points [elements_count * points_count; 2] in the order of Gauss-point fields (see
+    load_cases.thermal_load_operator, force.thermal_force_quads)
+    """
+    from quadrature import legendre_quad
+    from load_cases import quads_geometry
+    (xi, eta, w) = legendre_quad(gauss_order)
+    return quads_geometry(nodes, elements, xi, eta)[4].reshape(-1, 2)
+
+
+def gauss_interpolation(nodes, elements, gauss_order=3):
+    """
+    Function evaluates the interpolation of a nodal field of quadrilaterals at their Gauss points (e.g. temperatures
+    for force.thermal_force_quads and load_cases.thermal_load_operator)
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param gauss_order: An order of gaussian quadratures
+    :return: A CSR matrix [elements_count * points_count; nodes_count]
+    """
+    from numpy import repeat, arange, tile
+    from scipy.sparse import csr_matrix
+    from quadrature import legendre_quad
+    from shape_functions import reference_shape
+    (xi, eta, w) = legendre_quad(gauss_order)
+    (shape, shape_dxi, shape_deta) = reference_shape(xi, eta, 4)
+    (elements_count, points_count) = (len(elements), len(w))
+    rows = repeat(arange(elements_count * points_count), 4)
+    columns = repeat(elements[:, None, :], points_count, axis=1).ravel()
+    return csr_matrix((tile(shape.ravel(), elements_count), (rows, columns)),
+                      shape=(elements_count * points_count, len(nodes)))
+
+
+def gauss_projection(nodes, elements, gauss_order=3):
+    """
+    Function evaluates the lumped L2 projection of Gauss-point fields of quadrilaterals to nodes: a nodal value is
+    the mean of values at Gauss points of elements of the node weighted by the shape function of the node
+    :param nodes: A two-dimensional array of coordinates
+    :param elements: A two-dimensional array of quadrilaterals
+    :param gauss_order: An order of gaussian quadratures
+    :return: A CSR matrix [nodes_count; elements_count * points_count]
+    """
+    from numpy import arange, repeat, bincount
+    from scipy.sparse import csr_matrix
+    from quadrature import legendre_quad
+    from load_cases import quads_geometry
+    (xi, eta, w) = legendre_quad(gauss_order)
+    (jacobian, shape, shape_dx, shape_dy, points) = quads_geometry(nodes, elements, xi, eta)
+    (elements_count, points_count) = jacobian.shape
+    # [e, p, a]
+    weights = (jacobian * w)[:, :, None] * shape[None, :, :]
+    rows = repeat(elements[:, None, :], points_count, axis=1).ravel()
+    columns = repeat(arange(elements_count * points_count), elements.shape[1])
+    lumped = bincount(rows, weights.ravel(), minlength=len(nodes))
+    lumped[lumped == 0.0] = 1.0
+    return csr_matrix(((weights / lumped[elements][:, None, :]).ravel(), (rows, columns)),
+                      shape=(len(nodes), elements_count * points_count))
+
+
+@timed(LOADS)
+@cached
+def transfer_matrix(source_nodes, source_elements, target_nodes, target_elements=None, source="nodes",
+                    target="nodes", gauss_order=3, tolerance=1.0E-8):
+    """
+    Function evaluates the matrix of transfer of a scalar field from a mesh to another (e.g. temperatures of a thermal
+    mesh to a structural mesh): target = matrix * source, so repeated transfers (time steps, load cases as columns)
+    are products by a precomputed sparse matrix. Values at target points are interpolated by shape functions of source
+    elements that contain them; points outside the source mesh (e.g. at curved boundaries discretized differently)
+    take values of the nearest source nodes. The matrix is cached with assembled matrices (see cache.enable):
+        transfer = transfer_matrix(thermal_nodes, thermal_elements, nodes, elements, target="gauss")
+        force = thermal_force_quads(nodes, elements, h, d, alpha, temperatures=transfer.dot(temperature))
+    :param source_nodes: A two-dimensional array of coordinates of the source mesh
+    :param source_elements: A two-dimensional array of quadrilaterals or triangles of the source mesh
+    :param target_nodes: A two-dimensional array of coordinates of the target mesh
+    :param target_elements: A two-dimensional array of quadrilaterals of the target mesh (required by target="gauss")
+    :param source: "nodes" - a nodal field, "gauss" - a Gauss-point field of quadrilaterals (see gauss_points), it is
+    projected to source nodes (see gauss_projection)
+    :param target: "nodes" - values at target nodes, "gauss" - values at Gauss points of target quadrilaterals
+    :param gauss_order: An order of gaussian quadratures of Gauss-point fields
+    :param tolerance: A tolerance of parametric coordinates (see SpatialIndex.locate)
+    :return: A CSR matrix [targets_count; sources_count]
+    """
+    from numpy import concatenate, arange, ones
+    from scipy.sparse import csr_matrix
+    if source not in ("nodes", "gauss") or target not in ("nodes", "gauss"):
+        raise ValueError("Unknown kind of a field: " + str(source if source not in ("nodes", "gauss") else target))
+    if target == "gauss" and target_elements is None:
+        raise ValueError("Gauss points require target elements")
+    points = target_nodes[:, :2] if target == "nodes" else gauss_points(target_nodes, target_elements, gauss_order)
+    index = SpatialIndex(source_nodes, source_elements)
+    (matrix, found) = index.interpolation_matrix(points, tolerance)
+    outside = arange(len(points))[found < 0]
+    if len(outside):
+        (distances, nearest) = index.nearest_nodes(points[outside])
+        matrix = matrix.tocoo()
+        matrix = csr_matrix((concatenate((matrix.data, ones(len(outside)))),
+                             (concatenate((matrix.row, outside)), concatenate((matrix.col, nearest)))),
+                            shape=matrix.shape)
+    if source == "gauss":
+        matrix = matrix.dot(gauss_projection(source_nodes, source_elements, gauss_order)).tocsr()
+    return matrix
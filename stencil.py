@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from scipy.sparse.linalg import LinearOperator
+
+_CORNERS = ((0, 0), (0, 1), (1, 0), (1, 1))  # offsets of nodes of a cell in the numbering of rectangular_quads
+
+
+def cell_matrix(width, height, assembly):
+    """
+    Function evaluates the local matrix of a cell of a uniform grid
+    :param width: A width of a cell
+    :param height: A height of a cell
+    :param assembly: A function assembly(nodes, elements) that returns the stiffness matrix of a mesh
+    :return: A dense matrix [4 * freedom; 4 * freedom], nodes are ordered as _CORNERS
+    """
+    from mesh2d import rectangular_quads
+    (nodes, elements) = rectangular_quads(2, 2, 0.0, 0.0, width, height)
+    return assembly(nodes, elements).toarray()
+
+
+class StencilOperator(LinearOperator):
+    """
+    Stiffness operator of a uniform rectangular grid (rectangular_quads) that doesn't store a matrix: all cells share
+    a local matrix, so a row of an interior node is a 9-point stencil of [freedom; freedom]-blocks. A product is
+    evaluated by shifted slices of the (x_count, y_count, freedom) view of a vector; rows of boundary nodes are corrected
+    by subtracting contributions of ghost cells outside the grid. Memory is O(nodes):
+        operator = StencilOperator(1001, 1001, 1.0, 1.0, lambda n, e: assembly_quads_stress_strain(n, e, 1.0, d),
+                                   2, fixed)
+        (x, info) = cg(operator, force, M=operator.jacobi())
+    Prescribed freedoms are eliminated: their rows and columns are replaced by rows and columns of the identity, so a
+    right-hand side must be zero at them (see load_cases.apply_dirichlet for nonzero values)
+    """
+    def __init__(self, x_count, y_count, width, height, assembly, freedom, fixed=None):
+        """
+        :param x_count: Nodes count in x-direction
+        :param y_count: Nodes count in y-direction
+        :param width: Width of the region
+        :param height: Height of the region
+        :param assembly: A function assembly(nodes, elements) that returns the stiffness matrix of a mesh
+        :param freedom: A count of freedoms in each node
+        :param fixed: Indices of prescribed freedoms or None
+        """
+        from numpy import zeros, float64
+        dimension = freedom * x_count * y_count
+        super(StencilOperator, self).__init__(float64, (dimension, dimension))
+        self.grid = (x_count, y_count, freedom)
+        self.local = cell_matrix(width / float(x_count - 1), height / float(y_count - 1), assembly)
+        # self.weights[1 + di, 1 + dj] couples a node (i, j) with the node (i + di, j + dj)
+        self.weights = zeros((3, 3, freedom, freedom))
+        for (a, (ai, aj)) in enumerate(_CORNERS):
+            for (b, (bi, bj)) in enumerate(_CORNERS):
+                self.weights[1 + bi - ai, 1 + bj - aj] += self._block(a, b)
+        self.free = None
+        if fixed is not None:
+            from numpy import ones
+            self.free = ones(dimension, dtype=bool)
+            self.free[fixed] = False
+
+    def _block(self, a, b):
+        freedom = self.grid[2]
+        return self.local[freedom * a:freedom * (a + 1), freedom * b:freedom * (b + 1)]
+
+    def _cells(self, padded, result, i_range, j_range):
+        """
+        Subroutine subtracts products of the local matrix of cells of a range (padded numbering, cells outside
+        the grid are ghost cells) from a result
+        """
+        (i0, i1) = i_range
+        (j0, j1) = j_range
+        if i1 <= i0 or j1 <= j0:
+            return
+        freedom = self.grid[2]
+        for (a, (ai, aj)) in enumerate(_CORNERS):
+            for (b, (bi, bj)) in enumerate(_CORNERS):
+                for (p, q) in zip(*self._block(a, b).nonzero()):
+                    result[p, i0 + ai:i1 + ai, j0 + aj:j1 + aj] -= self.local[freedom * a + p, freedom * b + q] * \
+                        padded[q, i0 + bi:i1 + bi, j0 + bj:j1 + bj]
+
+    def _matvec(self, x):
+        from numpy import zeros
+        (x_count, y_count, freedom) = self.grid
+        original = x.ravel()
+        x = original if self.free is None else original * self.free
+        # component-major arrays: slices of a component are contiguous rows
+        padded = zeros((freedom, x_count + 2, y_count + 2))
+        padded[:, 1:-1, 1:-1] = x.reshape(self.grid).transpose((2, 0, 1))
+        result = zeros((freedom, x_count + 2, y_count + 2))
+        for di in range(3):
+            for dj in range(3):
+                for (p, q) in zip(*self.weights[di, dj].nonzero()):
+                    result[p, 1:-1, 1:-1] += self.weights[di, dj, p, q] * padded[q, di:di + x_count, dj:dj + y_count]
+        # ghost cells: the first and the last columns and rows of cells of the padded grid
+        self._cells(padded, result, (0, 1), (0, y_count + 1))
+        self._cells(padded, result, (x_count, x_count + 1), (0, y_count + 1))
+        self._cells(padded, result, (1, x_count), (0, 1))
+        self._cells(padded, result, (1, x_count), (y_count, y_count + 1))
+        y = result[:, 1:-1, 1:-1].transpose((1, 2, 0)).ravel()
+        if self.free is not None:
+            y[~self.free] = original[~self.free]
+        return y
+
+    def diagonal(self):
+        """
+        :return: The diagonal of the operator (ones at prescribed freedoms)
+        """
+        from numpy import zeros
+        (x_count, y_count, freedom) = self.grid
+        result = zeros(self.grid)
+        for (a, (ai, aj)) in enumerate(_CORNERS):
+            result[ai:ai + x_count - 1, aj:aj + y_count - 1] += self._block(a, a).diagonal()
+        result = result.ravel()
+        if self.free is not None:
+            result[~self.free] = 1.0
+        return result
+
+    def jacobi(self):
+        """
+        :return: The Jacobi preconditioner (a LinearOperator)
+        """
+        inverse = 1.0 / self.diagonal()
+        return LinearOperator(self.shape, matvec=lambda v: inverse * v.ravel(), dtype=self.dtype)
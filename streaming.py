@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+from profiling import timed, phase, progress, ASSEMBLY
+
+
+def element_chunks(elements, size=65536):
+    """
+    Generator reads elements by chunks, e.g. from a memory-mapped array: numpy.load("elements.npy", mmap_mode="r")
+    :param elements: A two-dimensional array of elements
+    :param size: A count of elements of a chunk
+    :return: Arrays of elements of chunks (in memory)
+    """
+    from numpy import array
+    for start in range(0, len(elements), size):
+        yield array(elements[start:start + size])
+
+
+def _buffered(chunks, size):
+    """
+    Generator passes arrays of elements of chunks and gathers single elements (one-dimensional arrays or sequences of
+    nodes) to chunks of the given size
+    """
+    from numpy import array, asarray
+    buffer = []
+    for elements in chunks:
+        elements = asarray(elements)
+        if elements.ndim == 1:
+            buffer.append(elements)
+            if len(buffer) < size:
+                continue
+            elements = array(buffer)
+        elif buffer:
+            yield array(buffer)
+        buffer = []
+        yield elements
+    if buffer:
+        yield array(buffer)
+
+
+def _spill(directory, run, matrix):
+    """
+    Subroutine stores entries of a matrix of a chunk sorted by rows and columns as a run of .npy files
+    :return: A count of entries
+    """
+    from numpy import save, repeat, arange, diff
+    matrix = matrix.tocsr()
+    matrix.sum_duplicates()
+    rows = repeat(arange(matrix.shape[0], dtype=matrix.indices.dtype), diff(matrix.indptr))
+    for (name, values) in (("rows", rows), ("columns", matrix.indices), ("data", matrix.data)):
+        save(os.path.join(directory, "run%06d_%s.npy" % (run, name)), values)
+    return matrix.nnz
+
+
+def _merge(directory, runs, dimension, count, dtype, block_rows):
+    """
+    Subroutine merges sorted runs into a CSR matrix stored as .npy files of a directory: rows are merged by blocks,
+    a block takes the entries of its rows from each run (found by binary searches) and sums duplicates
+    :param count: A total count of entries of runs (the upper bound of a count of entries of the matrix)
+    :return: None
+    """
+    from numpy import load, concatenate, searchsorted, save, array
+    from numpy.lib.format import open_memmap
+    from scipy.sparse import coo_matrix
+    from dtypes import index_dtype
+    index = index_dtype(max(count, dimension))
+    files = [dict((name, load(os.path.join(directory, "run%06d_%s.npy" % (run, name)), mmap_mode="r"))
+                  for name in ("rows", "columns", "data")) for run in range(runs)]
+    indptr = open_memmap(os.path.join(directory, "indptr.npy"), mode="w+", dtype=index, shape=(dimension + 1,))
+    indices = open_memmap(os.path.join(directory, "indices.npy"), mode="w+", dtype=index, shape=(max(count, 1),))
+    data = open_memmap(os.path.join(directory, "data.npy"), mode="w+", dtype=dtype, shape=(max(count, 1),))
+    indptr[:] = 0
+    offset = 0
+    # without runs (no elements) the matrix is empty
+    for first in range(0, dimension if runs else 0, block_rows):
+        last = min(first + block_rows, dimension)
+        (rows, columns, values) = ([], [], [])
+        for run in files:
+            (start, end) = searchsorted(run["rows"], [first, last])
+            rows.append(run["rows"][start:end] - first)
+            columns.append(run["columns"][start:end])
+            values.append(run["data"][start:end])
+        block = coo_matrix((concatenate(values), (concatenate(rows), concatenate(columns))),
+                           shape=(last - first, dimension)).tocsr()
+        indptr[first + 1:last + 1] = block.indptr[1:] + offset
+        indices[offset:offset + block.nnz] = block.indices
+        data[offset:offset + block.nnz] = block.data
+        offset += block.nnz
+        progress(last, dimension)
+    for values in (indptr, indices, data):
+        values.flush()
+    save(os.path.join(directory, "shape.npy"), array([dimension, dimension]))
+
+
+def load_streamed(directory, mode="r"):
+    """
+    Function opens a matrix assembled by streaming_assembly without reading it to memory
+    :param directory: A directory of the matrix
+    :param mode: A mode of memory mapping: "r" - read-only, "c" - copy-on-write, "r+" - changes are written to files
+    :return: A CSR matrix, its arrays are memory-mapped .npy files (data, indices, indptr)
+    """
+    from numpy import load
+    from scipy.sparse import csr_matrix
+    (data, indices, indptr) = [load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+                               for name in ("data", "indices", "indptr")]
+    shape = tuple(int(s) for s in load(os.path.join(directory, "shape.npy")))
+    # arrays have a slack tail: duplicates of runs are summed by the merge, so only indptr[-1] entries are used
+    nnz = int(indptr[-1])
+    return csr_matrix((data[:nnz], indices[:nnz], indptr), shape=shape, copy=False)
+
+
+@timed(ASSEMBLY)
+def streaming_assembly(nodes, chunks, assembly, freedom, directory=None, block_rows=65536, chunk_size=65536):
+    """
+    Out-of-core assembly of meshes that don't fit in memory: matrices of chunks of elements are assembled one at
+    a time and spilled to temporary files as runs of entries sorted by rows and columns, then runs are merged into
+    a CSR matrix stored on disk. Peak memory is bounded by a chunk and a block of rows (plus arrays of nodes), not by
+    a count of elements. The result is memory-mapped, so iterative solvers consume it directly:
+        matrix = streaming_assembly(nodes, element_chunks(load("elements.npy", mmap_mode="r")),
+                                    lambda n, e: assembly_quads_stress_strain(n, e, 1.0, d, upper=True), 2, "stiffness")
+        (x, info) = cg(SymmetricOperator(matrix), force, M=jacobi(matrix))
+    :param nodes: A two-dimensional array of coordinates
+    :param chunks: An iterable of arrays of elements (see element_chunks) or of single elements of a mesh (they are
+    gathered to chunks of chunk_size elements)
+    :param assembly: A function assembly(nodes, elements) that returns the matrix of elements (any assembly routine of
+    assembly2d with fixed arguments)
+    :param freedom: A count of freedoms in each node
+    :param directory: A directory of files of the matrix (created if it doesn't exist, a new temporary directory if
+    None); the directory must be kept while the matrix is used, see load_streamed to open it again
+    :param block_rows: A count of rows merged at once
+    :param chunk_size: A count of single elements assembled at once
+    :return: A CSR matrix [freedom * nodes_count; freedom * nodes_count] of memory-mapped arrays
+    """
+    from numpy import float64, result_type
+    from tempfile import mkdtemp
+    if directory is None:
+        directory = mkdtemp(prefix="pyfem-")
+    elif not os.path.isdir(directory):
+        os.makedirs(directory)
+    dimension = freedom * len(nodes)
+    (runs, count, dtype) = (0, 0, float64)
+    try:
+        with phase(ASSEMBLY, "spill"):
+            for elements in _buffered(chunks, chunk_size):
+                if len(elements) == 0:
+                    continue
+                matrix = assembly(nodes, elements)
+                if matrix.shape != (dimension, dimension):
+                    raise ValueError("A matrix of a chunk must be [freedom * nodes_count; freedom * nodes_count]")
+                count += _spill(directory, runs, matrix)
+                dtype = result_type(dtype, matrix.dtype)
+                runs += 1
+        with phase(ASSEMBLY, "merge (%d runs)" % runs):
+            _merge(directory, runs, dimension, count, dtype, block_rows)
+    finally:
+        for run in range(runs + 1):
+            for name in ("rows", "columns", "data"):
+                path = os.path.join(directory, "run%06d_%s.npy" % (run, name))
+                if os.path.exists(path):
+                    os.remove(path)
+    return load_streamed(directory)
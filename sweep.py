@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+
+
+def _shared(values):
+    """
+    Function copies an array to shared memory (the memory is inherited by worker processes, it isn't pickled)
+    :param values: A numpy array
+    :return: Tuple: a shared buffer, dtype, shape
+    """
+    from multiprocessing.sharedctypes import RawArray
+    from numpy import frombuffer, ascontiguousarray
+    values = ascontiguousarray(values)
+    buffer = RawArray("b", max(values.nbytes, 1))
+    frombuffer(buffer, dtype=values.dtype, count=values.size)[:] = values.ravel()
+    return buffer, values.dtype, values.shape
+
+
+def _view(shared):
+    from numpy import frombuffer
+    (buffer, dtype, shape) = shared
+    count = 1
+    for s in shape:
+        count *= s
+    return frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+
+
+class Model(object):
+    """
+    Base model of a sweep: a mesh and sparsity patterns of global matrices. Arrays are stored in shared memory, so
+    all workers of a sweep use the same copy of the mesh and the patterns and don't build them again
+    """
+    def __init__(self, nodes, elements, freedoms=(3,)):
+        """
+        :param nodes: A two-dimensional array of coordinates of nodes
+        :param elements: A two-dimensional array of elements
+        :param freedoms: Counts of freedoms in each node of formulations used by analyses (a pattern is built for each)
+        """
+        from assembly2d import sparsity_pattern
+        self._nodes = _shared(nodes)
+        self._elements = _shared(elements)
+        self._patterns = {}
+        for freedom in freedoms:
+            self._patterns[freedom] = tuple(_shared(a) for a in sparsity_pattern(elements, len(nodes), freedom))
+
+    @property
+    def nodes(self):
+        return _view(self._nodes)
+
+    @property
+    def elements(self):
+        return _view(self._elements)
+
+    def pattern(self, freedom):
+        """
+        :param freedom: A count of freedoms in each node
+        :return: A sparsity pattern (indptr, indices, positions) to pass to assembly routines
+        """
+        from assembly2d import sparsity_pattern
+        if freedom not in self._patterns:
+            return sparsity_pattern(self.elements, len(self.nodes), freedom)
+        return tuple(_view(shared) for shared in self._patterns[freedom])
+
+
+def variants(grid):
+    """
+    Generator of parameter sets of a grid
+    :param grid: A dictionary: name of a parameter -> a sequence of values (all combinations are generated) or
+    a sequence of dictionaries (parameter sets as is)
+    :return: Dictionaries: name of a parameter -> value
+    """
+    from itertools import product
+    if isinstance(grid, dict):
+        names = sorted(grid.keys())
+        for values in product(*[grid[name] for name in names]):
+            yield dict(zip(names, values))
+    else:
+        for parameters in grid:
+            yield dict(parameters)
+
+
+def _key(model_name, parameters):
+    return json.dumps([model_name, parameters], sort_keys=True)
+
+
+def _finished(output):
+    """
+    Function reads records of an interrupted sweep
+    :param output: A JSON-lines file of records
+    :return: A dictionary: key of a variant -> record (records with errors and broken lines are skipped)
+    """
+    import os
+    records = {}
+    if output is None or not os.path.exists(output):
+        return records
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # the last line of an interrupted sweep may be incomplete
+            if record.get("error") is None:
+                records[_key(record["model"], record["parameters"])] = record
+    return records
+
+
+_worker = {}
+
+
+def _initialize(analysis, models):
+    from profiling import set_sink, SilentSink
+    set_sink(SilentSink())
+    _worker["analysis"] = analysis
+    _worker["models"] = models
+
+
+def _run(task):
+    """
+    Function runs a variant in a worker process
+    :param task: Tuple: name of a model, parameters
+    :return: A record: model, parameters, outputs, error, wall_time
+    """
+    import time
+    import traceback
+    (model_name, parameters) = task
+    start = time.time()
+    record = {"model": model_name, "parameters": parameters, "outputs": None, "error": None}
+    try:
+        outputs = _worker["analysis"](_worker["models"][model_name], **parameters)
+        record["outputs"] = dict((name, float(value)) for (name, value) in outputs.items())
+    except Exception:
+        record["error"] = traceback.format_exc()
+    record["wall_time"] = time.time() - start
+    return record
+
+
+def run_sweep(analysis, model, grid, processes=None, output=None):
+    """
+    Function runs independent analyses of variants of a model in a pool of processes. Records are appended to
+    the output file as soon as they are finished, so an interrupted sweep is resumed by the next call with the same
+    output file: finished variants are skipped, failed variants are run again
+    :param analysis: A function analysis(model, **parameters) -> dictionary: name of an output -> scalar value. It is
+    inherited by worker processes, so it must be defined before the call
+    :param model: A base model (Model) or a dictionary: name -> Model (e.g. meshes of different densities)
+    :param grid: A grid of parameters (see variants)
+    :param processes: A count of worker processes (a count of CPUs by default)
+    :param output: A JSON-lines file of records (records are kept in memory only if None)
+    :return: A list of records (dictionaries: model, parameters, outputs, error, wall_time) of all variants
+    """
+    from multiprocessing import Pool
+    models = model if isinstance(model, dict) else {None: model}
+    finished = _finished(output)
+    records = []
+    tasks = []
+    for model_name in sorted(models.keys()):
+        for parameters in variants(grid):
+            record = finished.get(_key(model_name, parameters))
+            if record is None:
+                tasks.append((model_name, parameters))
+            else:
+                records.append(record)
+    if not tasks:
+        return records
+    pool = Pool(processes, initializer=_initialize, initargs=(analysis, models))
+    stream = None if output is None else open(output, "a")
+    try:
+        for record in pool.imap_unordered(_run, tasks):
+            records.append(record)
+            if stream is not None:
+                stream.write(json.dumps(record, sort_keys=True) + "\n")
+                stream.flush()
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        if stream is not None:
+            stream.close()
+    return records
+
+
+def table(records):
+    """
+    Function arranges records of a sweep in a table
+    :param records: A list of records
+    :return: Tuple: a list of names of columns (model, parameters, outputs, error), a list of rows (tuples)
+    """
+    parameters = sorted(set(name for record in records for name in record["parameters"]))
+    outputs = sorted(set(name for record in records for name in (record["outputs"] or {})))
+    columns = ["model"] + parameters + outputs + ["error"]
+    rows = []
+    for record in sorted(records, key=lambda r: _key(r["model"], r["parameters"])):
+        error = record["error"]
+        rows.append(tuple([record["model"]] + [record["parameters"].get(name) for name in parameters] +
+                          [(record["outputs"] or {}).get(name) for name in outputs] +
+                          [None if error is None else error.strip().split("\n")[-1]]))
+    return columns, rows
+
+
+def plate_bending(model, h, e, nu=0.3, q=1.0, integration="selective"):
+    """
+    Analysis of a clamped Mindlin plate under uniform pressure
+    :return: Dictionary: max_deflection, max_mises (on the surface of the plate)
+    """
+    from assembly2d import assembly_quads_mindlin_plate, assembly_initial_value, plate_stresses
+    from force import volume_force_quads
+    from stress_strain_matrix import plane_stress_isotropic
+    from mesh2d import boundary_nodes
+    from scipy.sparse.linalg import spsolve
+    from numpy import array
+    freedom = 3
+    (nodes, elements) = (model.nodes, model.elements)
+    d = plane_stress_isotropic(e, nu)
+    stiffness = assembly_quads_mindlin_plate(nodes, elements, h, d, 2, integration=integration,
+                                             pattern=model.pattern(freedom))
+    force = volume_force_quads(nodes, elements, 1.0, freedom, lambda point: array([q, 0.0, 0.0]), 2)
+    for i in boundary_nodes(elements):
+        for j in range(freedom):
+            assembly_initial_value(stiffness, force, freedom * i + j, 0.0)
+    x = spsolve(stiffness, force)
+    mises = plate_stresses(nodes, elements, d, x, 0.5 * h)[5]
+    return {"max_deflection": abs(x[0::freedom]).max(), "max_mises": mises.max()}
+
+
+def plate_buckling(model, h, e, nu=0.3, alpha=None, temperature=1.0):
+    """
+    Buckling analysis of a clamped Mindlin plate under uniform biaxial compression: unit stresses or thermal stresses
+    e * alpha * temperature / (1 - nu) if alpha is given
+    :return: Dictionary: critical_factor (a factor of the compression or the temperature)
+    """
+    from assembly2d import assembly_quads_mindlin_plate, assembly_quads_mindlin_plate_geometric
+    from stress_strain_matrix import plane_stress_isotropic
+    from mesh2d import boundary_nodes
+    from scipy.sparse.linalg import eigsh
+    from numpy import ones, ones_like, zeros, setdiff1d, arange
+    freedom = 3
+    (nodes, elements) = (model.nodes, model.elements)
+    pattern = model.pattern(freedom)
+    stiffness = assembly_quads_mindlin_plate(nodes, elements, h, plane_stress_isotropic(e, nu), 2,
+                                             integration="selective", pattern=pattern)
+    sigma = ones(len(nodes)) * (1.0 if alpha is None else e * alpha * temperature / (1.0 - nu))
+    geometric = assembly_quads_mindlin_plate_geometric(nodes, elements, h, sigma, sigma, zeros(len(nodes)), 2,
+                                                       pattern=pattern)
+    fixed = (freedom * boundary_nodes(elements).reshape(-1, 1) + arange(freedom)).ravel()
+    active = setdiff1d(arange(freedom * len(nodes)), fixed)
+    values = eigsh(A=stiffness[active, :][:, active], M=geometric[active, :][:, active], k=1, sigma=0.0,
+                   which="LM", v0=ones_like(active, dtype=float), return_eigenvectors=False)
+    return {"critical_factor": values[0]}
+
+
+ANALYSES = {
+    "plate_bending": plate_bending,
+    "plate_buckling": plate_buckling
+}
+
+
+if __name__ == "__main__":
+    import argparse
+    from mesh2d import rectangular_quads, read
+    parser = argparse.ArgumentParser(description="Parameter sweep of a plate analysis")
+    parser.add_argument("analysis", choices=sorted(ANALYSES.keys()))
+    parser.add_argument("--mesh", help="mesh file (a square plate is used by default)")
+    parser.add_argument("-n", type=int, nargs="+", default=[21], help="nodes counts in a side of a square plate")
+    parser.add_argument("--h", type=float, nargs="+", default=[0.01], help="thicknesses")
+    parser.add_argument("--e", type=float, nargs="+", default=[203200.0], help="Young's moduli")
+    parser.add_argument("--alpha", type=float, nargs="+", help="coefficients of thermal expansion (buckling)")
+    parser.add_argument("--temperature", type=float, nargs="+", help="temperatures (buckling)")
+    parser.add_argument("--processes", type=int, help="count of worker processes")
+    parser.add_argument("--output", help="JSON-lines file of records (an interrupted sweep is resumed)")
+    arguments = parser.parse_args()
+    if arguments.mesh is not None:
+        bases = {arguments.mesh: Model(*read(arguments.mesh))}
+    else:
+        bases = dict(("n=%d" % n, Model(*rectangular_quads(n, n, 0.0, 0.0, 1.0, 1.0))) for n in arguments.n)
+    parameters_grid = {"h": arguments.h, "e": arguments.e}
+    if arguments.alpha is not None:
+        parameters_grid["alpha"] = arguments.alpha
+    if arguments.temperature is not None:
+        parameters_grid["temperature"] = arguments.temperature
+    (names, sweep_rows) = table(run_sweep(ANALYSES[arguments.analysis], bases, parameters_grid, arguments.processes,
+                                          arguments.output))
+    print("\t".join(names))
+    for row in sweep_rows:
+        print("\t".join("" if value is None else str(value) for value in row))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from numpy import array, arange, linspace, allclose, column_stack
+from scipy.sparse.linalg import spsolve
+
+
+class UpperStorageTest(unittest.TestCase):
+    """
+    Prescribed unknowns of matrices stored as upper triangles give the solutions of the full storage
+    """
+    def setUp(self):
+        from mesh2d import rectangular_quads
+        from stress_strain_matrix import plane_stress_isotropic
+        (self.nodes, self.elements) = rectangular_quads(x_count=9, y_count=9, x_origin=0.0, y_origin=0.0, width=1.0,
+                                                        height=1.0)
+        self.d = plane_stress_isotropic(203200.0, 0.3)
+        dimension = 3 * len(self.nodes)
+        # all freedoms of the edges x = 0 and x = 1, deflections are prescribed
+        self.dofs = arange(dimension)[array([3 * i + j for i in range(len(self.nodes)) for j in range(3)
+                                             if self.nodes[i, 0] < 1.0E-7 or self.nodes[i, 0] > 1.0 - 1.0E-7])]
+        self.values = array([0.001 * self.nodes[dof // 3, 1] if dof % 3 == 0 else 0.0 for dof in self.dofs])
+        self.forces = column_stack((linspace(0.0, 1.0, dimension), linspace(1.0, -1.0, dimension)))
+
+    def stiffness(self, upper):
+        from assembly2d import assembly_quads_mindlin_plate
+        return assembly_quads_mindlin_plate(self.nodes, self.elements, 0.01, self.d, upper=upper)
+
+    def test_constrain(self):
+        from load_cases import constrain
+        from solvers import SymmetricOperator, symmetric_solve
+        (full, full_forces) = constrain(self.stiffness(False), self.forces, self.dofs, self.values)
+        (upper, upper_forces) = constrain(self.stiffness(True), self.forces, self.dofs, self.values, upper=True)
+        self.assertTrue(allclose(SymmetricOperator(upper).full().toarray(), full.toarray()))
+        self.assertTrue(allclose(upper_forces, full_forces))
+        self.assertTrue(allclose(symmetric_solve(upper, upper_forces), spsolve(full.tocsc(), full_forces)))
+
+    def test_initial_value(self):
+        from assembly2d import assembly_initial_value
+        from solvers import symmetric_solve
+        (full, upper) = (self.stiffness(False), self.stiffness(True))
+        (full_force, upper_force) = (self.forces[:, 0].copy(), self.forces[:, 0].copy())
+        for (dof, value) in zip(self.dofs, self.values):
+            assembly_initial_value(full, full_force, dof, value)
+            assembly_initial_value(upper, upper_force, dof, value, upper=True)
+        expected = spsolve(full.tocsc(), full_force)
+        self.assertTrue(allclose(expected[self.dofs], self.values))
+        self.assertTrue(allclose(symmetric_solve(upper, upper_force), expected))
+        (upper, upper_force) = (self.stiffness(True), self.forces[:, 0].copy())
+        assembly_initial_value(upper, upper_force, self.dofs, self.values, upper=True)
+        self.assertTrue(allclose(symmetric_solve(upper, upper_force), expected))
+
+    def test_pattern(self):
+        from assembly2d import sparsity_pattern, assembly_quads_mindlin_plate
+        upper = self.stiffness(True)
+        pattern = sparsity_pattern(self.elements, len(self.nodes), 3, upper=True)
+        given = assembly_quads_mindlin_plate(self.nodes, self.elements, 0.01, self.d, pattern=pattern)
+        self.assertTrue(allclose(given.toarray(), upper.toarray()))
+        self.assertRaises(ValueError, assembly_quads_mindlin_plate, self.nodes, self.elements, 0.01, self.d,
+                          pattern=sparsity_pattern(self.elements, len(self.nodes), 3), upper=True)
+
+    def test_theta_method(self):
+        from assembly2d import assembly_conduction, assembly_capacity
+        from heat import ThetaMethod
+        fixed = arange(len(self.nodes))[self.nodes[:, 0] < 1.0E-7]
+        results = []
+        for upper in (False, True):
+            integrator = ThetaMethod(assembly_conduction(self.nodes, self.elements, 1.0, upper=upper),
+                                     assembly_capacity(self.nodes, self.elements, 1.0, upper=upper), 0.01,
+                                     fixed=fixed, values=1.0)
+            results.append(integrator.integrate(0.0, 10)[0])
+        self.assertTrue(allclose(results[0], results[1]))
+        self.assertTrue(results[1].max() > 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from numpy import array, ascontiguousarray
+
+_VTK_TYPES = {
+    "int8": "Int8",
+    "uint8": "UInt8",
+    "int16": "Int16",
+    "uint16": "UInt16",
+    "int32": "Int32",
+    "uint32": "UInt32",
+    "int64": "Int64",
+    "uint64": "UInt64",
+    "float32": "Float32",
+    "float64": "Float64"
+}
+_VTK_TRIANGLE = 5
+_VTK_QUAD = 9
+_VTK_POLYGON = 7
+
+
+def _cells(elements):
+    """
+    Function builds VTK cells of a planar mesh
+    :param elements: elements array [elements_count; element_nodes]
+    :return: Tuple of numpy arrays: connectivity, offsets, types
+    """
+    from numpy import arange, full, int64, uint8
+    (elements_count, element_nodes) = elements.shape
+    cell_type = {3: _VTK_TRIANGLE, 4: _VTK_QUAD}.get(element_nodes, _VTK_POLYGON)
+    connectivity = elements.ravel()
+    offsets = arange(1, elements_count + 1, dtype=int64) * element_nodes
+    types = full(elements_count, cell_type, dtype=uint8)
+    return connectivity, offsets, types
+
+
+def _points(nodes):
+    """
+    Function pads planar coordinates with zeros (VTK points are three-dimensional)
+    :param nodes: nodes array [nodes_count; 2] or [nodes_count; 3]
+    :return: nodes array [nodes_count; 3]
+    """
+    from numpy import zeros
+    if nodes.shape[1] == 3:
+        return nodes
+    points = zeros((nodes.shape[0], 3), dtype=nodes.dtype)
+    points[:, :nodes.shape[1]] = nodes
+    return points
+
+
+def _little_endian(values):
+    values = ascontiguousarray(values)
+    if values.dtype.kind not in "iuf":
+        values = values.astype(float)
+    return values.astype(values.dtype.newbyteorder("<"), copy=False)
+
+
+def write_vtu(filename, nodes, elements, point_data=None, cell_data=None, encoding="appended"):
+    """
+    Subroutine writes a planar mesh and fields to a VTK XML unstructured grid file (.vtu). VTK isn't required: arrays
+    are written by blocks of raw bytes, so millions of cells are written at the speed of a disk
+    :param filename: A name of the file
+    :param nodes: nodes array [nodes_count; 2] or [nodes_count; 3]
+    :param elements: elements array [elements_count; element_nodes]
+    :param point_data: A dictionary of nodal fields: name -> array [nodes_count] or [nodes_count; components]
+    :param cell_data: A dictionary of cell fields: name -> array [elements_count] or [elements_count; components]
+    :param encoding: "appended" (raw binary data appended to the file) or "ascii"
+    :return: nothing
+    """
+    if encoding not in ("appended", "ascii"):
+        raise ValueError("Unknown encoding: " + str(encoding))
+    (connectivity, offsets, types) = _cells(elements)
+    blocks = []
+
+    def data_array(values, name=None):
+        values = _little_endian(values)
+        components = 1 if values.ndim == 1 else values.shape[1]
+        text = '<DataArray type="%s"' % _VTK_TYPES[values.dtype.name]
+        if name is not None:
+            text += ' Name="%s"' % name
+        text += ' NumberOfComponents="%d"' % components
+        if encoding == "appended":
+            text += ' format="appended" offset="%d"/>\n' % sum(8 + block.nbytes for block in blocks)
+            blocks.append(values)
+        else:
+            text += ' format="ascii">\n' + " ".join(repr(v) for v in values.ravel().tolist()) + "\n</DataArray>\n"
+        return text
+
+    def fields(tag, data):
+        if not data:
+            return ""
+        text = "<%s>\n" % tag
+        for name in sorted(data.keys()):
+            text += data_array(data[name], name)
+        return text + "</%s>\n" % tag
+
+    header = '<?xml version="1.0"?>\n' \
+             '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">\n' \
+             '<UnstructuredGrid>\n' \
+             '<Piece NumberOfPoints="%d" NumberOfCells="%d">\n' % (len(nodes), len(elements))
+    header += fields("PointData", point_data)
+    header += fields("CellData", cell_data)
+    header += "<Points>\n" + data_array(_points(nodes)) + "</Points>\n"
+    header += "<Cells>\n" + data_array(connectivity, "connectivity") + data_array(offsets, "offsets") + \
+              data_array(types, "types") + "</Cells>\n"
+    header += "</Piece>\n</UnstructuredGrid>\n"
+    with open(filename, "wb") as f:
+        f.write(header.encode("utf-8"))
+        if encoding == "appended":
+            f.write(b'<AppendedData encoding="raw">\n_')
+            for block in blocks:
+                f.write(array([block.nbytes], dtype="<u8").tobytes())
+                block.tofile(f)
+            f.write(b"\n</AppendedData>\n")
+        f.write(b"</VTKFile>\n")
+
+
+def write_pvd(filename, steps):
+    """
+    Subroutine writes a ParaView collection file (.pvd) that joins files of a time series
+    :param filename: A name of the collection file
+    :param steps: A sequence of tuples (time, name of a .vtu file relative to the collection file)
+    :return: nothing
+    """
+    with open(filename, "w") as f:
+        f.write('<?xml version="1.0"?>\n<VTKFile type="Collection" version="0.1">\n<Collection>\n')
+        for (time, name) in steps:
+            f.write('<DataSet timestep="%r" part="0" file="%s"/>\n' % (float(time), name))
+        f.write("</Collection>\n</VTKFile>\n")
+
+
+class VtuSeries(object):
+    """
+    Time series of fields over a mesh: each step is written to a .vtu file, the collection file (.pvd) is rewritten
+    after each step, so an interrupted series remains readable
+        series = VtuSeries("results/plate", nodes, elements)
+        for (time, w) in steps:
+            series.write(time, point_data={"w": w})
+    """
+    def __init__(self, basename, nodes, elements, encoding="appended"):
+        """
+        :param basename: A path without extension; files are basename.pvd, basename_000000.vtu, ...
+        :param nodes: nodes array [nodes_count; 2] or [nodes_count; 3]
+        :param elements: elements array [elements_count; element_nodes]
+        :param encoding: "appended" or "ascii"
+        """
+        self.basename = basename
+        self.nodes = nodes
+        self.elements = elements
+        self.encoding = encoding
+        self.steps = []
+
+    def write(self, time, point_data=None, cell_data=None):
+        import os
+        filename = "%s_%06d.vtu" % (self.basename, len(self.steps))
+        write_vtu(filename, self.nodes, self.elements, point_data, cell_data, self.encoding)
+        self.steps.append((time, os.path.basename(filename)))
+        write_pvd(self.basename + ".pvd", self.steps)